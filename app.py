@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import hashlib
 import json
-import os
-import subprocess
+import queue
 import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import sys
 import streamlit as st
 
@@ -13,43 +14,55 @@ import streamlit as st
 APP_TITLE = "SDS Extractor — Drag & Drop Tester"
 APP_SUBTITLE = "Upload an SDS PDF → run your extractor → view JSON + warnings → download result"
 PROJECT_ROOT = Path(__file__).resolve().parent
-PYTHON = sys.executable
 
-def run_extractor(pdf_path: str) -> Tuple[Dict[str, Any], str]:
+# The extractor modules import each other as top-level names (as when run via python src/main.py).
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from dotenv import load_dotenv  # noqa: E402
+from cache import DEFAULT_CACHE_DIR, ExtractionCache  # noqa: E402
+from main import Extractor, require_key  # noqa: E402
+from pdf_text import PageTextCache  # noqa: E402
+
+MAX_PARALLEL_FILES = 8
+# Streamed fields shown per file while its extraction is running.
+PARTIAL_ROWS = 8
+# Seconds between UI refreshes while extractions are running.
+POLL_INTERVAL_S = 0.2
+
+
+@st.cache_resource
+def get_extractor(mode: str, stream: bool = False) -> Extractor:
     """
-    Runs your existing CLI extractor and returns (parsed_json, raw_stdout).
-    Assumes: python src/main.py <pdf_path>
+    One warm extractor per mode for the whole Streamlit server: the OpenAI
+    client (connection pool) and caches survive reruns and sessions.
     """
-    cmd = ["python", str(PROJECT_ROOT / "src" / "main.py"), pdf_path]
-
-    # Ensure the working directory is project root (where app.py is)
-    proc = subprocess.run(
-        cmd,
-        cwd=str(PROJECT_ROOT),  # <— critical: run as if from repo root
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
-        check=False,
+    load_dotenv(PROJECT_ROOT / ".env")
+    require_key()
+    cache_dir = PROJECT_ROOT / DEFAULT_CACHE_DIR
+    return Extractor(
+        cache=ExtractionCache(cache_dir),
+        page_cache=PageTextCache(cache_dir / "pages"),
+        mode=mode,
+        stream=stream,
     )
 
-    stdout = (proc.stdout or "").strip()
-    stderr = (proc.stderr or "").strip()
-    
-    if stderr.strip():
-        st.code(stderr, language="text")    
 
-    if proc.returncode != 0:
-        # Show stderr + any stdout for debugging
-        raise RuntimeError(f"Extractor failed.\n\nSTDERR:\n{stderr}\n\nSTDOUT:\n{stdout}")
-
-    # Your extractor should print JSON to stdout
-    try:
-        data = json.loads(stdout)
-    except Exception as e:
-        raise RuntimeError(f"Extractor output was not valid JSON.\n\nError: {e}\n\nSTDOUT:\n{stdout}")
-
-    return data, stdout
+def run_extractor(
+    extractor: Extractor,
+    filename: str,
+    data: bytes,
+    on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Runs the extractor in-process and returns (parsed_json, raw_model_output).
+    With a streaming extractor, `on_partial` receives each field as it is generated.
+    """
+    result = extractor.extract_bytes(data, filename, on_partial=on_partial)
+    if result["parsed"] is None:
+        raise RuntimeError(
+            f"Extractor output was not valid JSON.\n\nError: {result['error']}\n\nOUTPUT:\n{result['raw']}"
+        )
+    return result["parsed"], result["raw"]
 
 
 def get_warnings(data: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -69,11 +82,22 @@ with st.sidebar:
     st.header("Run options")
     keep_uploaded_files = st.toggle("Keep uploaded PDFs on disk (debug)", value=False)
     show_meta = st.toggle("Show system metadata (debug)", value=False)
+    fanout = st.toggle(
+        "Parallel per-section extraction",
+        value=False,
+        help="Request each schema group (document, composition, hazards, ...) concurrently with only its SDS section.",
+    )
+    stream = st.toggle(
+        "Show fields as they are generated",
+        value=True,
+        disabled=fanout,
+        help="Stream the model answer: fields appear (and are format-checked) while the rest is still being generated.",
+    )
     st.divider()
     st.write("**How it works**")
-    st.write("- Saves uploaded PDF(s) to a temp folder")
-    st.write("- Runs: `python src/main.py <pdf>`")
-    st.write("- Captures JSON output + displays warnings")
+    st.write("- Runs the extractor in-process on all uploaded PDFs concurrently")
+    st.write("- Reuses results for files already processed (by content hash)")
+    st.write("- Displays JSON output + warnings")
     st.divider()
     st.write("If you see environment prompts in VS Code:")
     st.write("✅ Select the `.venv` environment for this workspace.")
@@ -93,28 +117,107 @@ run = st.button("Run extraction", type="primary")
 if not run:
     st.stop()
 
+mode = "fanout" if fanout else "single"
+stream = stream and not fanout
+extractor = get_extractor(mode, stream)
+
+# Results survive reruns, keyed by (file content hash, mode).
+done_results: Dict[Tuple[str, str], Dict[str, Any]] = st.session_state.setdefault("done_results", {})
+
+files = [(uf.name, bytes(uf.getbuffer())) for uf in uploaded]
+keys = [(hashlib.sha256(data).hexdigest(), mode) for _, data in files]
+
+if keep_uploaded_files:
+    upload_dir = Path(tempfile.mkdtemp(prefix="sds_ui_"))
+    for i, (name, data) in enumerate(files):
+        (upload_dir / f"{i:02d}_{Path(name).name}").write_bytes(data)
+    st.caption(f"Uploaded PDFs kept in `{upload_dir}`")
+
 results: List[Tuple[str, Dict[str, Any], List[Dict[str, Any]]]] = []
+errors: List[Tuple[str, str]] = []
+
+# Per-upload UI slots are indexed by position: two uploads may share a file name.
+progress = st.progress(0.0, text="Running extraction...")
+status_lines = [st.empty() for _ in files]
+partial_views = [st.empty() for _ in files]
+pending = []
+for i, ((name, data), key) in enumerate(zip(files, keys)):
+    if key in done_results:
+        status_lines[i].write(f"♻️ {name} — reused previous result")
+    else:
+        status_lines[i].write(f"⏳ {name} — running")
+        pending.append((i, name, data, key))
+
+finished = len(files) - len(pending)
+progress.progress(finished / len(files), text=f"{finished}/{len(files)} file(s) done")
+
+# Streamed fields arrive on worker threads and are drawn from the script thread.
+partial_events: "queue.Queue[Tuple[int, Dict[str, Any]]]" = queue.Queue()
+partial_rows: Dict[int, List[Dict[str, Any]]] = {i: [] for i, _, _, _ in pending}
+partial_warnings: Dict[int, int] = {i: 0 for i, _, _, _ in pending}
+
 
-with st.spinner("Running extraction..."):
-    for uf in uploaded:
-        # Save uploaded file to temp location
-        suffix = Path(uf.name).suffix.lower() or ".pdf"
-        tmp_dir = tempfile.mkdtemp(prefix="sds_ui_")
-        tmp_pdf = str(Path(tmp_dir) / f"upload{suffix}")
-        with open(tmp_pdf, "wb") as f:
-            f.write(uf.getbuffer())
+def partial_callback(index: int) -> Optional[Callable[[Dict[str, Any]], None]]:
+    if not stream:
+        return None
+    return lambda event: partial_events.put((index, event))
 
+
+def draw_partials() -> None:
+    updated = set()
+    while True:
         try:
-            data, _raw = run_extractor(tmp_pdf)
-            warnings = get_warnings(data)
-            results.append((uf.name, data, warnings))
-        finally:
-            if not keep_uploaded_files:
+            index, event = partial_events.get_nowait()
+        except queue.Empty:
+            break
+        value = event["value"]
+        partial_rows[index].append({
+            "field": event["path"],
+            "value": value if value is None or isinstance(value, str) else json.dumps(value),
+            "s": round(event["elapsed_ms"] / 1000.0, 2),
+        })
+        partial_warnings[index] += len(event["warnings"])
+        updated.add(index)
+    for index in updated:
+        rows = partial_rows[index]
+        status_lines[index].write(
+            f"⏳ {files[index][0]} — {len(rows)} field(s) received, first after {rows[0]['s']} s, "
+            f"{partial_warnings[index]} warning(s) so far"
+        )
+        partial_views[index].dataframe(rows[-PARTIAL_ROWS:], use_container_width=True, hide_index=True)
+
+
+if pending:
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_FILES, len(pending))) as pool:
+        futures = {
+            pool.submit(run_extractor, extractor, name, data, partial_callback(i)): (i, name, key)
+            for i, name, data, key in pending
+        }
+        # Streamlit calls must stay on the script thread, so progress is updated here.
+        running = set(futures)
+        while running:
+            done, running = wait(running, timeout=POLL_INTERVAL_S, return_when=FIRST_COMPLETED)
+            draw_partials()
+            for fut in done:
+                i, name, key = futures[fut]
+                partial_views[i].empty()
                 try:
-                    Path(tmp_pdf).unlink(missing_ok=True)
-                    Path(tmp_dir).rmdir()
-                except Exception:
-                    pass
+                    data, _raw = fut.result()
+                    done_results[key] = data
+                    status_lines[i].write(f"✅ {name}")
+                except Exception as e:
+                    errors.append((name, str(e)))
+                    status_lines[i].write(f"❌ {name} — failed")
+                finished += 1
+                progress.progress(finished / len(files), text=f"{finished}/{len(files)} file(s) done")
+
+for (name, _), key in zip(files, keys):
+    if key in done_results:
+        data = done_results[key]
+        results.append((name, data, get_warnings(data)))
+
+for name, err in errors:
+    st.error(f"{name}: {err}")
 
 # UI: one section per file
 st.success(f"Done. Processed {len(results)} file(s).")
@@ -162,3 +265,9 @@ for filename, data, warnings in results:
             if isinstance(ings, list):
                 ingredient_count = len(ings)
         st.write(f"- Ingredients parsed: **{ingredient_count}**")
+        timings = data.get("meta", {}).get("timings", {}) if isinstance(data, dict) else {}
+        if timings.get("first_field_ms") is not None:
+            st.write(
+                f"- First field after **{timings['first_field_ms'] / 1000:.2f} s** "
+                f"(total {timings.get('total_ms', 0) / 1000:.2f} s)"
+            )
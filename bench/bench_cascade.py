@@ -0,0 +1,217 @@
+"""
+Model cascade benchmark against the local fake LLM: accuracy, cost and
+latency of sending every document to the small model, to the large model,
+or through the confidence cascade (small model, then only low-confidence or
+guardrail-flagged fields to the large model).
+
+    python bench/bench_cascade.py --docs 20 --threshold 0.7
+
+Each synthetic document has a ground truth; the fake "small" model gets a
+share of fields wrong (mostly with low confidence, as a calibrated model
+would), the "large" model fewer. Accuracy is measured with eval.evaluate.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from openai import OpenAI  # noqa: E402
+
+from batch import percentile  # noqa: E402
+from cascade import escalate  # noqa: E402
+from eval import evaluate  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+from llm import create_response, response_usage  # noqa: E402
+from main import MAX_CHARS, build_messages, prepare_text, read_document  # noqa: E402
+
+SMALL, LARGE = "gpt-4o-mini", "gpt-4o"
+
+SCALARS = {
+    "document": (
+        "product_name", "product_code", "physical_state", "product_color", "version_number",
+        "recommended_use", "supplier_name", "supplier_address", "supplier_phone",
+        "emergency_phone", "revision_date",
+    ),
+    "transport": ("un_number", "hazard_class", "packing_group"),
+    "physical_chemical": ("flash_point", "ph", "relative_density", "boiling_point"),
+}
+
+
+def synthetic_truth(rng: random.Random, ingredients: int, statements: int) -> Dict[str, Any]:
+    """Ground truth in the output shape, values only."""
+    truth: Dict[str, Any] = {
+        g: {f: {"value": f"{f} {rng.randint(1, 999)}"} for f in fields} for g, fields in SCALARS.items()
+    }
+    truth["document"]["revision_date"] = {"value": f"{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}-2024"}
+    truth["composition"] = {
+        "ingredients": [
+            {
+                "name": {"value": f"chemical {rng.randint(1, 10**6)}"},
+                "cas": {"value": f"{rng.randint(50, 99999)}-{rng.randint(10, 99)}-{rng.randint(0, 9)}"},
+                "concentration": {"value": f"{rng.randint(1, 30)} - {rng.randint(31, 60)}"},
+            }
+            for _ in range(ingredients)
+        ]
+    }
+    truth["hazards"] = {
+        "ghs_signal_word": {"value": rng.choice(["Danger", "Warning"])},
+        "hazard_statements": [{"value": f"H{300 + i} statement"} for i in range(statements)],
+        "precautionary_statements": [{"value": f"P{200 + i} statement"} for i in range(statements)],
+    }
+    return truth
+
+
+def model_answer(truth: Dict[str, Any], rng: random.Random, error_rate: float, calibration: float) -> Dict[str, Any]:
+    """
+    A model answer for `truth`: each field object is wrong with `error_rate`
+    (CAS numbers become malformed, so guardrails can flag them); a wrong field
+    gets a low confidence with probability `calibration`.
+    """
+    answer = copy.deepcopy(truth)
+
+    def visit(node: Any, key: str = "") -> None:
+        if isinstance(node, dict) and "value" in node:
+            wrong = rng.random() < error_rate
+            if wrong:
+                node["value"] = f"{node['value']}-X" if key == "cas" else f"wrong {rng.randint(1, 999)}"
+            low = wrong and rng.random() < calibration
+            node["confidence"] = round(rng.uniform(0.3, 0.6) if low else rng.uniform(0.85, 0.99), 2)
+            node["evidence"] = None
+        elif isinstance(node, dict):
+            for k, v in node.items():
+                visit(v, k)
+        elif isinstance(node, list):
+            for item in node:
+                visit(item, key)
+
+    visit(answer)
+    answer["meta"] = {"notes": ""}
+    return answer
+
+
+def _cost(usage: Dict[str, Dict[str, int]], prices: Dict[str, Tuple[float, float]]) -> float:
+    return sum(
+        u["input_tokens"] / 1e6 * prices[m][0] + u["output_tokens"] / 1e6 * prices[m][1] for m, u in usage.items()
+    )
+
+
+def _add(usage: Dict[str, Dict[str, int]], model: str, u: Dict[str, int]) -> None:
+    totals = usage.setdefault(model, {"requests": 0, "input_tokens": 0, "output_tokens": 0})
+    totals["requests"] += 1
+    totals["input_tokens"] += u["input_tokens"]
+    totals["output_tokens"] += u["output_tokens"]
+
+
+def run_config(
+    name: str,
+    client: OpenAI,
+    messages: List[Dict[str, str]],
+    text: str,
+    threshold: float,
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, int]], float, float]:
+    """One document through one configuration: (answer, usage per model, latency s, escalation rate)."""
+    usage: Dict[str, Dict[str, int]] = {}
+    t0 = time.perf_counter()
+    model = LARGE if name == "large" else SMALL
+    resp = create_response(client, messages, model)
+    _add(usage, model, response_usage(resp))
+    answer = json.loads(resp.output_text)
+    rate = 0.0
+    if name == "cascade":
+        answer, info = escalate(answer, client=client, text=text, max_chars=MAX_CHARS, model=LARGE, threshold=threshold)
+        rate = info["escalation_rate"]
+        if info["requests"]:
+            _add(usage, LARGE, info)
+    return answer, usage, time.perf_counter() - t0, rate
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--ingredients", type=int, default=12)
+    parser.add_argument("--statements", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--small-error-rate", type=float, default=0.12)
+    parser.add_argument("--large-error-rate", type=float, default=0.03)
+    parser.add_argument("--calibration", type=float, default=0.85,
+                        help="Share of the small model's errors that come with a low confidence")
+    parser.add_argument("--small-latency", type=float, default=0.2)
+    parser.add_argument("--small-tokens-per-s", type=float, default=1500.0)
+    parser.add_argument("--large-latency", type=float, default=0.5)
+    parser.add_argument("--large-tokens-per-s", type=float, default=500.0)
+    parser.add_argument("--small-price", type=float, nargs=2, default=(0.15, 0.60), metavar=("IN", "OUT"),
+                        help="USD per 1M input/output tokens")
+    parser.add_argument("--large-price", type=float, nargs=2, default=(2.50, 10.00), metavar=("IN", "OUT"))
+    parser.add_argument("--input", type=Path, default=ROOT / "samples" / "getpdf.pdf",
+                        help="SDS whose text is sent in the prompts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    text, _ = read_document(args.input)
+    messages = build_messages(prepare_text(text)["text"])
+    prices = {SMALL: tuple(args.small_price), LARGE: tuple(args.large_price)}
+    configs = ("small", "large", "cascade")
+    rows: Dict[str, Dict[str, List[Any]]] = {c: {"accuracy": [], "latency_s": [], "cost": [], "rate": []} for c in configs}
+    usage_totals: Dict[str, Dict[str, Dict[str, int]]] = {c: {} for c in configs}
+
+    models = {
+        SMALL: {"latency": args.small_latency, "tokens_per_s": args.small_tokens_per_s},
+        LARGE: {"latency": args.large_latency, "tokens_per_s": args.large_tokens_per_s},
+    }
+    with FakeLLMServer(models=models) as fake:
+        client = OpenAI(base_url=fake.base_url, api_key="fake")
+        for _ in range(args.docs):
+            truth = synthetic_truth(rng, args.ingredients, args.statements)
+            models[SMALL]["response"] = model_answer(truth, rng, args.small_error_rate, args.calibration)
+            models[LARGE]["response"] = model_answer(truth, rng, args.large_error_rate, args.calibration)
+            for c in configs:
+                answer, usage, latency, rate = run_config(c, client, messages, text, args.threshold)
+                rows[c]["accuracy"].append(evaluate(answer, truth)["accuracy"])
+                rows[c]["latency_s"].append(latency)
+                rows[c]["cost"].append(_cost(usage, prices))
+                rows[c]["rate"].append(rate)
+                for m, u in usage.items():
+                    for k, v in u.items():
+                        usage_totals[c].setdefault(m, {}).setdefault(k, 0)
+                        usage_totals[c][m][k] += v
+
+    results: Dict[str, Any] = {}
+    print(f"docs={args.docs} threshold={args.threshold} small_error_rate={args.small_error_rate} "
+          f"calibration={args.calibration}")
+    for c in configs:
+        r = rows[c]
+        results[c] = {
+            "accuracy_mean": round(statistics.mean(r["accuracy"]), 2),
+            "latency_p50_s": round(percentile(r["latency_s"], 50), 3),
+            "latency_p95_s": round(percentile(r["latency_s"], 95), 3),
+            "cost_per_doc_usd": round(statistics.mean(r["cost"]), 6),
+            "escalation_rate_mean": round(statistics.mean(r["rate"]), 4),
+            "usage": usage_totals[c],
+        }
+        res = results[c]
+        print(
+            f"{c:8s} accuracy={res['accuracy_mean']:6.2f}% p50={res['latency_p50_s']:.3f}s "
+            f"p95={res['latency_p95_s']:.3f}s cost/doc=${res['cost_per_doc_usd']:.6f}"
+            + (f" escalation_rate={res['escalation_rate_mean']:.2%}" if c == "cascade" else "")
+        )
+    if args.out:
+        args.out.write_text(json.dumps({"args": {k: str(v) for k, v in vars(args).items()}, "results": results},
+                                       indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+"""
+Corpus report for the boilerplate stripping / compaction pre-processor:
+characters and estimated input tokens sent, and how often the text is
+truncated at MAX_CHARS, with and without compaction.
+
+    python bench/bench_compaction.py path/to/sds_folder --full-text
+
+Inputs are resolved like batch mode (folder, glob or manifest). Page texts
+are extracted once per file and then compared; no model calls are made.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from batch import collect_inputs  # noqa: E402
+from compact import compact_pages  # noqa: E402
+from main import prepare_text  # noqa: E402
+from pdf_text import read_pdf_pages  # noqa: E402
+from prompts import estimate_tokens  # noqa: E402
+
+
+def _pages(path: Path) -> List[str]:
+    if path.suffix.lower() == ".pdf":
+        return read_pdf_pages(path)[0]
+    return [path.read_text(encoding="utf-8", errors="replace")]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("inputs", nargs="?", default=str(ROOT / "samples"), help="Folder, glob or manifest")
+    parser.add_argument("--full-text", action="store_true", help="Compare whole-text prompts instead of sections")
+    parser.add_argument("--out", type=Path, default=None, help="Write per-document results JSON here")
+    args = parser.parse_args()
+
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print(f"no inputs found for {args.inputs}", file=sys.stderr)
+        return 1
+
+    rows: List[Dict[str, Any]] = []
+    for path in paths:
+        pages = _pages(path)
+        compacted, stats = compact_pages(pages)
+        before = prepare_text("\n".join(pages), segment=not args.full_text)
+        after = prepare_text("\n".join(compacted), segment=not args.full_text)
+        rows.append({
+            "input": str(path),
+            "removed_pct": stats["removed_pct"],
+            "compact_ms": stats["compact_ms"],
+            "sent_chars_before": before["sent_chars"],
+            "sent_chars_after": after["sent_chars"],
+            "tokens_before": estimate_tokens(before["text"]),
+            "tokens_after": estimate_tokens(after["text"]),
+            "truncated_before": before["truncated"],
+            "truncated_after": after["truncated"],
+        })
+
+    tokens_before = sum(r["tokens_before"] for r in rows)
+    tokens_after = sum(r["tokens_after"] for r in rows)
+    print(f"documents={len(rows)} text={'full' if args.full_text else 'sections'}")
+    print(f"chars removed per document: median={statistics.median(r['removed_pct'] for r in rows):.2f}% "
+          f"compact_ms median={statistics.median(r['compact_ms'] for r in rows):.2f}")
+    print(f"input tokens sent: {tokens_before} -> {tokens_after} "
+          f"({(tokens_before - tokens_after) / tokens_before * 100 if tokens_before else 0.0:.2f}% fewer)")
+    print(f"input_truncated: {sum(r['truncated_before'] for r in rows)} -> {sum(r['truncated_after'] for r in rows)} documents")
+    if args.out:
+        args.out.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+"""
+Micro-benchmark: per-document cost of apply_format_guardrails on large
+synthetic outputs, compared with the previous hand-written implementation.
+
+    python bench/bench_guardrails.py                                  # typical SDS outputs
+    python bench/bench_guardrails.py --docs 200 --ingredients 400 --statements 300
+
+Both implementations must return identical warnings and normalized values;
+the script checks that before timing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from format_guardrails import (  # noqa: E402
+    DASHES,
+    _warn,
+    apply_format_guardrails,
+    clear_guardrail_cache,
+    validate_cas_value,
+    validate_us_date,
+)
+
+
+def legacy_normalize_cas(cas: str) -> str:
+    """normalize_cas before the rules engine, kept verbatim for comparison."""
+    s = cas.strip()
+    for k, v in DASHES.items():
+        s = s.replace(k, v)
+    # remove spaces around dashes
+    s = re.sub(r"\s*-\s*", "-", s)
+    return s
+
+
+def legacy_apply_format_guardrails(parsed: Dict[str, Any], normalize: bool = True) -> List[Dict[str, Any]]:
+    """The implementation before the rules engine, kept verbatim for comparison."""
+    warnings: List[Dict[str, Any]] = []
+
+    comp = parsed.get("composition", {})
+    ingredients = comp.get("ingredients", [])
+    if isinstance(ingredients, list):
+        for i, ing in enumerate(ingredients):
+            if not isinstance(ing, dict):
+                continue
+            cas_obj = ing.get("cas")
+            if not isinstance(cas_obj, dict):
+                continue
+            cas_val = cas_obj.get("value")
+            if not isinstance(cas_val, str) or not cas_val.strip():
+                continue
+
+            norm = legacy_normalize_cas(cas_val)
+            if normalize and norm != cas_val:
+                cas_obj["value"] = norm
+
+            if not validate_cas_value(norm):
+                _warn(
+                    warnings,
+                    f"composition.ingredients[{i}].cas.value",
+                    "cas_format",
+                    "CAS number does not match expected pattern #######-##-#.",
+                    norm,
+                )
+
+    doc = parsed.get("document", {})
+    for k in ("issue_date", "revision_date"):
+        obj = doc.get(k)
+        if not isinstance(obj, dict):
+            continue
+        v = obj.get("value")
+        if v is None:
+            continue
+        if not isinstance(v, str) or not v.strip():
+            continue
+
+        if not validate_us_date(v):
+            _warn(
+                warnings,
+                f"document.{k}.value",
+                "date_format",
+                "Date is not a valid MM-DD-YYYY date.",
+                v,
+            )
+
+    return warnings
+
+
+def _field(value: Any) -> Dict[str, Any]:
+    return {"value": value, "evidence": f"evidence for {value}", "confidence": 0.9}
+
+
+def synthetic_output(rng: random.Random, ingredients: int, statements: int, cas_pool: int) -> Dict[str, Any]:
+    """
+    A model-shaped output with many ingredients/statements and a mix of good
+    and bad values. CAS numbers are drawn from `cas_pool` distinct registry
+    numbers (0 = every CAS number random), as real corpora reuse a few
+    thousand common substances.
+    """
+    def number() -> str:
+        if cas_pool:
+            n = rng.randrange(cas_pool)
+            return f"{50 + n * 37}-{10 + n % 90}-{n % 10}"
+        return f"{rng.randint(50, 9999999)}-{rng.randint(10, 99)}-{rng.randint(0, 9)}"
+
+    def cas() -> Any:
+        roll = rng.random()
+        if roll < 0.05:
+            return None
+        if roll < 0.15:
+            return f" {number().replace('-', ' – ')} "
+        if roll < 0.2:
+            return "not-a-cas"
+        return number()
+
+    return {
+        "document": {
+            "product_name": _field("Synthetic product"),
+            "issue_date": _field(rng.choice(["02-07-2023", "2023-02-07", None])),
+            "revision_date": _field(rng.choice(["10-25-2025", "25 October 2025", "13-45-2020"])),
+        },
+        "transport": {"un_number": _field("UN1263"), "hazard_class": _field("3"), "packing_group": _field("III")},
+        "composition": {
+            "ingredients": [
+                {"name": _field(f"chemical {i}"), "cas": _field(cas()), "concentration": _field("1 - 5")}
+                for i in range(ingredients)
+            ]
+        },
+        "hazards": {
+            "ghs_signal_word": _field("Danger"),
+            "hazard_statements": [_field(f"H{300 + i % 99} statement {i}") for i in range(statements)],
+            "precautionary_statements": [_field(f"P{200 + i % 99} statement {i}") for i in range(statements)],
+        },
+        "meta": {"notes": ""},
+    }
+
+
+def _time_per_doc(fn: Callable[[Dict[str, Any]], Any], docs: List[Dict[str, Any]], repeat: int) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        batch = copy.deepcopy(docs)
+        clear_guardrail_cache()  # every run starts cold
+        t0 = time.perf_counter()
+        for d in batch:
+            fn(d)
+        runs.append((time.perf_counter() - t0) / len(batch) * 1e6)
+    return runs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Guardrail engine micro-benchmark")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--ingredients", type=int, default=8)
+    parser.add_argument("--statements", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cas-pool", type=int, default=2000, help="Distinct CAS numbers (0: all random)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [synthetic_output(rng, args.ingredients, args.statements, args.cas_pool) for _ in range(args.docs)]
+
+    # Parity: same warnings and same normalized documents.
+    a, b = copy.deepcopy(docs), copy.deepcopy(docs)
+    legacy = [legacy_apply_format_guardrails(d) for d in a]
+    engine = [apply_format_guardrails(d) for d in b]
+    if not (legacy == engine and a == b):
+        print("MISMATCH between legacy and rules-engine guardrails", file=sys.stderr)
+        return 1
+
+    results = {
+        "legacy": _time_per_doc(legacy_apply_format_guardrails, docs, args.repeat),
+        "rules_engine": _time_per_doc(apply_format_guardrails, docs, args.repeat),
+    }
+
+    print(
+        f"docs={args.docs} ingredients/doc={args.ingredients} statements/doc={args.statements} cas_pool={args.cas_pool} "
+        f"warnings/doc={sum(map(len, legacy)) / len(legacy):.1f}"
+    )
+    for name, runs in results.items():
+        print(f"{name:20s} median={statistics.median(runs):9.1f} us/doc  min={min(runs):9.1f} us/doc")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
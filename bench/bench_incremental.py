@@ -0,0 +1,121 @@
+"""
+Incremental re-extraction check and benchmark: for N synthetic products,
+extract revision 1, then extract revision 2 (new revision date and one
+changed hazard statement) both in full and incrementally against the stored
+revision 1, and compare.
+
+    python bench/bench_incremental.py --products 10 --latency 0.3 --tokens-per-s 200
+
+eval.evaluate scores the incremental output against the full re-run (every
+value, evidence and confidence leaf) and against the revision 2 ground truth;
+the command exits with status 1 if any incremental output differs from its
+full re-run. Also reports the model tokens and LLM time of both runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import copy
+import io
+import random
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from openai import OpenAI  # noqa: E402
+
+from eval import evaluate  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+from main import Extractor  # noqa: E402
+from revisions import RevisionStore  # noqa: E402
+from synthetic_sds import model_response, synthetic_pages, synthetic_truth, write_pdf  # noqa: E402
+
+
+def revision_pair(rng: random.Random, pages: int) -> Tuple[List[str], Dict[str, Any], List[str], Dict[str, Any]]:
+    """Page texts and truth of two revisions differing in revision date and one hazard statement."""
+    truth1 = synthetic_truth(rng, 8, 5)
+    pages1 = synthetic_pages(rng, truth1, pages)
+    truth2 = copy.deepcopy(truth1)
+    old_date = truth1["document"]["revision_date"]["value"]
+    new_date = f"{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}-2025"
+    truth2["document"]["revision_date"]["value"] = new_date
+    statement = truth2["hazards"]["hazard_statements"][0]
+    old_statement = statement["value"]
+    statement["value"] = old_statement.rstrip(".") + " or in contact with skin."
+    pages2 = [p.replace(old_date, new_date).replace(old_statement, statement["value"]) for p in pages1]
+    return pages1, truth1, pages2, truth2
+
+
+def _strip_meta(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in parsed.items() if k != "meta"}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake LLM latency (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=200.0, help="Fake LLM generation speed")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = []
+    with contextlib.ExitStack() as stack:
+        tmp = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="sds_revisions_")))
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+        revisions = stack.enter_context(RevisionStore(tmp / "revisions.sqlite"))
+        for i in range(args.products):
+            pages1, truth1, pages2, truth2 = revision_pair(rng, args.pages)
+            rev1, rev2 = tmp / f"product_{i}_rev1.pdf", tmp / f"product_{i}_rev2.pdf"
+            write_pdf(pages1, rev1)
+            write_pdf(pages2, rev2)
+            fake = {"latency": args.latency, "tokens_per_s": args.tokens_per_s}
+            with FakeLLMServer(response=model_response(truth1), **fake) as srv:
+                Extractor(OpenAI(base_url=srv.base_url, api_key="fake"), revisions=revisions).extract(rev1)
+            with FakeLLMServer(response=model_response(truth2), **fake) as srv:
+                client = OpenAI(base_url=srv.base_url, api_key="fake")
+                full = Extractor(client).extract(rev2)
+                inc = Extractor(client, revisions=revisions).extract(rev2)
+            info = inc["parsed"]["meta"].get("incremental", {})
+            rows.append({
+                "product": i,
+                "changed_sections": info.get("changed_sections"),
+                "carried_groups": info.get("carried_groups", []),
+                "reextracted_groups": info.get("reextracted_groups", []),
+                "vs_full": evaluate(_strip_meta(inc["parsed"]), _strip_meta(full["parsed"]))["accuracy"],
+                "vs_truth": evaluate(inc["parsed"], truth2)["accuracy"],
+                "full_tokens": full["usage"]["input_tokens"] + full["usage"]["output_tokens"],
+                "inc_tokens": inc["usage"]["input_tokens"] + inc["usage"]["output_tokens"],
+                "full_llm_ms": full["timings_ms"].get("llm_call_ms", 0.0),
+                "inc_llm_ms": inc["timings_ms"].get("llm_call_ms", 0.0),
+            })
+
+    for r in rows:
+        print(f"product {r['product']}: changed sections {r['changed_sections']} "
+              f"re-extracted {','.join(r['reextracted_groups']) or '-'} carried {len(r['carried_groups'])} groups; "
+              f"matches full run {r['vs_full']}%, truth {r['vs_truth']}%; "
+              f"tokens {r['full_tokens']} -> {r['inc_tokens']}")
+    full_tokens = sum(r["full_tokens"] for r in rows)
+    inc_tokens = sum(r["inc_tokens"] for r in rows)
+    print(f"tokens: full={full_tokens} incremental={inc_tokens} "
+          f"({(full_tokens - inc_tokens) / full_tokens * 100 if full_tokens else 0.0:.1f}% saved)")
+    print(f"llm ms median: full={statistics.median(r['full_llm_ms'] for r in rows):.0f} "
+          f"incremental={statistics.median(r['inc_llm_ms'] for r in rows):.0f}")
+    mismatched = [r["product"] for r in rows if r["vs_full"] != 100.0]
+    if mismatched:
+        print(f"MISMATCH incremental output differs from the full re-run for products {mismatched}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
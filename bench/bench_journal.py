@@ -0,0 +1,63 @@
+"""
+Resume overhead of the batch journal: time to plan a run over N already
+finished documents (what a restart after a crash pays before any real work),
+per document, for growing manifest sizes.
+
+    python bench/bench_journal.py --sizes 1000 10000 100000
+
+Inputs and outputs are small files in a temporary directory; no extraction
+is run. The first plan hashes every input, a resume only stats them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from journal import BatchJournal  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'documents':>10} {'first plan us/doc':>18} {'finish us/doc':>14} {'resume plan us/doc':>19}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="sds_journal_") as tmp:
+            root = Path(tmp)
+            inputs = [root / "in" / f"sds_{i:06d}.txt" for i in range(n)]
+            outputs = [root / "out" / f"sds_{i:06d}.json" for i in range(n)]
+            for d in ("in", "out"):
+                (root / d).mkdir()
+            for i, (p, o) in enumerate(zip(inputs, outputs)):
+                p.write_text(f"SDS {i}", encoding="utf-8")
+                o.write_text("{}", encoding="utf-8")
+
+            with BatchJournal(root / "journal.sqlite") as journal:
+                t0 = time.perf_counter()
+                todo, _ = journal.plan(inputs, outputs)
+                first = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                for i in todo:
+                    journal.start(inputs[i])
+                    journal.finish(inputs[i], {"input": str(inputs[i]), "status": "ok"})
+                finish = time.perf_counter() - t0
+
+            with BatchJournal(root / "journal.sqlite") as journal:
+                t0 = time.perf_counter()
+                todo, plan = journal.plan(inputs, outputs)
+                resume = time.perf_counter() - t0
+            assert not todo and plan["done"] == n, plan
+            print(f"{n:>10} {first / n * 1e6:>18.1f} {finish / n * 1e6:>14.1f} {resume / n * 1e6:>19.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+"""
+Near-duplicate index benchmark: build a MinHash LSH index of N synthetic
+documents, then time lookups of relabeled copies (product name, supplier and
+line layout changed) and of unrelated documents, reporting recall, false
+matches, lookup latency against a linear scan, index size and peak RSS.
+
+    python bench/bench_neardup.py --docs 100000 --queries 500
+
+Documents are random 600-word texts over a 5,000-word vocabulary; a
+relabeled copy changes ~1% of its words plus whitespace.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import resource
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from batch import percentile  # noqa: E402
+from neardup import NearDuplicateIndex, signature, similarity  # noqa: E402
+
+
+def _text(rng: random.Random, vocabulary: List[str], words: int) -> str:
+    lines, line = [], []
+    for _ in range(words):
+        line.append(rng.choice(vocabulary))
+        if len(line) >= 12:
+            lines.append(" ".join(line))
+            line = []
+    return "\n".join(lines + [" ".join(line)])
+
+
+def relabel(rng: random.Random, text: str, vocabulary: List[str]) -> str:
+    """Another product name / supplier on a few lines, and re-flowed whitespace."""
+    words = text.split()
+    for _ in range(max(1, len(words) // 100)):
+        words[rng.randrange(len(words))] = rng.choice(vocabulary).upper()
+    return "  ".join(" ".join(words[i:i + 9]) for i in range(0, len(words), 9))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--words", type=int, default=600)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [f"w{i}" for i in range(5000)]
+    with tempfile.TemporaryDirectory(prefix="sds_neardup_") as tmp:
+        path = Path(tmp) / "neardup.sqlite"
+        kept = {}
+        sample = set(rng.sample(range(args.docs), min(args.queries, args.docs)))
+        sig_s = 0.0
+        t0 = time.perf_counter()
+        with NearDuplicateIndex(path, args.threshold) as index:
+            batch = []
+            for i in range(args.docs):
+                text = _text(rng, vocabulary, args.words)
+                t1 = time.perf_counter()
+                sig = signature(text)
+                sig_s += time.perf_counter() - t1
+                if i in sample:
+                    kept[i] = text
+                batch.append((f"doc_{i}", f"sha_{i}", sig, {}, None))
+                if len(batch) == 1000:
+                    index.add_many(batch)
+                    batch = []
+            index.add_many(batch)
+            build_s = time.perf_counter() - t0
+            print(f"indexed {args.docs} documents in {build_s:.1f}s "
+                  f"(signature {sig_s / args.docs * 1000:.2f} ms/doc), index {path.stat().st_size / 1e6:.0f} MB")
+
+            hits = wrong = 0
+            sims, times = [], []
+            for i, text in kept.items():
+                sig = signature(relabel(rng, text, vocabulary))
+                t1 = time.perf_counter()
+                match = index.query(sig)
+                times.append((time.perf_counter() - t1) * 1000.0)
+                if match is not None and match["source"] == f"doc_{i}":
+                    hits += 1
+                    sims.append(match["similarity"])
+                elif match is not None:
+                    wrong += 1
+            false_matches = 0
+            miss_times = []
+            for _ in range(len(kept)):
+                sig = signature(_text(rng, vocabulary, args.words))
+                t1 = time.perf_counter()
+                false_matches += index.query(sig) is not None
+                miss_times.append((time.perf_counter() - t1) * 1000.0)
+
+            # What the same lookup costs without LSH: compare with every stored signature.
+            t1 = time.perf_counter()
+            best = 0.0
+            with index._lock:
+                for (blob,) in index._conn.execute("SELECT signature FROM documents"):
+                    best = max(best, similarity(sig, array("I", blob)))
+            scan_ms = (time.perf_counter() - t1) * 1000.0
+
+    print(f"relabeled copies: recall {hits}/{len(kept)} wrong_match={wrong} "
+          f"similarity median={percentile(sims, 50)} min={min(sims) if sims else None}")
+    print(f"unrelated documents: false matches {false_matches}/{len(kept)}")
+    print(f"lookup ms: hit p50={percentile(times, 50):.3f} p95={percentile(times, 95):.3f}  "
+          f"miss p50={percentile(miss_times, 50):.3f} p95={percentile(miss_times, 95):.3f}  "
+          f"linear scan={scan_ms:.0f}")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"peak RSS {rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+"""
+End-to-end pipeline benchmark on a synthetic SDS corpus against the local
+fake LLM: documents/minute, per-stage latency percentiles (PDF read,
+compaction, prompt build, LLM call, guardrails, evaluation, ...), accuracy
+and peak memory, saved as JSON so runs can be compared.
+
+    python bench/bench_pipeline.py --docs 50 --pages 12 --latency 0.2 --out bench_pipeline.json
+    python bench/bench_pipeline.py --docs 50 --baseline bench_pipeline.json --max-regression 10
+
+The corpus is generated by synthetic_sds.py into a temporary directory (or
+reused with --corpus DIR); the fake server answers every request with the
+corpus's canned ground-truth answer. With --baseline, the exit status is 1
+when throughput or any stage's p95 is more than --max-regression percent
+worse than in the baseline file. --tracemalloc adds the Python heap peak
+(and slows the run down).
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from openai import OpenAI  # noqa: E402
+
+from batch import percentile, run_batch  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+from main import Extractor  # noqa: E402
+from synthetic_sds import write_corpus  # noqa: E402
+
+PERCENTILES = (50, 90, 95, 99)
+# Stages faster than this (ms at p95) are too noisy to flag as regressions.
+MIN_STAGE_MS = 1.0
+
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def stage_table(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[float]]]:
+    per_stage: Dict[str, List[float]] = {}
+    for r in records:
+        for stage, ms in (r.get("timings_ms") or {}).items():
+            per_stage.setdefault(stage.removesuffix("_ms"), []).append(ms)
+    return {
+        stage: {f"p{p}": percentile(values, p) for p in PERCENTILES}
+        for stage, values in sorted(per_stage.items())
+    }
+
+
+def regressions(result: Dict[str, Any], baseline: Dict[str, Any], max_pct: float) -> List[str]:
+    """Human-readable list of metrics more than `max_pct` percent worse than the baseline."""
+    found = []
+    old, new = baseline["docs_per_minute"], result["docs_per_minute"]
+    if old and new < old * (1 - max_pct / 100.0):
+        found.append(f"docs_per_minute {old} -> {new}")
+    for stage, cur in result["stages_ms"].items():
+        prev = baseline.get("stages_ms", {}).get(stage)
+        if not prev or prev["p95"] is None or max(prev["p95"], cur["p95"]) < MIN_STAGE_MS:
+            continue
+        if cur["p95"] > prev["p95"] * (1 + max_pct / 100.0):
+            found.append(f"{stage} p95 {prev['p95']} -> {cur['p95']} ms")
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--ingredients", type=int, default=8)
+    parser.add_argument("--statements", type=int, default=5)
+    parser.add_argument("--format", choices=("pdf", "txt"), default="pdf")
+    parser.add_argument("--corpus", type=Path, default=None,
+                        help="Generate the corpus here (kept) instead of a temporary directory; reused if present")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mode", choices=("single", "fanout"), default="single")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="Fake LLM generation speed (0 = instant)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report the Python heap peak")
+    parser.add_argument("--verbose", action="store_true", help="Show the per-document pipeline log")
+    parser.add_argument("--out", type=Path, default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, default=None, help="Results JSON of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Percent (default: 10)")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        corpus = args.corpus or Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="sds_corpus_")))
+        t0 = time.perf_counter()
+        existing = sorted((corpus / "inputs").glob(f"*.{args.format}")) if args.corpus else []
+        if len(existing) >= args.docs:
+            inputs, truth_dir = existing[:args.docs], corpus / "truth"
+            answer = json.loads((corpus / "model_response.json").read_text(encoding="utf-8"))
+        else:
+            inputs, truth_dir, answer = write_corpus(
+                corpus, args.docs, args.pages, args.ingredients, args.statements, args.format, args.seed
+            )
+            (corpus / "model_response.json").write_text(json.dumps(answer), encoding="utf-8")
+        generate_s = time.perf_counter() - t0
+        out_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="sds_bench_out_")))
+
+        fake = stack.enter_context(FakeLLMServer(
+            latency=args.latency, jitter=args.jitter, tokens_per_s=args.tokens_per_s, response=answer,
+        ))
+        extractor = Extractor(OpenAI(base_url=fake.base_url, api_key="fake"), mode=args.mode)
+        if args.tracemalloc:
+            tracemalloc.start()
+        log = None if args.verbose else stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+        summary = run_batch(inputs, extractor, out_dir, concurrency=args.concurrency, truth_dir=truth_dir)
+        heap_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+        if args.tracemalloc:
+            tracemalloc.stop()
+        del log
+
+    records = summary["documents_detail"]
+    accuracies = [r["accuracy"] for r in records if "accuracy" in r]
+    latencies = [r["latency_s"] for r in records if r["status"] != "failed"]
+    result: Dict[str, Any] = {
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()
+                   if k not in ("out", "baseline", "verbose")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "generate_s": round(generate_s, 3),
+        "documents": summary["documents"],
+        "ok": summary["ok"],
+        "failed": summary["failed"] + summary["invalid_json"],
+        "wall_time_s": summary["wall_time_s"],
+        "docs_per_minute": summary["docs_per_minute"],
+        "latency_s": {f"p{p}": percentile(latencies, p) for p in PERCENTILES},
+        "stages_ms": stage_table(records),
+        "accuracy_mean": round(statistics.mean(accuracies), 2) if accuracies else None,
+        "usage": summary["usage"],
+        "peak_rss_mb": _peak_rss_mb(),
+        "python_heap_peak_mb": round(heap_peak / 1e6, 1) if heap_peak is not None else None,
+    }
+
+    print(f"documents={result['documents']} ok={result['ok']} failed={result['failed']} "
+          f"docs/min={result['docs_per_minute']} accuracy={result['accuracy_mean']}% "
+          f"peak_rss={result['peak_rss_mb']} MB"
+          + (f" heap_peak={result['python_heap_peak_mb']} MB" if heap_peak is not None else ""))
+    print(f"{'stage':>16} " + " ".join(f"{'p' + str(p) + ' ms':>10}" for p in PERCENTILES))
+    for stage, pct in result["stages_ms"].items():
+        print(f"{stage:>16} " + " ".join(f"{pct['p' + str(p)]:>10.2f}" for p in PERCENTILES))
+
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    if args.baseline:
+        found = regressions(result, json.loads(args.baseline.read_text(encoding="utf-8")), args.max_regression)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
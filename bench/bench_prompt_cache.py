@@ -0,0 +1,129 @@
+"""
+Prompt-cache benchmark: run the same synthetic batch against the local fake
+LLM with simulated prompt-prefix caching, once with the old prompt layout
+(document text before the schema and rules) and once with the current one
+(static prefix first, document text last), and compare cached input tokens,
+cost and LLM latency.
+
+    python bench/bench_prompt_cache.py --docs 40 --latency 0.2 --prefill-tokens-per-s 5000
+
+The fake server reads uncached input tokens at --prefill-tokens-per-s, so
+time to first token grows with the uncached part of the prompt. Cost uses
+the per-million-token prices given (defaults: gpt-4o-mini, cached input at
+half price).
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from openai import OpenAI  # noqa: E402
+
+import main as pipeline  # noqa: E402
+from batch import run_batch  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+from prompts import RULES, schema_json  # noqa: E402
+from synthetic_sds import write_corpus  # noqa: E402
+
+
+def text_first_prompt(text: str, hints: str = "", omit=()) -> str:
+    """The user prompt as laid out before the static prefix: content, then schema and rules."""
+    return f"""
+Extract key SDS fields from the following content.
+
+SDS CONTENT:
+\"\"\"
+{text}
+\"\"\"
+{hints}
+Return JSON with this exact structure:
+{schema_json(omit=omit)}
+
+{RULES}"""
+
+
+def cost_usd(usage: Dict[str, Any], args: argparse.Namespace) -> float:
+    return (
+        usage["uncached_input_tokens"] * args.input_price
+        + usage["cached_tokens"] * args.cached_input_price
+        + usage["output_tokens"] * args.output_price
+    ) / 1e6
+
+
+def run_layout(layout: str, inputs: List[Path], answer: Dict[str, Any], out_dir: Path,
+               args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeLLMServer(
+        latency=args.latency,
+        tokens_per_s=args.tokens_per_s,
+        response=answer,
+        prefix_cache=True,
+        prefill_tokens_per_s=args.prefill_tokens_per_s,
+    )
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(fake)
+        if layout == "text-first":
+            stack.enter_context(mock.patch.object(pipeline, "user_prompt", text_first_prompt))
+        extractor = pipeline.Extractor(OpenAI(base_url=fake.base_url, api_key="fake"))
+        summary = run_batch(inputs, extractor, out_dir / layout, concurrency=args.concurrency)
+    llm = summary["stage_latency_ms"].get("llm_call_ms", {})
+    return {
+        "layout": layout,
+        "usage": summary["usage"],
+        "cost_usd": cost_usd(summary["usage"], args),
+        "llm_p50_ms": llm.get("p50"),
+        "llm_p95_ms": llm.get("p95"),
+        "docs_per_minute": summary["docs_per_minute"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM base latency (s)")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="Fake LLM generation speed")
+    parser.add_argument("--prefill-tokens-per-s", type=float, default=5000.0,
+                        help="Fake LLM reading speed for uncached input tokens")
+    parser.add_argument("--input-price", type=float, default=0.15, help="USD per 1M uncached input tokens")
+    parser.add_argument("--cached-input-price", type=float, default=0.075, help="USD per 1M cached input tokens")
+    parser.add_argument("--output-price", type=float, default=0.60, help="USD per 1M output tokens")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    rows = []
+    with contextlib.ExitStack() as stack:
+        tmp = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="sds_prompt_cache_")))
+        inputs, _, answer = write_corpus(tmp / "corpus", args.docs, args.pages, seed=args.seed)
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stderr(io.StringIO()))
+        for layout in ("text-first", "static-prefix"):
+            rows.append(run_layout(layout, inputs, answer, tmp / "out", args))
+
+    print(f"{'layout':<14} {'input':>9} {'cached':>9} {'share':>6} {'cost $':>9} "
+          f"{'llm p50':>8} {'llm p95':>8} {'docs/min':>9}")
+    for r in rows:
+        u = r["usage"]
+        print(f"{r['layout']:<14} {u['input_tokens']:>9} {u['cached_tokens']:>9} "
+              f"{(u['cached_share'] or 0.0) * 100:>5.1f}% {r['cost_usd']:>9.4f} "
+              f"{r['llm_p50_ms']:>8.0f} {r['llm_p95_ms']:>8.0f} {r['docs_per_minute']:>9.1f}")
+    old, new = rows
+    if old["cost_usd"]:
+        print(f"static prefix: cost {(old['cost_usd'] - new['cost_usd']) / old['cost_usd'] * 100:.1f}% lower, "
+              f"llm p50 {old['llm_p50_ms'] - new['llm_p50_ms']:.0f} ms faster")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""
+End-to-end throughput benchmark for src/service.py against the local fake LLM.
+
+    python bench/bench_service.py --jobs 200 --workers 8 --queue-size 32 --latency 0.5
+
+Reports sustained jobs/minute, queue wait and run time percentiles, and how
+many submissions were pushed back with 429.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from openai import OpenAI  # noqa: E402
+
+from batch import percentile  # noqa: E402
+from fake_llm import FakeLLMServer  # noqa: E402
+from main import Extractor  # noqa: E402
+from service import ExtractionService, make_server  # noqa: E402
+
+
+def _request(method: str, url: str, data: bytes = None):
+    req = urllib.request.Request(url, data=data, method=method)
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent submitting clients")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM latency (s)")
+    parser.add_argument("--input", type=Path, default=ROOT / "samples" / "getpdf.pdf")
+    parser.add_argument("--out", type=Path, default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    data = args.input.read_bytes()
+    with FakeLLMServer(latency=args.latency) as fake:
+        extractor = Extractor(OpenAI(base_url=fake.base_url, api_key="fake"))
+        service = ExtractionService(extractor, workers=args.workers, queue_size=args.queue_size)
+        httpd = make_server(service, port=0)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+        job_ids = []
+        rejected = 0
+        lock = threading.Lock()
+        remaining = iter(range(args.jobs))
+
+        def client() -> None:
+            nonlocal rejected
+            for _ in remaining:
+                while True:
+                    status, body = _request("POST", f"{base}/jobs?filename={args.input.name}", data)
+                    if status == 202:
+                        with lock:
+                            job_ids.append(body["job_id"])
+                        break
+                    with lock:
+                        rejected += 1
+                    time.sleep(0.05)
+
+        t0 = time.perf_counter()
+        clients = [threading.Thread(target=client) for _ in range(args.clients)]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+
+        statuses = {}
+        while len(statuses) < len(job_ids):
+            for jid in job_ids:
+                if jid in statuses:
+                    continue
+                _, body = _request("GET", f"{base}/jobs/{jid}")
+                if body["status"] in ("done", "failed"):
+                    statuses[jid] = body
+            time.sleep(0.05)
+        wall = time.perf_counter() - t0
+
+        service.drain()
+        httpd.shutdown()
+        httpd.server_close()
+
+    waits = [s["queue_wait_s"] for s in statuses.values()]
+    runs = [s["run_s"] for s in statuses.values()]
+    results = {
+        "jobs": args.jobs,
+        "workers": args.workers,
+        "queue_size": args.queue_size,
+        "fake_latency_s": args.latency,
+        "wall_s": round(wall, 3),
+        "jobs_per_minute": round(args.jobs / wall * 60, 2),
+        "failed": sum(1 for s in statuses.values() if s["status"] == "failed"),
+        "rejected_429": rejected,
+        "queue_wait_p50_s": percentile(waits, 50),
+        "queue_wait_p95_s": percentile(waits, 95),
+        "run_p50_s": percentile(runs, 50),
+        "run_p95_s": percentile(runs, 95),
+    }
+    print(json.dumps(results, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+"""
+Result store benchmark: ingest throughput of synthetic extraction outputs
+into store.ResultStore at different transaction sizes, then query latency
+(CAS with a concentration threshold, UN number, product code) on the full
+store.
+
+    python bench/bench_store.py --docs 100000 --flush-every 1 100 1000
+
+Transaction sizes below 100 are only timed on the first 2,000 documents
+(one commit per document does not finish a 100k batch in useful time).
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from batch import percentile  # noqa: E402
+from store import ResultStore  # noqa: E402
+
+SMALL_FLUSH_DOCS = 2000
+
+
+def _field(value: Any) -> Dict[str, Any]:
+    return {"value": value, "evidence": None, "confidence": 0.9}
+
+
+def synthetic_output(rng: random.Random, i: int, ingredients: int, statements: int, cas_pool: List[str]) -> Dict[str, Any]:
+    """One extraction output in the shape main.py writes."""
+    low = rng.randint(0, 60)
+    return {
+        "document": {
+            "product_name": _field(f"Product {i}"),
+            "product_code": _field(f"PC{rng.randint(1, 50_000):06d}"),
+            "version_number": _field(str(rng.randint(1, 9))),
+            "revision_date": _field(f"{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}-2024"),
+            "supplier_name": _field(f"Supplier {rng.randint(1, 500)}"),
+        },
+        "transport": {
+            "un_number": _field(f"UN{rng.randint(1000, 3500)}"),
+            "hazard_class": _field(str(rng.randint(1, 9))),
+            "packing_group": _field(rng.choice(["I", "II", "III"])),
+        },
+        "composition": {
+            "ingredients": [
+                {
+                    "name": _field(f"chemical {rng.randint(1, 10**6)}"),
+                    "cas": _field(rng.choice(cas_pool)),
+                    "concentration": _field(rng.choice([f"{low} - {low + rng.randint(1, 30)}", f"< {low + 1}", f">= {low}"])),
+                }
+                for _ in range(ingredients)
+            ]
+        },
+        "hazards": {
+            "ghs_signal_word": _field(rng.choice(["Danger", "Warning"])),
+            "hazard_statements": [_field(f"H{300 + k} Statement text {k}") for k in range(statements)],
+            "precautionary_statements": [_field(f"P{200 + k} Statement text {k}") for k in range(statements)],
+        },
+        "meta": {
+            "input_filename": f"sds_{i:06d}.pdf",
+            "run_id": f"run-{i}",
+            "model": "gpt-4o-mini",
+            "usage": {"input_tokens": rng.randint(2000, 6000), "output_tokens": rng.randint(300, 900)},
+            "timings": {"total_ms": rng.uniform(1000, 5000)},
+            "validation_warnings": [
+                {"field": "composition.ingredients[0].cas", "rule": "cas_checksum", "message": "bad checksum", "value": "1-2-3"}
+            ] if rng.random() < 0.1 else [],
+        },
+    }
+
+
+def _ingest(path: Path, docs: List[Dict[str, Any]], flush_every: int) -> float:
+    t0 = time.perf_counter()
+    with ResultStore(path, flush_every=flush_every) as store:
+        for i, parsed in enumerate(docs):
+            store.add(parsed, f"in/sds_{i:06d}.pdf")
+    return time.perf_counter() - t0
+
+
+def _latency(fn, args: List[Any]) -> Dict[str, float]:
+    times = []
+    rows = 0
+    for a in args:
+        t0 = time.perf_counter()
+        rows += len(fn(*a))
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return {"p50_ms": percentile(times, 50), "p95_ms": percentile(times, 95), "rows_avg": rows / len(args)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--ingredients", type=int, default=8)
+    parser.add_argument("--statements", type=int, default=5)
+    parser.add_argument("--cas-pool", type=int, default=5000, help="Distinct CAS numbers across the corpus")
+    parser.add_argument("--flush-every", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cas_pool = [f"{rng.randint(50, 99999)}-{rng.randint(10, 99)}-{rng.randint(0, 9)}" for _ in range(args.cas_pool)]
+    t0 = time.perf_counter()
+    docs = [synthetic_output(rng, i, args.ingredients, args.statements, cas_pool) for i in range(args.docs)]
+    print(f"generated {len(docs)} documents in {time.perf_counter() - t0:.1f}s")
+
+    print(f"{'flush_every':>11} {'documents':>10} {'docs/s':>10} {'rows/s':>10}")
+    rows_per_doc = 1 + args.ingredients + 2 * args.statements + 2  # documents + ingredients + hazards + transport + meta
+    with tempfile.TemporaryDirectory(prefix="sds_store_") as tmp:
+        full = None
+        for flush_every in args.flush_every:
+            subset = docs if flush_every >= 100 else docs[:SMALL_FLUSH_DOCS]
+            path = Path(tmp) / f"store_{flush_every}.sqlite"
+            elapsed = _ingest(path, subset, flush_every)
+            print(f"{flush_every:>11} {len(subset):>10} {len(subset) / elapsed:>10.0f} "
+                  f"{len(subset) * rows_per_doc / elapsed:>10.0f}")
+            if len(subset) == len(docs):
+                full = path
+        if full is None:
+            full = Path(tmp) / "store_full.sqlite"
+            _ingest(full, docs, max(args.flush_every))
+
+        with ResultStore(full) as store:
+            counts = store.counts()
+            print(f"store: {counts['documents']} documents, {counts['ingredients']} ingredients, "
+                  f"{full.stat().st_size / 1e6:.0f} MB")
+            qrng = random.Random(args.seed + 1)
+            queries = {
+                "cas": (store.find_by_cas, [(qrng.choice(cas_pool), None) for _ in range(args.queries)]),
+                "cas --above 50": (store.find_by_cas, [(qrng.choice(cas_pool), 50.0) for _ in range(args.queries)]),
+                "un": (store.find_by_un, [(f"UN{qrng.randint(1000, 3500)}",) for _ in range(args.queries)]),
+                "product-code": (store.find_by_product_code,
+                                 [(f"PC{qrng.randint(1, 50_000):06d}",) for _ in range(args.queries)]),
+            }
+            print(f"{'query':>15} {'p50 ms':>8} {'p95 ms':>8} {'rows':>7}")
+            for name, (fn, qargs) in queries.items():
+                r = _latency(fn, qargs)
+                print(f"{name:>15} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['rows_avg']:>7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
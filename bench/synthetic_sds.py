@@ -0,0 +1,276 @@
+"""
+Synthetic SDS corpus for benchmarks: 16-section documents of configurable
+page, ingredient and statement count, written as text-layer PDFs (or plain
+text), each with a ground-truth JSON and the matching canned model answer.
+
+    python bench/synthetic_sds.py out/corpus --docs 50 --pages 12 --ingredients 8
+
+All documents of a corpus describe the same product (so one canned answer
+from the fake LLM server fits every one of them); their filler text, page
+layout and file contents differ.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from sections import SECTION_TITLES  # noqa: E402
+
+LINES_PER_PAGE = 64
+_WORDS = (
+    "product material exposure handling storage ventilation container contact skin eyes water "
+    "temperature vapour release spill protective equipment respiratory gloves conditions avoid "
+    "heat sources ignition keep closed dry place mixture substance data available information"
+).split()
+_HAZARD_TEXT = {
+    225: "Highly flammable liquid and vapour.",
+    302: "Harmful if swallowed.",
+    315: "Causes skin irritation.",
+    319: "Causes serious eye irritation.",
+    332: "Harmful if inhaled.",
+    336: "May cause drowsiness or dizziness.",
+    351: "Suspected of causing cancer.",
+    373: "May cause damage to organs through prolonged or repeated exposure.",
+    411: "Toxic to aquatic life with long lasting effects.",
+}
+_PRECAUTION_TEXT = {
+    210: "Keep away from heat, hot surfaces, sparks, open flames and other ignition sources.",
+    233: "Keep container tightly closed.",
+    261: "Avoid breathing mist or vapours.",
+    264: "Wash hands thoroughly after handling.",
+    280: "Wear protective gloves and eye protection.",
+    403: "Store in a well-ventilated place.",
+    501: "Dispose of contents and container in accordance with local regulations.",
+}
+
+
+def cas_number(rng: random.Random) -> str:
+    """A random CAS number with a valid check digit."""
+    body = str(rng.randint(1000, 999999999))
+    check = sum(int(d) * (i + 1) for i, d in enumerate(reversed(body))) % 10
+    return f"{body[:-2]}-{body[-2:]}-{check}"
+
+
+def synthetic_truth(rng: random.Random, ingredients: int, statements: int) -> Dict[str, Any]:
+    """Ground truth in the output shape, values only."""
+    hazard_codes = sorted(rng.sample(sorted(_HAZARD_TEXT), min(statements, len(_HAZARD_TEXT))))
+    precaution_codes = sorted(rng.sample(sorted(_PRECAUTION_TEXT), min(statements, len(_PRECAUTION_TEXT))))
+    low = [rng.randint(1, 20) for _ in range(ingredients)]
+    return {
+        "document": {
+            "product_name": {"value": f"Solvent Blend {rng.randint(100, 999)}"},
+            "product_code": {"value": f"SB-{rng.randint(10000, 99999)}"},
+            "physical_state": {"value": "Liquid"},
+            "version_number": {"value": f"{rng.randint(1, 9)}.{rng.randint(0, 9)}"},
+            "supplier_name": {"value": f"Example Chemicals {rng.randint(1, 99)} Inc."},
+            "emergency_phone": {"value": f"+1-800-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"},
+            "revision_date": {"value": f"{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}-2024"},
+        },
+        "transport": {
+            "un_number": {"value": f"UN{rng.randint(1000, 3500)}"},
+            "hazard_class": {"value": str(rng.randint(2, 9))},
+            "packing_group": {"value": rng.choice(["I", "II", "III"])},
+        },
+        "composition": {
+            "ingredients": [
+                {
+                    "name": {"value": f"Component {chr(65 + i % 26)}{i // 26 or ''} {rng.randint(1, 999)}"},
+                    "cas": {"value": cas_number(rng)},
+                    "concentration": {"value": f"{low[i]} - {low[i] + rng.randint(5, 30)}"},
+                }
+                for i in range(ingredients)
+            ]
+        },
+        "physical_chemical": {
+            "flash_point": {"value": f"{rng.randint(-20, 90)} °C"},
+            "ph": {"value": f"{rng.randint(3, 11)}"},
+        },
+        "hazards": {
+            "ghs_signal_word": {"value": rng.choice(["Danger", "Warning"])},
+            "hazard_statements": [{"value": f"H{c} {_HAZARD_TEXT[c]}"} for c in hazard_codes],
+            "precautionary_statements": [{"value": f"P{c} {_PRECAUTION_TEXT[c]}"} for c in precaution_codes],
+        },
+    }
+
+
+def model_response(truth: Dict[str, Any], confidence: float = 0.95) -> Dict[str, Any]:
+    """The answer a perfect model would give: truth values as field objects."""
+
+    def visit(node: Any) -> Any:
+        if isinstance(node, list):
+            return [visit(x) for x in node]
+        if isinstance(node, dict):
+            if "value" in node:
+                return {"value": node["value"], "evidence": node["value"], "confidence": confidence}
+            return {k: visit(v) for k, v in node.items()}
+        return node
+
+    answer = visit(truth)
+    answer["meta"] = {"notes": ""}
+    return answer
+
+
+def _filler(rng: random.Random, n: int) -> List[str]:
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 14))).capitalize() + "." for _ in range(n)]
+
+
+def _section_lines(rng: random.Random, truth: Dict[str, Any], number: int) -> List[str]:
+    v = lambda group, field: truth[group][field]["value"]  # noqa: E731
+    if number == 1:
+        return [
+            f"Product name: {v('document', 'product_name')}",
+            f"Product code: {v('document', 'product_code')}",
+            f"Supplier: {v('document', 'supplier_name')}",
+            f"Emergency telephone: {v('document', 'emergency_phone')}",
+        ]
+    if number == 2:
+        hz = truth["hazards"]
+        return (
+            [f"Signal word: {hz['ghs_signal_word']['value']}", "Hazard statements:"]
+            + [s["value"] for s in hz["hazard_statements"]]
+            + ["Precautionary statements:"]
+            + [s["value"] for s in hz["precautionary_statements"]]
+        )
+    if number == 3:
+        return ["Chemical name        CAS number      Concentration (%)"] + [
+            f"{i['name']['value']}    {i['cas']['value']}    {i['concentration']['value']}"
+            for i in truth["composition"]["ingredients"]
+        ]
+    if number == 9:
+        return [
+            f"Physical state: {v('document', 'physical_state')}",
+            f"Flash point: {v('physical_chemical', 'flash_point')}",
+            f"pH: {v('physical_chemical', 'ph')}",
+        ]
+    if number == 14:
+        return [
+            f"UN number: {v('transport', 'un_number')}",
+            f"Transport hazard class: {v('transport', 'hazard_class')}",
+            f"Packing group: {v('transport', 'packing_group')}",
+        ]
+    if number == 16:
+        return [f"Revision date: {v('document', 'revision_date')}", f"Version: {v('document', 'version_number')}"]
+    return []
+
+
+def synthetic_pages(rng: random.Random, truth: Dict[str, Any], pages: int) -> List[str]:
+    """Page texts of one SDS: the 16 sections spread over `pages` pages, filled with filler text."""
+    body_lines = LINES_PER_PAGE - 4
+    content: List[str] = []
+    for number, title in SECTION_TITLES.items():
+        content.append(f"SECTION {number}: {title}")
+        content.extend(_section_lines(rng, truth, number))
+        content.extend(_filler(rng, rng.randint(2, 6)))
+    # Pad with filler spread between the sections up to the requested length.
+    missing = max(0, pages * body_lines - len(content))
+    headings = [i for i, line in enumerate(content) if line.startswith("SECTION ")]
+    for k in sorted((rng.choice(headings[1:]) for _ in range(missing)), reverse=True):
+        content.insert(k, _filler(rng, 1)[0])
+    name = truth["document"]["product_name"]["value"]
+    date = truth["document"]["revision_date"]["value"]
+    total = max(1, -(-len(content) // body_lines))
+    out = []
+    for p in range(total):
+        lines = content[p * body_lines:(p + 1) * body_lines]
+        out.append("\n".join(
+            [f"SAFETY DATA SHEET  {name}", f"Revision date: {date}"] + lines + ["", f"Page {p + 1} of {total}"]
+        ))
+    return out
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(pages: List[str], path: Path) -> None:
+    """A minimal PDF with one Helvetica text line per input line."""
+    objects: List[bytes] = [b"", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for page in pages:
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        ops += [f"({_pdf_escape(line)}) '" for line in page.split("\n")]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("cp1252", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def write_corpus(
+    out_dir: Path,
+    docs: int,
+    pages: int = 12,
+    ingredients: int = 8,
+    statements: int = 5,
+    fmt: str = "pdf",
+    seed: int = 7,
+) -> Tuple[List[Path], Path, Dict[str, Any]]:
+    """
+    Write `docs` documents to out_dir/inputs and their truth files to
+    out_dir/truth (named <input stem>.json, as --truth-dir expects).
+    Returns (input paths, truth dir, canned model answer).
+    """
+    rng = random.Random(seed)
+    truth = synthetic_truth(rng, ingredients, statements)
+    inputs_dir, truth_dir = out_dir / "inputs", out_dir / "truth"
+    inputs_dir.mkdir(parents=True, exist_ok=True)
+    truth_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(docs):
+        texts = synthetic_pages(rng, truth, pages)
+        path = inputs_dir / f"sds_{i:05d}.{fmt}"
+        if fmt == "pdf":
+            write_pdf(texts, path)
+        else:
+            path.write_text("\n".join(texts), encoding="utf-8")
+        (truth_dir / f"{path.stem}.json").write_text(json.dumps(truth, indent=2), encoding="utf-8")
+        paths.append(path)
+    return paths, truth_dir, model_response(truth)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--ingredients", type=int, default=8)
+    parser.add_argument("--statements", type=int, default=5)
+    parser.add_argument("--format", choices=("pdf", "txt"), default="pdf")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    paths, _, answer = write_corpus(
+        args.out_dir, args.docs, args.pages, args.ingredients, args.statements, args.format, args.seed
+    )
+    (args.out_dir / "model_response.json").write_text(json.dumps(answer, indent=2), encoding="utf-8")
+    print(f"wrote {len(paths)} documents to {args.out_dir / 'inputs'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import glob
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from journal import BatchJournal
+from main import Extractor, utc_now_iso
+from store import ResultStore
+
+INPUT_SUFFIXES = (".pdf", ".txt")
+
+
+def collect_inputs(spec: str) -> List[Path]:
+    """
+    Resolve a batch input spec into a sorted list of files:
+      - a directory   -> every *.pdf / *.txt directly inside it
+      - a glob        -> every match (e.g. "sds/**/*.pdf")
+      - a *.pdf/*.txt -> that single input
+      - another file  -> manifest, one path per line (# comments allowed);
+                         relative paths resolve against the manifest's folder
+    """
+    p = Path(spec)
+    if p.is_dir():
+        return sorted(x for x in p.iterdir() if x.is_file() and x.suffix.lower() in INPUT_SUFFIXES)
+
+    if glob.has_magic(spec):
+        return sorted(Path(x) for x in glob.glob(spec, recursive=True) if Path(x).is_file())
+
+    if p.is_file() and p.suffix.lower() in INPUT_SUFFIXES:
+        return [p]
+
+    if p.is_file():
+        paths: List[Path] = []
+        for line in p.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = Path(line)
+            if not entry.is_absolute():
+                entry = p.parent / entry
+            paths.append(entry)
+        return paths
+
+    return []
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def stage_percentiles(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[float]]]:
+    """p50/p95 per pipeline stage (ms) over the records that carry timings."""
+    per_stage: Dict[str, List[float]] = {}
+    for r in records:
+        for stage, ms in (r.get("timings_ms") or {}).items():
+            per_stage.setdefault(stage, []).append(ms)
+    return {
+        stage: {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+        for stage, values in sorted(per_stage.items())
+    }
+
+
+def usage_summary(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summed token usage, with the share of input tokens served from the prompt cache."""
+    usage: Dict[str, Any] = {
+        k: sum((r.get("usage") or {}).get(k, 0) for r in records)
+        for k in ("requests", "input_tokens", "output_tokens", "cached_tokens")
+    }
+    usage["uncached_input_tokens"] = usage["input_tokens"] - usage["cached_tokens"]
+    usage["cached_share"] = round(usage["cached_tokens"] / usage["input_tokens"], 4) if usage["input_tokens"] else None
+    return usage
+
+
+def repair_summary(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """How many documents needed output repair, and how many were recovered."""
+    repairs = [r["repair"] for r in records if r.get("repair")]
+    repaired = sum(1 for r in repairs if r["repaired"])
+    return {
+        "needed": len(repairs),
+        "repaired": repaired,
+        "repair_rate": round(repaired / len(repairs), 4) if repairs else None,
+        "tokens_saved_est": sum(r["tokens_saved_est"] for r in repairs),
+    }
+
+
+def cascade_summary(records: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Per-document escalation rates of the model cascade (None when it was off)."""
+    rates = [r["escalation_rate"] for r in records if "escalation_rate" in r]
+    if not rates:
+        return None
+    return {
+        "documents": len(rates),
+        "escalated_documents": sum(1 for r in rates if r > 0),
+        "escalation_rate_mean": round(sum(rates) / len(rates), 4),
+        "escalation_rate_p95": percentile(rates, 95),
+    }
+
+
+def output_paths(inputs: List[Path], out_dir: Path) -> List[Path]:
+    """One <stem>.json per input; duplicate stems get a numeric suffix."""
+    seen: Dict[str, int] = {}
+    outs = []
+    for p in inputs:
+        n = seen.get(p.stem, 0)
+        seen[p.stem] = n + 1
+        name = p.stem if n == 0 else f"{p.stem}__{n}"
+        outs.append(out_dir / f"{name}.json")
+    return outs
+
+
+def _process_one(
+    extractor: Extractor,
+    file_path: Path,
+    out_path: Path,
+    truth_dir: Optional[Path],
+    journal: Optional[BatchJournal] = None,
+    store: Optional[ResultStore] = None,
+) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    if journal is not None:
+        journal.start(file_path)
+    record: Dict[str, Any] = {"input": str(file_path), "output": str(out_path)}
+    try:
+        if not file_path.exists():
+            raise FileNotFoundError(f"file not found: {file_path}")
+
+        truth_path = None
+        if truth_dir is not None:
+            candidate = truth_dir / f"{file_path.stem}.json"
+            truth_path = candidate if candidate.exists() else None
+
+        result = extractor.extract(file_path, truth_path, out_path=out_path)
+        if result["parsed"] is None:
+            # Keep the raw model text so the document can be inspected / re-parsed.
+            raw_path = out_path.with_suffix(".raw.txt")
+            raw_path.write_text(result["raw"], encoding="utf-8")
+            record.update(status="invalid_json", output=str(raw_path), error=result["error"])
+        else:
+            parsed = result["parsed"]
+            record.update(
+                status="ok",
+                warnings=len(parsed["meta"].get("validation_warnings", [])),
+                timings_ms=result["timings_ms"],
+                usage=result["usage"],
+            )
+            if "cache" in parsed["meta"]:
+                record["cache_hit"] = parsed["meta"]["cache"]["hit"]
+            if "eval" in parsed["meta"]:
+                record["accuracy"] = parsed["meta"]["eval"]["accuracy"]
+            if store is not None:
+                store.add(parsed, str(file_path))
+        repair = result.get("repair")
+        if repair:
+            record["repair"] = {"repaired": repair["repaired"], "tokens_saved_est": repair["tokens_saved_est"]}
+        cascade = result.get("cascade")
+        if cascade:
+            record["escalation_rate"] = cascade["escalation_rate"]
+    except Exception as e:
+        record.update(status="failed", error=f"{type(e).__name__}: {e}")
+    record["latency_s"] = round(time.perf_counter() - t0, 4)
+    if journal is not None:
+        journal.finish(file_path, record)
+    return record
+
+
+def run_batch(
+    inputs: List[Path],
+    extractor: Extractor,
+    out_dir: Path,
+    concurrency: int = 4,
+    truth_dir: Optional[Path] = None,
+    journal: Optional[BatchJournal] = None,
+    store: Optional[ResultStore] = None,
+) -> Dict[str, Any]:
+    """
+    Run `extractor` over many inputs with up to `concurrency` documents in
+    flight (the work is dominated by LLM round-trips, so threads sharing one
+    client are enough). Writes one output per input plus out_dir/batch_summary.json.
+
+    With a `journal`, every document's state is committed as it changes and
+    a re-run skips documents already done (see journal.BatchJournal); their
+    records from the earlier run are carried into the summary with
+    "resumed": true. Latency, usage and stage figures cover this run only.
+
+    With a `store`, every "ok" output is also written to the result store
+    (store.ResultStore); resumed documents missing from it are loaded from
+    their output files.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    outs = output_paths(inputs, out_dir)
+    started = utc_now_iso()
+    t0 = time.perf_counter()
+
+    todo = list(range(len(inputs)))
+    resumed: List[Dict[str, Any]] = []
+    journal_info: Optional[Dict[str, Any]] = None
+    if journal is not None:
+        todo, plan = journal.plan(inputs, outs)
+        skipped = set(range(len(inputs))).difference(todo)
+        stored = journal.records() if skipped else {}
+        resumed = [dict(stored[str(inputs[i])], resumed=True) for i in sorted(skipped) if str(inputs[i]) in stored]
+        journal_info = {
+            "path": str(journal.path),
+            "plan": plan,
+            "plan_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+        }
+        print(
+            f"[BATCH] journal {journal.path}: new={plan['new']} retry={plan['retry']} "
+            f"done={plan['done']} exhausted={plan['exhausted']}",
+            file=sys.stderr,
+        )
+
+    records: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [
+            pool.submit(_process_one, extractor, inputs[i], outs[i], truth_dir, journal, store)
+            for i in todo
+        ]
+        for done, fut in enumerate(as_completed(futures), start=1):
+            rec = fut.result()
+            records.append(rec)
+            print(
+                f"[BATCH] {done}/{len(todo)} {rec['status']} {rec['input']} ({rec['latency_s']:.2f}s)",
+                file=sys.stderr,
+            )
+
+    store_info: Optional[Dict[str, Any]] = None
+    if store is not None:
+        # Outputs of a crashed run may have been journaled before the store flushed them.
+        known = store.sources()
+        for rec in resumed:
+            if rec["status"] == "ok" and rec["input"] not in known:
+                store.add(json.loads(Path(rec["output"]).read_text(encoding="utf-8")), rec["input"])
+        store.flush()
+        store_info = {
+            "path": str(store.path),
+            "documents_written": store.documents_written,
+            "write_s": round(store.flush_s, 3),
+        }
+
+    wall_s = time.perf_counter() - t0
+    if journal_info is not None:
+        journal_info["states"] = journal.counts()
+    everything = records + resumed
+    latencies = [r["latency_s"] for r in records if r["status"] != "failed"]
+    ok = sum(1 for r in everything if r["status"] == "ok")
+    p50 = percentile(latencies, 50)
+    p95 = percentile(latencies, 95)
+
+    summary: Dict[str, Any] = {
+        "started_utc": started,
+        "finished_utc": utc_now_iso(),
+        "documents": len(inputs),
+        "ok": ok,
+        "invalid_json": sum(1 for r in everything if r["status"] == "invalid_json"),
+        "failed": sum(1 for r in everything if r["status"] == "failed"),
+        "processed": len(records),
+        "resumed": len(resumed),
+        "concurrency": concurrency,
+        "mode": extractor.mode,
+        "wall_time_s": round(wall_s, 3),
+        "docs_per_minute": round(len(records) / wall_s * 60, 2) if wall_s > 0 else None,
+        "latency_p50_s": p50,
+        "latency_p95_s": p95,
+        "stage_latency_ms": stage_percentiles(records),
+        "usage": usage_summary(records),
+        "cache": extractor.cache.counters() if extractor.cache is not None else None,
+        "repair": repair_summary(records),
+        "cascade": cascade_summary(records),
+        "scheduler": extractor.scheduler.metrics() if extractor.scheduler is not None else None,
+        "journal": journal_info,
+        "store": store_info,
+        "documents_detail": sorted(everything, key=lambda r: r["input"]),
+    }
+    (out_dir / "batch_summary.json").write_text(
+        json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+    print(
+        f"[BATCH SUMMARY] docs={summary['documents']} processed={len(records)} resumed={len(resumed)} "
+        f"ok={ok} failed={summary['failed']} "
+        f"invalid_json={summary['invalid_json']} docs/min={summary['docs_per_minute']} "
+        f"p50={p50}s p95={p95}s cached_input={summary['usage']['cached_share']}",
+        file=sys.stderr,
+    )
+    return summary
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = Path(".sds_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+DEFAULT_MAX_AGE_DAYS = 30.0
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(input_sha256: str, *parts: Any) -> str:
+    """Combine the input hash with everything that changes the model's answer."""
+    h = hashlib.sha256(input_sha256.encode("ascii"))
+    for p in parts:
+        h.update(b"\x00")
+        h.update(str(p).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent content-addressed store of raw model output.
+
+    One JSON file per key under `root/<key[:2]>/<key>.json` holding the raw
+    `output_text` plus the input stats, so guardrails/eval can be re-applied
+    without calling the model. Writes are atomic (temp file + rename), reads
+    refresh the file mtime, and eviction drops entries older than `max_age_days`
+    and then least-recently-used entries until the store fits in `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        root: Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_days * 86400.0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # lazily computed total bytes on disk
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _expired(self, mtime: float, now: float) -> bool:
+        return self.max_age_s > 0 and now - mtime > self.max_age_s
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            st = path.stat()
+            if self._expired(st.st_mtime, time.time()):
+                self._remove(path, st.st_size)
+                entry = None
+            else:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                os.utime(path)  # LRU: a hit counts as a use
+        except (OSError, ValueError):
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        old_size = path.stat().st_size if path.exists() else 0
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - old_size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _remove(self, path: Path, size: int) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        if not self.root.exists():
+            return
+        # Only the two-hex-digit key directories: other caches (pages/) share the root.
+        for p in self.root.glob("[0-9a-f][0-9a-f]/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            yield p, st
+
+    def _scan_size(self) -> int:
+        return sum(st.st_size for _, st in self._entries())
+
+    def evict(self) -> Dict[str, int]:
+        """Drop expired entries, then oldest-used entries until under max_bytes."""
+        now = time.time()
+        expired = 0
+        lru = 0
+        live = []
+        for p, st in self._entries():
+            if self._expired(st.st_mtime, now):
+                p.unlink(missing_ok=True)
+                expired += 1
+            else:
+                live.append((st.st_mtime, st.st_size, p))
+
+        total = sum(size for _, size, _ in live)
+        live.sort()
+        for _, size, p in live:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            lru += 1
+
+        with self._lock:
+            self._size = total
+        return {"expired": expired, "lru": lru}
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
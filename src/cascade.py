@@ -0,0 +1,193 @@
+"""
+Confidence-driven model cascade.
+
+The extraction model's answer is kept, except for the fields it was unsure
+about (confidence below a threshold) or that failed a format guardrail. Only
+those fields are asked again of a stronger model, in one request carrying
+just their SDS sections and schema, and its answers replace them.
+
+Scalar fields ("document.revision_date") are re-extracted; list items
+("composition.ingredients[3]") are sent back with the prompt to be
+re-checked, so one doubtful CAS number does not re-generate the whole
+ingredient list.
+"""
+
+from __future__ import annotations
+
+import copy
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from fanout import text_for_groups
+from format_guardrails import apply_format_guardrails
+from llm import create_response, response_usage
+from prompts import SCHEMA_GROUPS, SYSTEM, group_fields, group_prompt, recheck_prompt
+from repair import local_repair
+from scheduler import RequestScheduler
+
+ESCALATION_MODEL = "gpt-4o"
+CONFIDENCE_THRESHOLD = 0.7
+
+# "composition.ingredients[3].cas.value" -> unit "composition.ingredients[3]"
+_UNIT_RE = re.compile(r"(\w+)\.(\w+)(?:\[(\d+)\])?")
+
+
+def _field_objects(node: Any):
+    """Yields every field object ({"value", ..., "confidence"}) below `node`."""
+    if isinstance(node, dict):
+        if "value" in node and "confidence" in node:
+            yield node
+            return
+        for v in node.values():
+            yield from _field_objects(v)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _field_objects(item)
+
+
+def _low_confidence(obj: Dict[str, Any], threshold: float) -> bool:
+    conf = obj.get("confidence")
+    if isinstance(conf, bool) or not isinstance(conf, (int, float)):
+        return True
+    return conf < threshold
+
+
+def _low_confidence_node(node: Any, threshold: float) -> bool:
+    return any(_low_confidence(o, threshold) for o in _field_objects(node))
+
+
+def escalation_candidates(
+    parsed: Dict[str, Any],
+    warnings: List[Dict[str, Any]],
+    threshold: float,
+) -> Tuple[Dict[str, List[str]], int]:
+    """
+    Escalation units of `parsed` (scalar fields "group.field", list items
+    "group.field[i]") to re-extract, as {unit: [reasons]}, plus the number of
+    units in the answer. Reasons are "low_confidence" (a field object below
+    `threshold`, or without a numeric confidence) and the guardrail rules
+    that fired inside the unit.
+    """
+    reasons: Dict[str, List[str]] = {}
+    total = 0
+    for group in SCHEMA_GROUPS:
+        node = parsed.get(group)
+        if not isinstance(node, dict):
+            continue
+        for field in group_fields(group):
+            if field not in node:
+                continue
+            value = node[field]
+            if isinstance(value, list):
+                total += len(value)
+                for i, item in enumerate(value):
+                    if _low_confidence_node(item, threshold):
+                        reasons[f"{group}.{field}[{i}]"] = ["low_confidence"]
+            else:
+                total += 1
+                if _low_confidence_node(value, threshold):
+                    reasons[f"{group}.{field}"] = ["low_confidence"]
+    for w in warnings:
+        m = _UNIT_RE.match(w["field"])
+        if m is None or m.group(1) not in SCHEMA_GROUPS or m.group(2) not in group_fields(m.group(1)):
+            continue
+        rules = reasons.setdefault(m.group(0), [])
+        if w["rule"] not in rules:
+            rules.append(w["rule"])
+    return reasons, total
+
+
+def _merge(parsed: Dict[str, Any], answer: Dict[str, Any], units: List[Any], info: Dict[str, Any]) -> None:
+    """
+    Write the stronger model's answers over the escalated units. Re-checked
+    list items are taken back in order, and only when the answer has exactly
+    one item per unit asked for.
+    """
+    by_list: Dict[Tuple[str, str], List[Any]] = {}
+    for m in units:
+        group, field, index = m.group(1), m.group(2), m.group(3)
+        if index is not None:
+            by_list.setdefault((group, field), []).append(m)
+            continue
+        new = answer.get(group)
+        if isinstance(new, dict) and field in new:
+            parsed[group][field] = new[field]
+            info["replaced"].append(m.group(0))
+        else:
+            info["kept"].append(m.group(0))
+    for (group, field), listed in by_list.items():
+        new = answer.get(group)
+        new_items = new.get(field) if isinstance(new, dict) else None
+        if isinstance(new_items, list) and len(new_items) == len(listed):
+            for m, item in zip(listed, new_items):
+                parsed[group][field][int(m.group(3))] = item
+                info["replaced"].append(m.group(0))
+        else:
+            info["kept"].extend(m.group(0) for m in listed)
+
+
+def escalate(
+    parsed: Dict[str, Any],
+    *,
+    client: Optional[OpenAI],
+    text: str,
+    max_chars: int,
+    model: str = ESCALATION_MODEL,
+    threshold: float = CONFIDENCE_THRESHOLD,
+    scheduler: Optional[RequestScheduler] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Re-extract the escalation candidates of `parsed` (see
+    escalation_candidates) with `model` and merge the answers in place.
+    Units the stronger model did not answer keep the first answer.
+
+    Returns (parsed, info for meta.cascade).
+    """
+    t0 = time.perf_counter()
+    # Guardrails normalize in place; look at a copy so finalize_output sees the original.
+    warnings = apply_format_guardrails(copy.deepcopy(parsed), normalize=True)
+    reasons, total = escalation_candidates(parsed, warnings, threshold)
+    info: Dict[str, Any] = {
+        "model": model,
+        "threshold": threshold,
+        "units_total": total,
+        "escalated": list(reasons),
+        "reasons": reasons,
+        "escalation_rate": round(len(reasons) / total, 4) if total else 0.0,
+        "replaced": [],
+        "kept": [],
+        "requests": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cached_tokens": 0,
+        "chars_sent": 0,
+    }
+
+    if reasons and client is not None:
+        units = [_UNIT_RE.match(u) for u in reasons]
+        fields = {f"{m.group(1)}.{m.group(2)}" for m in units}
+        groups = [g for g in SCHEMA_GROUPS if any(f.startswith(g + ".") for f in fields)]
+        omit = [f"{g}.{f}" for g in groups for f in group_fields(g) if f"{g}.{f}" not in fields]
+        items = [(m.group(0), parsed[m.group(1)][m.group(2)][int(m.group(3))]) for m in units if m.group(3)]
+        body = text_for_groups(text, groups, max_chars)
+        prompt = recheck_prompt(body, groups, items, omit) if items else group_prompt(body, groups, omit)
+        info.update(requests=1, chars_sent=len(body))
+        answer: Optional[Dict[str, Any]] = None
+        try:
+            resp = create_response(
+                client,
+                [{"role": "system", "content": SYSTEM}, {"role": "user", "content": prompt}],
+                model,
+                scheduler,
+            )
+            info.update(response_usage(resp))
+            answer, _ = local_repair(resp.output_text or "")
+        except Exception as e:
+            info["error"] = f"{type(e).__name__}: {e}"
+        _merge(parsed, answer or {}, units, info)
+
+    info["cascade_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return parsed, info
@@ -0,0 +1,144 @@
+"""
+Boilerplate stripping and whitespace compaction of extracted PDF text.
+
+SDS PDFs repeat the same header/footer (product name, revision date,
+"Page x of y", supplier block) on every page, and pypdf output carries runs
+of spaces from table layout, blank lines and words hyphenated across line
+breaks. None of that helps the model, and all of it counts against MAX_CHARS.
+
+    pages, stats = compact_pages(pages)
+
+Lines found in the header/footer zone of many pages are kept where they first
+appear and dropped from the other pages' header/footer zones; digits are ignored when comparing lines,
+so "Page 3 of 12" matches "Page 4 of 12".
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Non-blank lines at the top and bottom of a page searched for boilerplate.
+EDGE_LINES = 6
+# A line is boilerplate when it is in the edge zone of at least this share of pages...
+MIN_PAGE_SHARE = 0.5
+# ...and of at least this many pages.
+MIN_PAGES = 3
+
+_DIGITS_RE = re.compile(r"\d+")
+_SPACES_RE = re.compile(r"[ \t\f\v\u00a0]+")
+# "flamm-\nable"; a lowercase continuation leaves "2-\nMethyl" or CAS numbers alone.
+_HYPHEN_BREAK_RE = re.compile(r"([A-Za-z]{2,})-\n([a-z]{2,})")
+_WORD_RE = re.compile(r"[A-Za-z]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def _line_key(line: str) -> str:
+    return _DIGITS_RE.sub("#", " ".join(line.split()).lower())
+
+
+def _edge_indices(lines: List[str]) -> List[int]:
+    """Indices of the first and last EDGE_LINES non-blank lines."""
+    filled = [i for i, l in enumerate(lines) if l.strip()]
+    return sorted(set(filled[:EDGE_LINES] + filled[-EDGE_LINES:]))
+
+
+def repeated_lines(pages: List[str]) -> set:
+    """
+    Normalized keys of header/footer lines repeated across pages: in the edge
+    zone of enough pages, and about once per page overall (a phrase such as
+    "No data available" that recurs inside the content is not boilerplate).
+    """
+    if len(pages) < MIN_PAGES:
+        return set()
+    edge_pages: Dict[str, int] = {}
+    total: Dict[str, int] = {}
+    for page in pages:
+        lines = page.split("\n")
+        for key in {_line_key(lines[i]) for i in _edge_indices(lines)}:
+            edge_pages[key] = edge_pages.get(key, 0) + 1
+        for line in lines:
+            key = _line_key(line)
+            if key in edge_pages:
+                total[key] = total.get(key, 0) + 1
+    needed = max(MIN_PAGES, math.ceil(MIN_PAGE_SHARE * len(pages)))
+    return {k for k, n in edge_pages.items() if k and n >= needed and total[k] <= n + 1}
+
+
+def compact_text(text: str, vocabulary: Optional[Set[str]] = None) -> Tuple[str, int, int]:
+    """
+    Collapse whitespace runs and blank lines and join words broken at a
+    hyphen + line break. The hyphen is dropped when the joined word occurs in
+    `vocabulary` (lowercase words of the document), and kept otherwise, so
+    compounds such as "non-\nemergency" stay hyphenated.
+    Returns (text, words joined, characters removed by joining).
+    """
+    lines = [_SPACES_RE.sub(" ", l).strip() for l in text.split("\n")]
+    vocabulary = vocabulary or set()
+    removed = 0
+
+    def join(m: "re.Match[str]") -> str:
+        nonlocal removed
+        word = m.group(1) + m.group(2)
+        if word.lower() in vocabulary:
+            removed += 2
+            return word
+        removed += 1
+        return f"{m.group(1)}-{m.group(2)}"
+
+    text, joined = _HYPHEN_BREAK_RE.subn(join, "\n".join(lines))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip("\n"), joined, removed
+
+
+def compact_pages(pages: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Strip repeated headers/footers from `pages` (keeping the first occurrence
+    of each) and compact every page. Returns (pages, stats); stats count the
+    characters removed by each step.
+    """
+    t0 = time.perf_counter()
+    before = sum(len(p) for p in pages)
+    boilerplate = repeated_lines(pages)
+    seen: set = set()
+    stripped: List[str] = []
+    lines_removed = boilerplate_chars = 0
+    for page in pages:
+        lines = page.split("\n")
+        edge = set(_edge_indices(lines)) if boilerplate else set()
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edge:
+                key = _line_key(line)
+                if key in boilerplate:
+                    if key in seen:
+                        lines_removed += 1
+                        boilerplate_chars += len(line) + 1
+                        continue
+                    seen.add(key)
+            kept.append(line)
+        stripped.append("\n".join(kept))
+
+    vocabulary = {w.lower() for page in stripped for w in _WORD_RE.findall(page)}
+    out: List[str] = []
+    joined = join_chars = 0
+    for page in stripped:
+        page, n, removed = compact_text(page, vocabulary)
+        out.append(page)
+        joined += n
+        join_chars += removed
+    after = sum(len(p) for p in out)
+    stats = {
+        "chars_before": before,
+        "chars_after": after,
+        "chars_removed": before - after,
+        "removed_pct": round((before - after) / before * 100.0, 2) if before else 0.0,
+        "boilerplate_lines": len(boilerplate),
+        "boilerplate_lines_removed": lines_removed,
+        "boilerplate_chars": boilerplate_chars,
+        "whitespace_chars": before - boilerplate_chars - join_chars - after,
+        "dehyphenated": joined,
+        "compact_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+    }
+    return out, stats
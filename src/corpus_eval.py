@@ -0,0 +1,195 @@
+"""
+Corpus evaluation: score a folder of extraction outputs against a folder of
+ground-truth files (matched by file stem, as with --truth-dir) in parallel,
+and aggregate per-field precision/recall.
+
+    python src/corpus_eval.py outputs/ truth/ --report eval_report.json
+    python src/corpus_eval.py outputs/ truth/ --baseline last_report.json --max-drop 1.0
+
+The report is columnar (one list per column) to stay compact for 10k+
+documents. With --baseline, the exit code is 1 when overall accuracy or any
+field's precision/recall dropped by more than --max-drop percentage points.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from eval import evaluate
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+# Documents per worker task: large enough that IPC stays negligible.
+CHUNK_SIZE = 200
+# Outputs written next to the per-document JSON that are not extractions.
+NON_DOCUMENT_FILES = {"batch_summary.json", "openai_batch_summary.json", "openai_batch_state.json"}
+
+
+def pair_files(outputs_dir: Path, truth_dir: Path) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """(output, truth) path pairs matched by stem, plus outputs that have no truth file."""
+    truth = {p.stem: p for p in truth_dir.glob("*.json")}
+    pairs, unmatched = [], []
+    for p in sorted(outputs_dir.glob("*.json")):
+        if p.name in NON_DOCUMENT_FILES:
+            continue
+        t = truth.get(p.stem)
+        if t is None:
+            unmatched.append(str(p))
+        else:
+            pairs.append((str(p), str(t)))
+    return pairs, unmatched
+
+
+def _score_chunk(pairs: List[Tuple[str, str]], align: bool) -> Dict[str, Any]:
+    """Worker: score a chunk; only aggregated counters and one row per document go back."""
+    fields: Dict[str, List[int]] = {}
+    docs: List[Tuple[str, float, int, int, int, int]] = []
+    errors: List[Dict[str, str]] = []
+    for out_path, truth_path in pairs:
+        try:
+            with open(out_path, encoding="utf-8") as f:
+                extracted = json.load(f)
+            with open(truth_path, encoding="utf-8") as f:
+                truth = json.load(f)
+            r = evaluate(extracted, truth, align=align)
+        except Exception as e:
+            errors.append({"output": out_path, "error": f"{type(e).__name__}: {e}"})
+            continue
+        for name, counts in r["fields"].items():
+            agg = fields.setdefault(name, [0, 0, 0, 0])
+            for i in range(4):
+                agg[i] += counts[i]
+        docs.append((
+            Path(out_path).stem, r["accuracy"], r["correct"], r["fields_compared"],
+            len(r["missing"]), len(r["hallucinated"]),
+        ))
+    return {"fields": fields, "docs": docs, "errors": errors}
+
+
+def _ratio(num: int, den: int) -> Optional[float]:
+    return round(num / den * 100, 2) if den else None
+
+
+def evaluate_corpus(
+    outputs_dir: Path,
+    truth_dir: Path,
+    workers: int = DEFAULT_WORKERS,
+    align: bool = True,
+) -> Dict[str, Any]:
+    """Score every output that has a truth file; returns the columnar report."""
+    t0 = time.perf_counter()
+    pairs, unmatched = pair_files(outputs_dir, truth_dir)
+    chunks = [pairs[i:i + CHUNK_SIZE] for i in range(0, len(pairs), CHUNK_SIZE)]
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_chunk, chunks, [align] * len(chunks)))
+    else:
+        results = [_score_chunk(c, align) for c in chunks]
+
+    fields: Dict[str, List[int]] = {}
+    docs: List[Tuple[str, float, int, int, int, int]] = []
+    errors: List[Dict[str, str]] = []
+    for r in results:
+        for name, counts in r["fields"].items():
+            agg = fields.setdefault(name, [0, 0, 0, 0])
+            for i in range(4):
+                agg[i] += counts[i]
+        docs.extend(r["docs"])
+        errors.extend(r["errors"])
+
+    names = sorted(fields)
+    tp = [fields[n][0] for n in names]
+    fp = [fields[n][1] for n in names]
+    fn = [fields[n][2] for n in names]
+    correct = sum(d[2] for d in docs)
+    compared = sum(d[3] for d in docs)
+
+    return {
+        "documents": len(docs),
+        "unmatched_outputs": unmatched,
+        "errors": errors,
+        "aligned_lists": align,
+        "accuracy_micro": _ratio(correct, compared),
+        "accuracy_macro": round(sum(d[1] for d in docs) / len(docs), 2) if docs else None,
+        "hallucinated_total": sum(d[5] for d in docs),
+        "fields": {
+            "name": names,
+            "tp": tp,
+            "fp": fp,
+            "fn": fn,
+            "both_null": [fields[n][3] for n in names],
+            "precision": [_ratio(t, t + p) for t, p in zip(tp, fp)],
+            "recall": [_ratio(t, t + f) for t, f in zip(tp, fn)],
+        },
+        "docs": {
+            "name": [d[0] for d in docs],
+            "accuracy": [d[1] for d in docs],
+            "correct": [d[2] for d in docs],
+            "compared": [d[3] for d in docs],
+            "missing": [d[4] for d in docs],
+            "hallucinated": [d[5] for d in docs],
+        },
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_drop: float) -> List[str]:
+    """Human-readable list of metrics that fell by more than `max_drop` points."""
+    found = []
+    cur, base = report.get("accuracy_micro"), baseline.get("accuracy_micro")
+    if cur is not None and base is not None and base - cur > max_drop:
+        found.append(f"accuracy_micro {base} -> {cur}")
+    base_fields = baseline.get("fields", {})
+    base_idx = {n: i for i, n in enumerate(base_fields.get("name", []))}
+    cur_fields = report["fields"]
+    for i, name in enumerate(cur_fields["name"]):
+        j = base_idx.get(name)
+        if j is None:
+            continue
+        for metric in ("precision", "recall"):
+            c, b = cur_fields[metric][i], base_fields[metric][j]
+            if c is not None and b is not None and b - c > max_drop:
+                found.append(f"{name} {metric} {b} -> {c}")
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Score extraction outputs against a ground-truth folder")
+    parser.add_argument("outputs_dir", type=Path, help="Folder of extracted <stem>.json files")
+    parser.add_argument("truth_dir", type=Path, help="Folder of ground-truth <stem>.json files")
+    parser.add_argument("--report", type=Path, default=Path("eval_report.json"))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--by-index", action="store_true", help="Compare list items by position (legacy scoring)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous report to check for regressions")
+    parser.add_argument("--max-drop", type=float, default=1.0, help="Allowed drop in percentage points (default: 1.0)")
+    args = parser.parse_args()
+
+    report = evaluate_corpus(args.outputs_dir, args.truth_dir, workers=args.workers, align=not args.by_index)
+    args.report.write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+    print(
+        f"[CORPUS EVAL] docs={report['documents']} accuracy_micro={report['accuracy_micro']} "
+        f"accuracy_macro={report['accuracy_macro']} hallucinated={report['hallucinated_total']} "
+        f"errors={len(report['errors'])} unmatched={len(report['unmatched_outputs'])} "
+        f"elapsed={report['elapsed_s']}s -> {args.report}",
+        file=sys.stderr,
+    )
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        found = regressions(report, baseline, args.max_drop)
+        for line in found:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,15 @@
 from __future__ import annotations
-from typing import Dict, Any, Tuple
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from format_guardrails import normalize_cas
+
+# Keys tried in order when aligning list items (ingredients by CAS, then name;
+# statements/pictograms by value; classifications by class + category).
+ALIGN_KEYS = ("cas", "name", "value", "class")
+
+_INDEX_RE = re.compile(r"\[\d+\]")
+
 
 def flatten_values(obj: Any, prefix=""):
     """
@@ -16,21 +26,121 @@ def flatten_values(obj: Any, prefix=""):
         for i, item in enumerate(obj):
             yield from flatten_values(item, f"{prefix}[{i}]")
 
-def evaluate(extracted: dict, truth: dict) -> dict:
+
+def normalize(v):
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v.strip().lower()
+    return v
+
+
+def field_name(path: str) -> str:
+    """Path with list indices dropped: composition.ingredients[3].cas.value -> composition.ingredients[].cas.value"""
+    return _INDEX_RE.sub("[]", path)
+
+
+def _key_text(v: Any) -> Optional[str]:
+    if isinstance(v, dict):
+        v = v.get("value")
+    if not isinstance(v, str) or not v.strip():
+        return None
+    return " ".join(v.lower().split())
+
+
+def item_keys(item: Any) -> Dict[str, str]:
+    """Alignment keys of one list item (see ALIGN_KEYS); empty for all-null items."""
+    if not isinstance(item, dict):
+        text = _key_text(item)
+        return {"value": text} if text else {}
+    keys: Dict[str, str] = {}
+    cas = _key_text(item.get("cas"))
+    if cas:
+        keys["cas"] = normalize_cas(cas)
+    for k in ("name", "value"):
+        text = _key_text(item.get(k))
+        if text:
+            keys[k] = text
+    cls = _key_text(item.get("class"))
+    if cls:
+        keys["class"] = f"{cls}|{_key_text(item.get('category')) or ''}"
+    return keys
+
+
+def align_lists(truth_list: List[Any], extracted_list: List[Any]) -> Tuple[List[Tuple[int, Optional[int]]], List[int]]:
+    """
+    Pair truth items with extracted items by best key match rather than position.
+    Returns (pairs, extra): pairs is (truth_index, extracted_index | None) for
+    every truth item; extra are extracted indices with content but no truth
+    counterpart. Items without any key are paired by position among leftovers.
+    """
+    truth_keys = [item_keys(t) for t in truth_list]
+    ext_keys = [item_keys(e) for e in extracted_list]
+    match: Dict[int, int] = {}
+    free = set(range(len(extracted_list)))
+
+    for kind in ALIGN_KEYS:
+        by_key: Dict[str, List[int]] = {}
+        for ei in sorted(free):
+            k = ext_keys[ei].get(kind)
+            if k is not None:
+                by_key.setdefault(k, []).append(ei)
+        for ti, keys in enumerate(truth_keys):
+            if ti in match or kind not in keys:
+                continue
+            candidates = by_key.get(keys[kind])
+            if candidates:
+                ei = candidates.pop(0)
+                match[ti] = ei
+                free.discard(ei)
+
+    keyless = [ei for ei in sorted(free) if not ext_keys[ei]]
+    for ti, keys in enumerate(truth_keys):
+        if ti not in match and not keys and keyless:
+            ei = keyless.pop(0)
+            match[ti] = ei
+            free.discard(ei)
+
+    pairs = [(ti, match.get(ti)) for ti in range(len(truth_list))]
+    extra = [ei for ei in sorted(free) if ext_keys[ei]]
+    return pairs, extra
+
+
+def _count(fields: Dict[str, List[int]], path: str, slot: int) -> None:
+    # slot: 0 = true positive, 1 = false positive, 2 = false negative, 3 = both null
+    fields.setdefault(field_name(path), [0, 0, 0, 0])[slot] += 1
+
+
+def _leaves(node: Any, path: str):
+    if isinstance(node, dict):
+        for k, v in node.items():
+            yield from _leaves(v, f"{path}.{k}" if path else k)
+    elif isinstance(node, list):
+        for i, item in enumerate(node):
+            yield from _leaves(item, f"{path}[{i}]")
+    else:
+        yield path, node
+
+
+def evaluate(extracted: dict, truth: dict, align: bool = True) -> dict:
+    """
+    Score one extraction against its ground truth (only fields present in
+    truth are compared). With `align`, list items are matched by CAS / name /
+    value instead of position, and extracted items without a truth
+    counterpart are reported as hallucinated (by their extracted index),
+    as are values extracted where the truth is null.
+
+    `fields` holds per-field [tp, fp, fn, both_null] counts keyed by
+    field_name(), for corpus aggregation (see corpus_eval.py).
+    """
     correct = 0
     fields_compared = 0
     missing = []
-    hallucinated = []  # will stay empty unless you explicitly track it
-
-    def normalize(v):
-        if v is None:
-            return None
-        if isinstance(v, str):
-            return v.strip().lower()
-        return v
+    hallucinated = []
+    fields: Dict[str, List[int]] = {}
 
     def walk(truth_node, extracted_node, path=""):
-        nonlocal correct, fields_compared, missing
+        nonlocal correct, fields_compared
 
         # Only evaluate fields that exist in truth
         if isinstance(truth_node, dict):
@@ -40,12 +150,21 @@ def evaluate(extracted: dict, truth: dict) -> dict:
                 walk(truth_val, extracted_val, new_path)
 
         elif isinstance(truth_node, list):
-            for i, truth_item in enumerate(truth_node):
-                try:
-                    extracted_item = extracted_node[i]
-                except Exception:
-                    extracted_item = None
-                walk(truth_item, extracted_item, f"{path}[{i}]")
+            extracted_list = extracted_node if isinstance(extracted_node, list) else []
+            if align:
+                pairs, extra = align_lists(truth_node, extracted_list)
+            else:
+                pairs = [(i, i if i < len(extracted_list) else None) for i in range(len(truth_node))]
+                extra = []
+            for ti, ei in pairs:
+                walk(truth_node[ti], extracted_list[ei] if ei is not None else None, f"{path}[{ti}]")
+            # Extra items count as false positives for the fields truth items carry.
+            scored = {field_name(p) for item in truth_node for p, _ in _leaves(item, f"{path}[0]")}
+            for ei in extra:
+                hallucinated.append(f"{path}[{ei}]")
+                for leaf_path, v in _leaves(extracted_list[ei], f"{path}[{ei}]"):
+                    if v is not None and (field_name(leaf_path) in scored or not scored):
+                        _count(fields, leaf_path, 1)
 
         else:
             # Leaf comparison (value objects)
@@ -56,8 +175,15 @@ def evaluate(extracted: dict, truth: dict) -> dict:
 
             if extracted_value == truth_value:
                 correct += 1
+                _count(fields, path, 0 if truth_value is not None else 3)
+            elif truth_value is None:
+                hallucinated.append(path)
+                _count(fields, path, 1)
             else:
                 missing.append(path)
+                _count(fields, path, 2)
+                if extracted_value is not None:
+                    _count(fields, path, 1)
 
     walk(truth, extracted)
 
@@ -69,4 +195,5 @@ def evaluate(extracted: dict, truth: dict) -> dict:
         "missing": missing,
         "hallucinated": hallucinated,
         "accuracy": accuracy,
+        "fields": fields,
     }
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import bisect
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from format_guardrails import DASHES
+
+_DASH_TABLE = str.maketrans(DASHES)
+_WORD_RE = re.compile(r"\S+")
+_ELLIPSIS_RE = re.compile(r"\.\.\.+|…")
+# Tokens of a snippet considered as lookup anchors (the rarest one is used).
+MAX_ANCHORS = 5
+
+
+def normalize_words(text: str) -> List[Tuple[str, int]]:
+    """(word, offset) pairs of `text`: unicode dashes -> "-", lower-cased, split on whitespace."""
+    return [(m.group().lower(), m.start()) for m in _WORD_RE.finditer(text.translate(_DASH_TABLE))]
+
+
+class EvidenceIndex:
+    """
+    Whitespace/dash/case-normalized view of one document's text, built once,
+    with a word -> positions map so each evidence snippet is located by
+    checking only the occurrences of its rarest word instead of scanning the
+    whole text.
+    """
+
+    def __init__(self, text: str, page_starts: Optional[List[int]] = None):
+        words = normalize_words(text)
+        self.norm = " ".join(w for w, _ in words)
+        self.page_starts = page_starts
+        self._norm_starts: List[int] = []
+        self._orig_starts: List[int] = []
+        self._positions: Dict[str, List[int]] = {}
+        pos = 0
+        for word, orig in words:
+            self._norm_starts.append(pos)
+            self._orig_starts.append(orig)
+            self._positions.setdefault(word, []).append(pos)
+            pos += len(word) + 1
+
+    def _find_norm(self, snippet: str) -> Optional[int]:
+        tokens = snippet.split(" ")
+        starts = []
+        pos = 0
+        for t in tokens:
+            starts.append(pos)
+            pos += len(t) + 1
+        # First and last token may be cut mid-word; interior tokens must be whole
+        # words of the text, so a missing one settles the lookup.
+        interior = range(1, min(len(tokens) - 1, MAX_ANCHORS))
+        best: Optional[Tuple[int, List[int]]] = None
+        for j in interior:
+            hits = self._positions.get(tokens[j])
+            if hits is None:
+                return None
+            if best is None or len(hits) < len(best[1]):
+                best = (j, hits)
+        if best is None:
+            # One or two tokens: try the first as a whole word before a plain search.
+            best = (0, self._positions.get(tokens[0], []))
+        j, hits = best
+        for p in hits:
+            start = p - starts[j]
+            if start >= 0 and self.norm.startswith(snippet, start):
+                return start
+        if j > 0:
+            return None
+        found = self.norm.find(snippet)
+        return found if found != -1 else None
+
+    def _to_original(self, norm_pos: int) -> int:
+        i = bisect.bisect_right(self._norm_starts, norm_pos) - 1
+        return self._orig_starts[i] + (norm_pos - self._norm_starts[i])
+
+    def page_of(self, offset: int) -> Optional[int]:
+        """1-based page number of an original-text offset (None without page starts)."""
+        if not self.page_starts:
+            return None
+        return bisect.bisect_right(self.page_starts, offset)
+
+    def locate(self, snippet: str) -> Optional[Dict[str, Any]]:
+        """
+        {"offset", "page"} of `snippet` in the original text, or None. Snippets
+        elided with "..." match when every part is found.
+        """
+        parts = [" ".join(w for w, _ in normalize_words(p)) for p in _ELLIPSIS_RE.split(snippet)]
+        parts = [p for p in parts if p]
+        if not parts:
+            return None
+        first = None
+        for part in parts:
+            pos = self._find_norm(part)
+            if pos is None:
+                return None
+            if first is None:
+                first = pos
+        offset = self._to_original(first)
+        return {"offset": offset, "page": self.page_of(offset)}
+
+
+def iter_evidence(obj: Any, prefix: str = "") -> Iterator[Tuple[str, str]]:
+    """Yields (path, snippet) for every non-empty string `evidence` field outside meta."""
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            path = f"{prefix}.{k}" if prefix else k
+            if k == "meta" and not prefix:
+                continue
+            if k == "evidence":
+                if isinstance(v, str) and v.strip():
+                    yield path, v
+            else:
+                yield from iter_evidence(v, path)
+    elif isinstance(obj, list):
+        for i, item in enumerate(obj):
+            yield from iter_evidence(item, f"{prefix}[{i}]")
+
+
+def verify_evidence(parsed: Dict[str, Any], index: EvidenceIndex) -> Dict[str, Any]:
+    """
+    Locate every evidence snippet of `parsed` in the indexed source text.
+    Returns checked/found counts, the offset/page of each located snippet and
+    the paths of snippets that could not be found.
+    """
+    t0 = time.perf_counter()
+    locations: Dict[str, Dict[str, Any]] = {}
+    not_found: List[str] = []
+    for path, snippet in iter_evidence(parsed):
+        loc = index.locate(snippet)
+        if loc is None:
+            not_found.append(path)
+        else:
+            locations[path] = loc
+    return {
+        "checked": len(locations) + len(not_found),
+        "found": len(locations),
+        "not_found": len(not_found),
+        "not_found_fields": not_found,
+        "locations": locations,
+        "verify_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+    }
+
+
+def evidence_warnings(parsed: Dict[str, Any], summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Warn-only `evidence_not_found` entries for the snippets verify_evidence could not locate."""
+    missing = set(summary.get("not_found_fields", []))
+    return [
+        {
+            "field": path,
+            "rule": "evidence_not_found",
+            "message": "Evidence snippet was not found in the source text.",
+            "value": snippet[:200],
+        }
+        for path, snippet in iter_evidence(parsed)
+        if path in missing
+    ]
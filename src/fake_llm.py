@@ -0,0 +1,550 @@
+"""
+Local stand-in for the OpenAI Responses endpoint.
+
+Lets the pipeline (single run, batch, service) be exercised end-to-end without
+spending API money. Point the client at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=fake python src/main.py ...
+
+With "stream": true the answer is sent as Responses server-sent events, one
+output_text delta per ~token, paced by --tokens-per-s (which also delays
+non-streamed answers by the same generation time).
+
+With `prefix_cache`, prompt caching is simulated the way the OpenAI API
+does it: prompts of at least 1024 tokens reuse the longest previously seen
+exact prefix, in 128-token steps, reported as usage cached_tokens; with
+`prefill_tokens_per_s`, only the uncached input tokens add to the time to
+the first token.
+
+A prompt that asks only for some schema groups (fan-out, repair, cascade) is
+answered with just those groups and the fields its schema lists. `models`
+overrides the answer, latency and speed per model name, e.g. a slower but
+more accurate model for the cascade benchmark.
+
+Also implements the subset of the Files and Batch APIs used by
+openai_batch.py (upload, create batch, retrieve batch, download content);
+a batch completes `batch_delay` seconds after creation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+def _field(value: Any = None, evidence: Any = None, confidence: float = 0.0) -> Dict[str, Any]:
+    return {"value": value, "evidence": evidence, "confidence": confidence}
+
+
+# Minimal schema-shaped answer used when no --response file is given.
+DEFAULT_RESPONSE: Dict[str, Any] = {
+    "document": {
+        k: _field()
+        for k in (
+            "product_name", "product_code", "physical_state", "product_color",
+            "version_number", "recommended_use", "supplier_name", "supplier_address",
+            "supplier_phone", "emergency_phone", "revision_date",
+        )
+    },
+    "transport": {k: _field() for k in ("un_number", "hazard_class", "packing_group")},
+    "composition": {"ingredients": []},
+    "physical_chemical": {k: _field() for k in ("flash_point", "ph", "relative_density", "boiling_point")},
+    "hazards": {
+        "ghs_signal_word": _field(),
+        "ghs_pictograms": [],
+        "hazard_classifications": [],
+        "hazard_statements": [],
+        "precautionary_statements": [],
+    },
+    "meta": {"notes": "fake_llm canned response"},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough chars/4 token estimate (good enough for a stand-in)."""
+    return max(1, len(text) // 4)
+
+
+def _input_text(body: Dict[str, Any]) -> str:
+    items = body.get("input")
+    if isinstance(items, str):
+        return items
+    parts = []
+    if isinstance(items, list):
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("content"), str):
+                parts.append(item["content"])
+    return "".join(parts)
+
+
+def response_object(text: str, model: str, input_tokens: int, cached_tokens: int = 0) -> Dict[str, Any]:
+    """Build a Responses API payload carrying `text` as its single output message."""
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [
+            {
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": cached_tokens},
+            "output_tokens": estimate_tokens(text),
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + estimate_tokens(text),
+        },
+    }
+
+
+_GROUPS_LINE_RE = re.compile(r"Extract the SDS fields for these groups only: ([\w, ]+)\.")
+_RECHECK_ITEM_RE = re.compile(r"^- (\w+)\.(\w+)\[(\d+)\]: ", re.M)
+
+
+def answer_for_prompt(response: Dict[str, Any], prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    The part of `response` a group prompt (prompts.group_prompt) asks for:
+    its groups, with only the fields that appear in its schema; list items
+    listed for re-checking (prompts.recheck_prompt) are answered with those
+    items of `response` only. None for a full-schema prompt.
+    """
+    m = _GROUPS_LINE_RE.search(prompt)
+    if m is None:
+        return None
+    out: Dict[str, Any] = {}
+    for group in m.group(1).split(", "):
+        node = response.get(group)
+        if isinstance(node, dict):
+            out[group] = {k: v for k, v in node.items() if f'"{k}":' in prompt}
+    rechecked: Dict[tuple, list] = {}
+    for group, field, index in _RECHECK_ITEM_RE.findall(prompt):
+        items = response.get(group, {}).get(field) or []
+        if int(index) < len(items):
+            rechecked.setdefault((group, field), []).append(items[int(index)])
+    for (group, field), items in rechecked.items():
+        out.setdefault(group, {})[field] = items
+    return out
+
+
+# Prompt caching: minimum prompt length and match granularity (tokens).
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+class PrefixCache:
+    """
+    Prefix hashes of recent prompts (per model, least recently used evicted),
+    answering how many leading tokens of a new prompt were seen before.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[bytes, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, model: str, prompt: str) -> int:
+        """Cached tokens of `prompt` (0 below CACHE_MIN_TOKENS); its prefixes are remembered."""
+        tokens = estimate_tokens(prompt)
+        if tokens < CACHE_MIN_TOKENS:
+            return 0
+        h = hashlib.blake2b(model.encode("utf-8"), digest_size=16)
+        keys, start = [], 0
+        for end in range(CACHE_MIN_TOKENS, tokens + 1, CACHE_BLOCK_TOKENS):
+            h.update(prompt[start * 4:end * 4].encode("utf-8"))
+            keys.append((end, h.copy().digest()))
+            start = end
+        cached = 0
+        with self._lock:
+            for end, key in keys:
+                if key not in self._seen:
+                    break
+                self._seen.move_to_end(key)
+                cached = end
+            for _, key in keys:
+                self._seen[key] = None
+                self._seen.move_to_end(key)
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+        return cached
+
+
+# Characters per streamed delta (about one token).
+STREAM_CHUNK_CHARS = 4
+
+
+def corrupt_json(text: str) -> str:
+    """`text` broken half-way, as a model that loses track of the JSON would."""
+    half = len(text) // 2
+    return text[:half] + ' "oops" ' + text[half:]
+
+
+class FakeLLMServer:
+    """
+    Threaded HTTP server answering POST /v1/responses with a canned JSON body
+    after a configurable latency (seconds, plus uniform jitter) plus, with
+    `tokens_per_s`, the time to generate the output tokens and, with
+    `prefill_tokens_per_s`, the time to read the input tokens not served from
+    the simulated prompt cache (`prefix_cache`). Entries of `models` override
+    "response", "latency", "tokens_per_s" and "prefill_tokens_per_s" for
+    requests naming that model.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        response: Optional[Dict[str, Any]] = None,
+        batch_delay: float = 0.0,
+        error_rate: float = 0.0,
+        tokens_per_s: float = 0.0,
+        malformed_rate: float = 0.0,
+        models: Optional[Dict[str, Dict[str, Any]]] = None,
+        prefix_cache: bool = False,
+        prefill_tokens_per_s: float = 0.0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tokens_per_s = tokens_per_s
+        self.malformed_rate = malformed_rate
+        self.prefill_tokens_per_s = prefill_tokens_per_s
+        self.prefix_cache = PrefixCache() if prefix_cache else None
+        self.batch_delay = batch_delay
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.file_data: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.jitter = jitter
+        self.response = response or DEFAULT_RESPONSE
+        self.response_text = json.dumps(self.response, ensure_ascii=False)
+        # model name -> {"response", "latency", "tokens_per_s", "prefill_tokens_per_s"} overrides
+        self.models = models or {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):  # keep benchmark output quiet
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self) -> None:
+                self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                path = self.path.split("?")[0].rstrip("/")
+
+                if path.endswith("/files"):
+                    self._send_json(200, server.handle_file_upload(self.headers.get("Content-Type", ""), raw))
+                    return
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                    return
+
+                if path.endswith("/responses"):
+                    if server.error_rate and random.random() < server.error_rate:
+                        self._send_json(
+                            429,
+                            {"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}},
+                            {"retry-after-ms": "200"},
+                        )
+                        return
+                    if body.get("stream"):
+                        server.stream_response(self, body)
+                    else:
+                        self._send_json(200, server.handle_response(body), server.rate_limit_headers())
+                elif path.endswith("/batches"):
+                    self._send_json(200, server.create_batch(body))
+                else:
+                    self._not_found()
+
+            def do_GET(self):
+                parts = [p for p in self.path.split("?")[0].split("/") if p]
+                if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in server.batches:
+                    self._send_json(200, server.batch_status(parts[-1]))
+                elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content" \
+                        and parts[-2] in server.file_data:
+                    data = server.file_data[parts[-2]]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self._not_found()
+
+        return Handler
+
+    def _setting(self, body: Dict[str, Any], name: str) -> Any:
+        return self.models.get(body.get("model"), {}).get(name, getattr(self, name))
+
+    def _output_text(self, body: Dict[str, Any]) -> str:
+        response = self._setting(body, "response")
+        partial = answer_for_prompt(response, _input_text(body))
+        if partial is not None:
+            text = json.dumps(partial, ensure_ascii=False)
+        elif response is self.response:
+            text = self.response_text
+        else:
+            text = json.dumps(response, ensure_ascii=False)
+        if self.malformed_rate and random.random() < self.malformed_rate:
+            return corrupt_json(text)
+        return text
+
+    def _first_token_delay(self, body: Dict[str, Any]) -> Tuple[int, int]:
+        """Wait until the first token is due; returns (input tokens, cached tokens)."""
+        with self._lock:
+            self.request_count += 1
+        prompt = _input_text(body)
+        input_tokens = estimate_tokens(prompt)
+        cached = self.prefix_cache.lookup(body.get("model", "fake"), prompt) if self.prefix_cache else 0
+        delay = self._setting(body, "latency") + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        prefill = self._setting(body, "prefill_tokens_per_s")
+        if prefill:
+            delay += (input_tokens - cached) / prefill
+        if delay > 0:
+            time.sleep(delay)
+        return input_tokens, cached
+
+    def handle_response(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        input_tokens, cached = self._first_token_delay(body)
+        text = self._output_text(body)
+        tokens_per_s = self._setting(body, "tokens_per_s")
+        if tokens_per_s:
+            time.sleep(estimate_tokens(text) / tokens_per_s)
+        return response_object(text, body.get("model", "fake"), input_tokens, cached)
+
+    def stream_response(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any]) -> None:
+        """Send the answer as Responses API server-sent events (created, deltas, completed)."""
+        input_tokens, cached = self._first_token_delay(body)
+        text = self._output_text(body)
+        tokens_per_s = self._setting(body, "tokens_per_s")
+        final = response_object(text, body.get("model", "fake"), input_tokens, cached)
+        item_id = final["output"][0]["id"]
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        for k, v in self.rate_limit_headers().items():
+            handler.send_header(k, v)
+        handler.end_headers()
+
+        seq = 0
+
+        def send(event: Dict[str, Any]) -> None:
+            nonlocal seq
+            event["sequence_number"] = seq
+            seq += 1
+            handler.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+
+        try:
+            send({"type": "response.created", "response": dict(final, status="in_progress", output=[])})
+            pause = STREAM_CHUNK_CHARS / 4 / tokens_per_s if tokens_per_s else 0.0
+            for i in range(0, len(text), STREAM_CHUNK_CHARS):
+                send({
+                    "type": "response.output_text.delta",
+                    "item_id": item_id,
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": text[i:i + STREAM_CHUNK_CHARS],
+                    "logprobs": [],
+                })
+                if pause:
+                    time.sleep(pause)
+            send({"type": "response.completed", "response": final})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading
+
+    def rate_limit_headers(self) -> Dict[str, str]:
+        """Static x-ratelimit-* headers, so clients can exercise header-driven adaptation."""
+        return {
+            "x-ratelimit-limit-requests": "10000",
+            "x-ratelimit-remaining-requests": "9999",
+            "x-ratelimit-reset-requests": "6ms",
+            "x-ratelimit-limit-tokens": "10000000",
+            "x-ratelimit-remaining-tokens": "9999000",
+            "x-ratelimit-reset-tokens": "6ms",
+        }
+
+    # ---- Files / Batch API subset ----
+
+    def _store_file(self, filename: str, purpose: str, data: bytes) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex}"
+        obj = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._lock:
+            self.files[file_id] = obj
+            self.file_data[file_id] = data
+        return obj
+
+    def handle_file_upload(self, content_type: str, raw: bytes) -> Dict[str, Any]:
+        msg = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw
+        )
+        purpose, filename, data = "batch", "upload.jsonl", b""
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "purpose":
+                purpose = part.get_content().strip()
+            elif name == "file":
+                filename = part.get_filename() or filename
+                data = part.get_payload(decode=True) or b""
+        return self._store_file(filename, purpose, data)
+
+    def create_batch(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body.get("endpoint", "/v1/responses"),
+            "input_file_id": body.get("input_file_id"),
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._lock:
+            self.batches[batch_id] = batch
+        threading.Timer(self.batch_delay, self._run_batch, args=(batch_id,)).start()
+        return dict(batch)
+
+    def _run_batch(self, batch_id: str) -> None:
+        batch = self.batches[batch_id]
+        lines = self.file_data.get(batch["input_file_id"], b"").decode("utf-8").splitlines()
+        out_lines = []
+        for line in lines:
+            if not line.strip():
+                continue
+            req = json.loads(line)
+            body = req.get("body", {})
+            prompt = _input_text(body)
+            out_lines.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": req.get("custom_id"),
+                "response": {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": response_object(self.response_text, body.get("model", "fake"), estimate_tokens(prompt)),
+                },
+                "error": None,
+            }))
+        out = self._store_file(f"{batch_id}_output.jsonl", "batch_output", "\n".join(out_lines).encode("utf-8"))
+        with self._lock:
+            batch.update(
+                status="completed",
+                completed_at=int(time.time()),
+                output_file_id=out["id"],
+                request_counts={"total": len(out_lines), "completed": len(out_lines), "failed": 0},
+            )
+
+    def batch_status(self, batch_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.batches[batch_id])
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local fake OpenAI Responses endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random delay (seconds)")
+    parser.add_argument("--response", type=Path, default=None, help="JSON file returned as output_text")
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="Seconds until a created batch completes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of /responses calls answered with 429")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0,
+                        help="Output generation speed after the first token (default: instant)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Fraction of answers whose JSON is broken half-way")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Simulate prompt-prefix caching (reported as usage cached_tokens)")
+    parser.add_argument("--prefill-tokens-per-s", type=float, default=0.0,
+                        help="Input reading speed for uncached prompt tokens (default: instant)")
+    args = parser.parse_args()
+
+    response = json.loads(args.response.read_text(encoding="utf-8")) if args.response else None
+    server = FakeLLMServer(
+        args.host, args.port, args.latency, args.jitter, response, args.batch_delay, args.error_rate,
+        args.tokens_per_s, args.malformed_rate, prefix_cache=args.prefix_cache,
+        prefill_tokens_per_s=args.prefill_tokens_per_s,
+    )
+    print(f"fake LLM listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
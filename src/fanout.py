@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from llm import create_response, response_usage
+from scheduler import RequestScheduler
+from prompts import SCHEMA_GROUPS, SYSTEM, group_prompt
+from sections import MAX_PREAMBLE_CHARS, split_sections
+
+# SDS sections each schema group is extracted from.
+GROUP_SECTIONS = {
+    "document": (1,),
+    "transport": (14,),
+    "composition": (3,),
+    "physical_chemical": (9,),
+    "hazards": (2,),
+}
+
+
+def _select(sections: Dict[int, str], text: str, groups: List[str]) -> Tuple[str, str]:
+    """(body, source): the groups' sections in number order, or the full text if one is missing."""
+    nums = sorted({n for g in groups for n in GROUP_SECTIONS[g]})
+    if not sections or any(n not in sections for n in nums):
+        return text, "full_text"
+    body = "".join(sections[n] for n in nums)
+    if "document" in groups:
+        body = sections[0][:MAX_PREAMBLE_CHARS] + body
+    return body, "sections"
+
+
+def group_texts(text: str, max_chars: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Text to send for each schema group separately (fan-out): only that group's
+    sections (the document group also gets the header before Section 1). A
+    group whose section heading cannot be located gets the full text, clipped
+    to `max_chars`.
+    """
+    sections = split_sections(text)
+    out: Dict[str, Dict[str, Any]] = {}
+    for group in GROUP_SECTIONS:
+        body, source = _select(sections, text, [group])
+        out[group] = {
+            "text": body[:max_chars],
+            "source": source,
+            "truncated": len(body) > max_chars,
+        }
+    return out
+
+
+def text_for_groups(text: str, groups: List[str], max_chars: int) -> str:
+    """
+    One text for a request covering several groups (repair, cascade, reuse):
+    their sections joined as in group_texts, clipped to `max_chars`.
+    """
+    body, _ = _select(split_sections(text), text, groups)
+    return body[:max_chars]
+
+
+def _run_group(
+    client: OpenAI,
+    model: str,
+    group: str,
+    text: str,
+    scheduler: Optional[RequestScheduler],
+) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    result: Dict[str, Any] = {"chars_sent": len(text)}
+    try:
+        resp = create_response(
+            client,
+            [
+                {"role": "system", "content": SYSTEM},
+                {"role": "user", "content": group_prompt(text, [group])},
+            ],
+            model,
+            scheduler,
+        )
+        result.update(response_usage(resp))
+        obj = json.loads(resp.output_text or "")
+        value = obj.get(group) if isinstance(obj, dict) else None
+        if not isinstance(value, dict):
+            raise ValueError(f"response has no '{group}' object")
+        result["value"] = value
+        notes = (obj.get("meta") or {}).get("notes") if isinstance(obj.get("meta"), dict) else None
+        if notes:
+            result["notes"] = notes
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_s"] = round(time.perf_counter() - t0, 4)
+    return result
+
+
+def extract_fanout(
+    client: OpenAI,
+    text: str,
+    model: str,
+    max_chars: int,
+    scheduler: Optional[RequestScheduler] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Request every schema group concurrently with only its relevant text, then
+    merge the partial objects into the single-call output shape (groups in
+    schema order). A group that fails is left out of the merged object and its
+    error is recorded.
+
+    Returns (merged_output, fanout_stats).
+    """
+    inputs = group_texts(text, max_chars)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(SCHEMA_GROUPS)) as pool:
+        futures = {g: pool.submit(_run_group, client, model, g, inputs[g]["text"], scheduler) for g in SCHEMA_GROUPS}
+        results = {g: f.result() for g, f in futures.items()}
+    wall_s = time.perf_counter() - t0
+
+    merged: Dict[str, Any] = {}
+    notes = []
+    groups_meta: Dict[str, Any] = {}
+    for g in SCHEMA_GROUPS:
+        r = results[g]
+        if "value" in r:
+            merged[g] = r["value"]
+        if r.get("notes"):
+            notes.append(f"{g}: {r['notes']}")
+        groups_meta[g] = {
+            k: v for k, v in r.items() if k not in ("value", "notes")
+        }
+        groups_meta[g]["text_source"] = inputs[g]["source"]
+    merged["meta"] = {"notes": "; ".join(notes)}
+
+    stats = {
+        "groups": groups_meta,
+        "wall_s": round(wall_s, 4),
+        "slowest_group_s": max(r["latency_s"] for r in results.values()),
+        "input_tokens": sum(r.get("input_tokens", 0) for r in results.values()),
+        "output_tokens": sum(r.get("output_tokens", 0) for r in results.values()),
+        "failed_groups": [g for g in SCHEMA_GROUPS if "error" in results[g]],
+        "chars_sent": sum(len(i["text"]) for i in inputs.values()),
+        "truncated": any(i["truncated"] for i in inputs.values()),
+    }
+    return merged, stats
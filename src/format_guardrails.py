@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import re
 from datetime import datetime
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # CAS format: 2-7 digits, dash, 2 digits, dash, 1 digit
 CAS_RE = re.compile(r"^\d{2,7}-\d{2}-\d$")
@@ -34,14 +35,17 @@ def _warn(
     warnings.append(w)
 
 
+_DASH_TABLE = str.maketrans(DASHES)
+_SPACED_DASH_RE = re.compile(r"\s*-\s*")
+
+
 def normalize_cas(cas: str) -> str:
     """Normalize dash characters and spacing in CAS values."""
-    s = cas.strip()
-    for k, v in DASHES.items():
-        s = s.replace(k, v)
+    s = cas.strip().translate(_DASH_TABLE)
+    if CAS_RE.match(s):  # already clean: nothing to collapse
+        return s
     # remove spaces around dashes
-    s = re.sub(r"\s*-\s*", "-", s)
-    return s
+    return _SPACED_DASH_RE.sub("-", s)
 
 
 def validate_cas_value(cas: str) -> bool:
@@ -60,61 +64,203 @@ def validate_us_date(value: str) -> bool:
         return False
 
 
+# Declarative guardrail rules: field path -> optional normalizer + validator.
+# "[*]" steps over every list item. A rule only sees non-blank string values;
+# the normalizer's result is written back when normalize=True and is what
+# gets validated and reported.
+GUARDRAIL_RULES: List[Dict[str, Any]] = [
+    {
+        "path": "composition.ingredients[*].cas.value",
+        "normalize": normalize_cas,
+        "validate": validate_cas_value,
+        "rule": "cas_format",
+        "message": "CAS number does not match expected pattern #######-##-#.",
+    },
+    {
+        "path": "document.issue_date.value",
+        "validate": validate_us_date,
+        "rule": "date_format",
+        "message": "Date is not a valid MM-DD-YYYY date.",
+    },
+    {
+        "path": "document.revision_date.value",
+        "validate": validate_us_date,
+        "rule": "date_format",
+        "message": "Date is not a valid MM-DD-YYYY date.",
+    },
+]
+
+_PATH_STEP_RE = re.compile(r"([^.\[\]]+)|\[\*\]")
+
+# Distinct values remembered per rule; shared by every document checked in
+# this process (a batch sees the same CAS numbers and dates over and over).
+RULE_CACHE_SIZE = 65536
+
+# Compiled rule: (cached value -> (normalized, ok), rule name, message, path template)
+_Compiled = Tuple[Callable[[str], Tuple[str, bool]], str, str, str]
+# Visitor signature: (node, list indices so far, warnings, normalize)
+_Visitor = Callable[[Any, Tuple[int, ...], List[Dict[str, Any]], bool], None]
+
+
+_rule_caches: List[Any] = []
+
+
+def clear_guardrail_cache() -> None:
+    """Forget memoized rule results (benchmarks; rule functions changed at runtime)."""
+    for cache in _rule_caches:
+        cache.cache_clear()
+
+
+def _path_steps(path: str) -> List[str]:
+    """'a.b[*].c' -> ['a', 'b', '*', 'c']"""
+    return [m.group(1) or "*" for m in _PATH_STEP_RE.finditer(path)]
+
+
+def _compile_rule(rule: Dict[str, Any]) -> _Compiled:
+    normalizer = rule.get("normalize")
+    validator = rule["validate"]
+
+    @lru_cache(maxsize=RULE_CACHE_SIZE)
+    def check_value(value: str) -> Tuple[str, bool]:
+        norm = normalizer(value) if normalizer is not None else value
+        return norm, validator(norm)
+
+    _rule_caches.append(check_value)
+    return check_value, rule["rule"], rule["message"], rule["path"].replace("[*]", "[{}]")
+
+
+def _build_trie(rules: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge rule paths: {"keys": {name: node}, "items": node | None, "rules": [...]}."""
+    root: Dict[str, Any] = {"keys": {}, "items": None, "rules": []}
+    for rule in rules:
+        node = root
+        for step in _path_steps(rule["path"]):
+            if step == "*":
+                if node["items"] is None:
+                    node["items"] = {"keys": {}, "items": None, "rules": []}
+                node = node["items"]
+            else:
+                node = node["keys"].setdefault(step, {"keys": {}, "items": None, "rules": []})
+        node["rules"].append(_compile_rule(rule))
+    return root
+
+
+def _apply(
+    rules: List[_Compiled],
+    container: Any,
+    key: Any,
+    value: str,
+    idx: Tuple[int, ...],
+    warnings: List[Dict[str, Any]],
+    normalize: bool,
+) -> None:
+    if not value.strip():
+        return
+    for check_value, name, message, template in rules:
+        norm, ok = check_value(value)
+        if normalize and norm != value:
+            container[key] = norm
+        if not ok:
+            _warn(warnings, template.format(*idx), name, message, norm)
+
+
+def _chain(node: Dict[str, Any]) -> Tuple[Tuple[str, ...], Dict[str, Any]]:
+    """Collapse single-key steps (e.g. .cas.value) so they are followed without extra calls."""
+    keys: List[str] = []
+    while len(node["keys"]) == 1 and not node["rules"] and node["items"] is None:
+        (name, child), = node["keys"].items()
+        keys.append(name)
+        node = child
+    return tuple(keys), node
+
+
+def _compile_node(node: Dict[str, Any]) -> _Visitor:
+    """Visitor for a value at `node`: apply its rules, then descend into keys / list items."""
+    rules = node["rules"]
+    children = []
+    for name, child in node["keys"].items():
+        chain, leaf = _chain(child)
+        children.append((name, chain, _compile_node(leaf)))
+    visit_items = _compile_node(node["items"]) if node["items"] is not None else None
+
+    def visit(v: Any, idx: Tuple[int, ...], warnings: List[Dict[str, Any]], normalize: bool) -> None:
+        if isinstance(v, dict):
+            for name, chain, visit_child in children:
+                container, key = v, name
+                child = v.get(name)
+                for step in chain:
+                    if not isinstance(child, dict):
+                        break
+                    container, key = child, step
+                    child = child.get(step)
+                else:
+                    if isinstance(child, str):
+                        leaf_rules = visit_child.rules
+                        if leaf_rules:
+                            _apply(leaf_rules, container, key, child, idx, warnings, normalize)
+                    elif child is not None:
+                        visit_child(child, idx, warnings, normalize)
+        elif isinstance(v, list) and visit_items is not None:
+            item_rules = visit_items.rules
+            for i, item in enumerate(v):
+                if isinstance(item, str):
+                    if item_rules:
+                        _apply(item_rules, v, i, item, idx + (i,), warnings, normalize)
+                elif item is not None:
+                    visit_items(item, idx + (i,), warnings, normalize)
+
+    visit.rules = rules  # type: ignore[attr-defined]
+    return visit
+
+
+def compile_rules(rules: List[Dict[str, Any]]) -> _Visitor:
+    """
+    Compile rule paths once into nested accessor functions that walk a
+    document in a single pass, descending only into keys some rule needs.
+    Returns check(parsed, (), warnings, normalize); warnings are appended in
+    traversal order (rule declaration order within a node).
+    """
+    return _compile_node(_build_trie(rules))
+
+
+def _subtree_visitors(node: Dict[str, Any], pattern: str = "", out: Optional[Dict[str, _Visitor]] = None) -> Dict[str, _Visitor]:
+    """Visitor for every intermediate path of the rule trie, keyed by pattern ("a.b[*].c")."""
+    out = {} if out is None else out
+    out[pattern] = _compile_node(node)
+    for name, child in node["keys"].items():
+        _subtree_visitors(child, f"{pattern}.{name}" if pattern else name, out)
+    if node["items"] is not None:
+        _subtree_visitors(node["items"], f"{pattern}[*]", out)
+    return out
+
+
+_RULE_TRIE = _build_trie(GUARDRAIL_RULES)
+_check = _compile_node(_RULE_TRIE)
+_check_at = _subtree_visitors(_RULE_TRIE)
+_INDEX_RE = re.compile(r"\[(\d+)\]")
+
+
 def apply_format_guardrails(parsed: Dict[str, Any], normalize: bool = True) -> List[Dict[str, Any]]:
     """
-    Minimal, warn-only format guardrails:
+    Minimal, warn-only format guardrails (see GUARDRAIL_RULES):
       - CAS normalization + validation
       - MM-DD-YYYY date validation (issue_date, revision_date)
     No other checks. No repairs. No evidence logic. No date comparisons.
     """
     warnings: List[Dict[str, Any]] = []
+    _check(parsed, (), warnings, normalize)
+    return warnings
 
-    # ---- CAS: composition.ingredients[*].cas.value ----
-    comp = parsed.get("composition", {})
-    ingredients = comp.get("ingredients", [])
-    if isinstance(ingredients, list):
-        for i, ing in enumerate(ingredients):
-            if not isinstance(ing, dict):
-                continue
-            cas_obj = ing.get("cas")
-            if not isinstance(cas_obj, dict):
-                continue
-            cas_val = cas_obj.get("value")
-            if not isinstance(cas_val, str) or not cas_val.strip():
-                continue
-
-            norm = normalize_cas(cas_val)
-            if normalize and norm != cas_val:
-                cas_obj["value"] = norm
-
-            if not validate_cas_value(norm):
-                _warn(
-                    warnings,
-                    f"composition.ingredients[{i}].cas.value",
-                    "cas_format",
-                    "CAS number does not match expected pattern #######-##-#.",
-                    norm,
-                )
-
-    # ---- Dates: document.issue_date.value / document.revision_date.value ----
-    doc = parsed.get("document", {})
-    for k in ("issue_date", "revision_date"):
-        obj = doc.get(k)
-        if not isinstance(obj, dict):
-            continue
-        v = obj.get("value")
-        if v is None:
-            continue
-        if not isinstance(v, str) or not v.strip():
-            continue
-
-        if not validate_us_date(v):
-            _warn(
-                warnings,
-                f"document.{k}.value",
-                "date_format",
-                "Date is not a valid MM-DD-YYYY date.",
-                v,
-            )
 
+def apply_guardrails_at(path: str, value: Any, normalize: bool = True) -> List[Dict[str, Any]]:
+    """
+    Guardrails for one completed part of a document, e.g. the field object at
+    "composition.ingredients[3].cas" while the rest is still being streamed.
+    Only rules below `path` run; warning paths are the same as for the whole
+    document. Check each value once (a field, not also its enclosing item).
+    """
+    visit = _check_at.get(_INDEX_RE.sub("[*]", path))
+    warnings: List[Dict[str, Any]] = []
+    if visit is not None:
+        visit(value, tuple(int(i) for i in _INDEX_RE.findall(path)), warnings, normalize)
     return warnings
@@ -0,0 +1,174 @@
+"""
+Crash-safe journal of a batch run: one SQLite row per input document.
+
+Every state change is committed before the document moves on, so a batch
+that dies part-way can be re-run with the same command. Documents already
+done with unchanged content (and whose output is still there) are skipped;
+documents that were in flight when it died, or that failed, are queued
+again, up to `max_attempts` started runs each.
+
+    pending -> in_flight -> done | failed
+
+Rows carry the input's size and mtime next to its SHA-256, so resuming only
+re-hashes files that changed: one stat and one dict lookup per document.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from main import utc_now_iso
+
+JOURNAL_FILENAME = "batch_journal.sqlite"
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    input TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    record TEXT,
+    updated_utc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_state ON documents (state);
+"""
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class BatchJournal:
+    """
+    SQLite-backed document states for run_batch (WAL mode; safe to share
+    between the worker threads of one batch).
+    """
+
+    def __init__(self, path: Path, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit: each state change is its own transaction.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def plan(self, inputs: Sequence[Path], outputs: Sequence[Path]) -> Tuple[List[int], Dict[str, int]]:
+        """
+        Record the inputs of a run and decide what to process. Returns the
+        indices to run plus counts: "new" (not journaled, or content/output
+        changed), "retry" (failed or interrupted), "done" and "exhausted"
+        (started `max_attempts` times without finishing ok) - the last two are skipped.
+        """
+        with self._lock:
+            known = {
+                row[0]: row
+                for row in self._conn.execute(
+                    "SELECT input, output, sha256, size, mtime_ns, state, attempts FROM documents"
+                )
+            }
+        counts = {"new": 0, "retry": 0, "done": 0, "exhausted": 0}
+        todo: List[int] = []
+        upserts: List[Tuple[Any, ...]] = []
+        refreshed: List[Tuple[Any, ...]] = []
+        now = utc_now_iso()
+        for i, (path, out) in enumerate(zip(inputs, outputs)):
+            key, out_s = str(path), str(out)
+            try:
+                st = path.stat()
+                size, mtime_ns = st.st_size, st.st_mtime_ns
+            except OSError:
+                size = mtime_ns = None
+            row = known.get(key)
+            if row is not None and (row[3], row[4]) == (size, mtime_ns):
+                sha = row[2]
+            else:
+                sha = sha256_file(path) if size is not None else ""
+                if row is not None and row[2] == sha:
+                    refreshed.append((size, mtime_ns, key))  # touched, same content
+
+            if row is not None and row[1] == out_s and row[2] == sha:
+                state, attempts = row[5], row[6]
+                if state == "done" and Path(out_s).exists():
+                    counts["done"] += 1
+                    continue
+                # An in_flight row was started but never finished (crash, OOM, kill):
+                # a document that takes the worker down must not be retried forever.
+                if state != "done" and attempts >= self.max_attempts:
+                    counts["exhausted"] += 1
+                    continue
+                if state != "done":
+                    counts["retry"] += 1
+                    todo.append(i)
+                    continue
+            counts["new"] += 1
+            todo.append(i)
+            upserts.append((key, out_s, sha, size, mtime_ns, "pending", 0, now))
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (input, output, sha256, size, mtime_ns, state, attempts, updated_utc) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                upserts,
+            )
+            self._conn.executemany("UPDATE documents SET size = ?, mtime_ns = ? WHERE input = ?", refreshed)
+            self._conn.execute("COMMIT")
+        return todo, counts
+
+    def start(self, path: Path) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET state = 'in_flight', attempts = attempts + 1, updated_utc = ? WHERE input = ?",
+                (utc_now_iso(), str(path)),
+            )
+
+    def finish(self, path: Path, record: Dict[str, Any]) -> None:
+        """Store the batch record; "ok" documents are done, anything else failed."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE documents SET state = ?, error = ?, record = ?, updated_utc = ? WHERE input = ?",
+                (
+                    "done" if record["status"] == "ok" else "failed",
+                    record.get("error"),
+                    json.dumps(record, ensure_ascii=False),
+                    utc_now_iso(),
+                    str(path),
+                ),
+            )
+
+    def records(self) -> Dict[str, Dict[str, Any]]:
+        """Last batch record of every journaled document that finished at least once."""
+        with self._lock:
+            rows = self._conn.execute("SELECT input, record FROM documents WHERE record IS NOT NULL").fetchall()
+        return {path: json.loads(record) for path, record in rows}
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM documents GROUP BY state").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "BatchJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
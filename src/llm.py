@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from prompts import estimate_tokens
+from scheduler import RequestScheduler
+
+
+def create_response(
+    client: OpenAI,
+    messages: List[Dict[str, str]],
+    model: str,
+    scheduler: Optional[RequestScheduler] = None,
+) -> Any:
+    """
+    Single Responses API call; every model request in the pipeline goes through here.
+    With a `scheduler`, the call is budgeted (RPM/TPM), adapts to rate-limit
+    headers and is retried by the scheduler instead of the client.
+    """
+    if scheduler is None:
+        return client.responses.create(
+            model=model,
+            input=messages,
+        )
+
+    raw_client = client.with_options(max_retries=0)
+
+    def _call():
+        raw = raw_client.responses.with_raw_response.create(model=model, input=messages)
+        resp = raw.parse()
+        usage = response_usage(resp)
+        return resp, raw.headers, usage["input_tokens"] + usage["output_tokens"]
+
+    return scheduler.call(_call, estimate_tokens("".join(m["content"] for m in messages)))
+
+
+def _consume_stream(stream: Any, on_delta: Optional[Callable[[str], Any]]) -> Tuple[str, Any]:
+    parts: List[str] = []
+    final = None
+    with stream:
+        for event in stream:
+            kind = getattr(event, "type", "")
+            if kind == "response.output_text.delta":
+                parts.append(event.delta)
+                if on_delta is not None and on_delta(event.delta) is False:
+                    break  # leaving the block closes the connection
+            elif kind in ("response.completed", "response.incomplete"):
+                final = event.response
+            elif kind in ("response.failed", "error"):
+                error = getattr(getattr(event, "response", None), "error", None) or getattr(event, "message", None)
+                raise RuntimeError(f"streamed response failed: {error}")
+    return "".join(parts), final
+
+
+def stream_response(
+    client: OpenAI,
+    messages: List[Dict[str, str]],
+    model: str,
+    scheduler: Optional[RequestScheduler] = None,
+    on_delta: Optional[Callable[[str], Any]] = None,
+    on_start: Optional[Callable[[], None]] = None,
+) -> Tuple[str, Any]:
+    """
+    Streaming variant of create_response. `on_delta(text)` is called with each
+    output text delta as it arrives; returning False stops reading and closes
+    the request. `on_start()` runs before every attempt (the scheduler may
+    retry), so consumers can discard a partial answer.
+
+    Returns (output_text, response); response is the final Response (with
+    usage), or None when reading was stopped early.
+    """
+    if scheduler is None:
+        if on_start is not None:
+            on_start()
+        stream = client.responses.create(model=model, input=messages, stream=True)
+        return _consume_stream(stream, on_delta)
+
+    raw_client = client.with_options(max_retries=0)
+
+    def _call():
+        if on_start is not None:
+            on_start()
+        raw = raw_client.responses.with_raw_response.create(model=model, input=messages, stream=True)
+        text, final = _consume_stream(raw.parse(), on_delta)
+        usage = response_usage(final)
+        return (text, final), raw.headers, usage["input_tokens"] + usage["output_tokens"]
+
+    return scheduler.call(_call, estimate_tokens("".join(m["content"] for m in messages)))
+
+
+def response_usage(resp: Any) -> Dict[str, int]:
+    """Token usage of a Responses result (zeros when the server reports none)."""
+    usage = getattr(resp, "usage", None)
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
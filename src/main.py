@@ -4,16 +4,36 @@ import json
 import os
 import sys
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from format_guardrails import apply_format_guardrails
 
 from dotenv import load_dotenv
 from openai import OpenAI
-from pypdf import PdfReader
 from eval import evaluate
-from prompts import SYSTEM, user_prompt
+from prompts import SYSTEM, estimate_tokens, user_prompt
+from cache import DEFAULT_CACHE_DIR, ExtractionCache, cache_key, sha256_bytes, sha256_text
+from pdf_text import PageTextCache, read_pdf_pages
+from sections import select_sections
+from llm import create_response, response_usage, stream_response
+from metrics import MetricsSink, StageTimer, metrics_record
+from scheduler import DEFAULT_MAX_RETRIES, RequestScheduler
+from fanout import extract_fanout
+from evidence import EvidenceIndex, evidence_warnings, verify_evidence
+from preextract import PRE_EXTRACT_MODES, fill_resolved, hints_text, pre_extract
+from streaming import FieldStream
+from repair import needs_repair, reextract_warnings, repair_output, repair_warnings
+from cascade import CONFIDENCE_THRESHOLD, ESCALATION_MODEL, escalate
+from compact import compact_pages
+from revisions import (
+    REVISIONS_FILENAME, RevisionStore, carried_groups, changed_sections, result_keys, section_fingerprints, text_keys,
+)
+from neardup import (
+    DEFAULT_THRESHOLD, NEAR_DUP_FILENAME, NearDuplicateIndex, reusable_groups, section_hashes, signature,
+)
 from datetime import datetime, timezone
 import uuid
 import argparse
+import tempfile
 
 import sys
 
@@ -25,9 +45,12 @@ except Exception:
 
 MAX_CHARS =50_000
 
-REQUEST_VERSION = "sds-extractor-v0.1"  # bump when you change schema/prompt
+REQUEST_VERSION = "sds-extractor-v0.2"  # bump when you change schema/prompt
 MODEL_NAME = "gpt-4o-mini"
 
+# Any edit to the system prompt or prompt template changes this and so misses the cache.
+PROMPT_SHA256 = sha256_text(SYSTEM + user_prompt(""))
+
 def new_run_id() -> str:
     return uuid.uuid4().hex[:12]
 
@@ -35,22 +58,769 @@ def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
 
 
-def read_pdf_text(file_path: Path) -> str:
-    reader = PdfReader(str(file_path))
-    parts = []
-    for page in reader.pages:
-        parts.append(page.extract_text() or "")
-    return "\n".join(parts)
+def read_pdf_text(file_path: Path, **options: Any) -> str:
+    pages, _ = read_pdf_pages(file_path, **options)
+    return "\n".join(pages)
 
 def read_input(file_path: Path) -> str:
     if file_path.suffix.lower() == ".pdf":
         return read_pdf_text(file_path)
     return file_path.read_text(encoding="utf-8", errors="replace")
 
+def read_document(file_path: Path, compact: bool = True, **pdf_options: Any) -> Tuple[str, Dict[str, Any]]:
+    """
+    Like read_input, but also returns page-level read stats (see
+    pdf_text.read_pdf_pages), including "page_starts": the text offset of each page.
+    With `compact`, repeated page headers/footers are stripped and whitespace
+    is compacted (see compact.compact_pages); stats["compaction"] counts the
+    characters removed.
+    """
+    if file_path.suffix.lower() == ".pdf":
+        pages, read_stats = read_pdf_pages(file_path, **pdf_options)
+        if compact:
+            pages, read_stats["compaction"] = compact_pages(pages)
+        starts, pos = [], 0
+        for page in pages:
+            starts.append(pos)
+            pos += len(page) + 1
+        read_stats["page_starts"] = starts
+        return "\n".join(pages), read_stats
+    text = file_path.read_text(encoding="utf-8", errors="replace")
+    if compact:
+        (text,), compaction = compact_pages([text])
+        return text, {"compaction": compaction}
+    return text, {}
+
 def require_key():
     if not os.getenv("OPENAI_API_KEY"):
         raise RuntimeError("OPENAI_API_KEY not set. Add it to .env")
 
+
+def prepare_text(text: str, segment: bool = True) -> Dict[str, Any]:
+    """
+    Build the text sent to the model and return it with its size stats.
+
+    With `segment`, only the schema-relevant SDS sections (1, 2, 3, 9, 14) are
+    sent; when their headings cannot be located this falls back to clipping the
+    full text to MAX_CHARS. stats["segmentation"] records per-section character
+    counts and the estimated token savings against plain clipping.
+    """
+    baseline = text[:MAX_CHARS] if len(text) > MAX_CHARS else text
+    source = text
+    seg_info: Optional[Dict[str, Any]] = None
+    if segment:
+        selected, seg_info = select_sections(text)
+        if selected is not None:
+            source = selected
+        seg_info["mode"] = "sections" if selected is not None else "full_text"
+
+    clipped = source[:MAX_CHARS] if len(source) > MAX_CHARS else source
+    stats: Dict[str, Any] = {
+        "text": clipped,
+        "total_chars": len(text),
+        "sent_chars": len(clipped),
+        "truncated": len(source) > MAX_CHARS,
+    }
+    if seg_info is not None:
+        seg_info["baseline_chars"] = len(baseline)
+        seg_info["estimated_tokens_saved"] = estimate_tokens(baseline) - estimate_tokens(clipped)
+        stats["segmentation"] = seg_info
+    return stats
+
+
+def build_messages(text: str, pre: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+    """`pre` (preextract.pre_extract output) adds candidate hints and drops skipped fields."""
+    if pre is None:
+        prompt = user_prompt(text)
+    else:
+        prompt = user_prompt(text, hints=hints_text(pre), omit=pre["skipped_fields"])
+    return [
+        {"role": "system", "content": SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def call_model(client: OpenAI, text: str, scheduler: Optional[RequestScheduler] = None) -> str:
+    """One blocking Responses call; returns the raw output text."""
+    resp = create_response(client, build_messages(text), MODEL_NAME, scheduler)
+    return resp.output_text or ""
+
+
+def empty_usage() -> Dict[str, int]:
+    return {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+
+
+def finalize_output(
+    out: str,
+    *,
+    run_id: str,
+    run_ts: str,
+    input_filename: str,
+    stats: Dict[str, Any],
+    truth_path: Optional[Path] = None,
+    extra_meta: Optional[Dict[str, Any]] = None,
+    timer: Optional[StageTimer] = None,
+    evidence_index: Optional[EvidenceIndex] = None,
+) -> Dict[str, Any]:
+    """
+    Parse the model output, apply guardrails and populate meta (+ eval).
+    With a `timer`, the parse/guardrail/eval stages are timed and all stage
+    timings so far are stored in meta.timings.
+    With an `evidence_index` of the source text, every evidence snippet is
+    located (meta.evidence) and missing ones get an `evidence_not_found`
+    warning; without one, a verification result carried in stats["evidence"]
+    (cached runs) is reused.
+    Raises if the output is not a JSON object.
+    """
+    timer = timer or StageTimer()
+    with timer.stage("json_parse"):
+        parsed = json.loads(out)
+    if "pre_extract" in stats and isinstance(parsed, dict):
+        fill_resolved(parsed, stats["pre_extract"])
+    evidence = stats.get("evidence")
+    if evidence_index is not None:
+        with timer.stage("evidence_verify"):
+            evidence = verify_evidence(parsed, evidence_index)
+    with timer.stage("guardrails"):
+        warnings = apply_format_guardrails(parsed, normalize=True)
+    if evidence is not None:
+        warnings.extend(evidence_warnings(parsed, evidence))
+    if "repair" in stats:
+        warnings.extend(repair_warnings(stats["repair"]))
+    for k in ("near_duplicate", "incremental"):
+        if k in stats:
+            warnings.extend(reextract_warnings(stats[k]))
+
+    # Ensure meta exists
+    parsed.setdefault("meta", {})
+
+    # 1. ALWAYS populate standard metadata
+    parsed["meta"]["run_id"] = run_id
+    parsed["meta"]["run_timestamp_utc"] = run_ts
+    parsed["meta"]["input_filename"] = input_filename
+    parsed["meta"]["model"] = MODEL_NAME
+    parsed["meta"]["request_version"] = REQUEST_VERSION
+    parsed["meta"]["max_chars"] = MAX_CHARS
+    parsed["meta"]["input_char_count"] = stats["total_chars"]
+    parsed["meta"]["chars_sent_to_model"] = stats["sent_chars"]
+    parsed["meta"]["input_truncated"] = stats["truncated"]
+    parsed["meta"]["extraction_mode"] = stats.get("mode", "single")
+    for k in (
+        "compaction", "segmentation", "fanout", "pre_extract", "streaming", "repair", "cascade", "near_duplicate",
+        "incremental",
+    ):
+        if k in stats:
+            parsed["meta"][k] = stats[k]
+    if evidence is not None:
+        parsed["meta"]["evidence"] = evidence
+    parsed["meta"].setdefault("validation_warnings", [])
+    parsed["meta"]["validation_warnings"].extend(warnings)
+    if extra_meta:
+        parsed["meta"].update(extra_meta)
+
+    # 2. ONLY populate eval results if a truth file was provided
+    if truth_path:
+        with timer.stage("evaluate"):
+            truth = json.loads(truth_path.read_text(encoding="utf-8"))
+            eval_result = evaluate(parsed, truth)
+
+        print(
+            f"\n[EVAL] accuracy={eval_result['accuracy']}% "
+            f"correct={eval_result['correct']}/{eval_result['fields_compared']} "
+            f"missing={len(eval_result['missing'])} "
+            f"hallucinated={len(eval_result['hallucinated'])}",
+            file=sys.stderr
+        )
+        parsed["meta"]["eval"] = eval_result
+
+    parsed["meta"]["timings"] = timer.as_dict()
+    return parsed
+
+
+def _is_json(out: str) -> bool:
+    try:
+        json.loads(out)
+        return True
+    except ValueError:
+        return False
+
+
+def _read_stats_str(read_stats: Dict[str, Any]) -> str:
+    if not read_stats:
+        return ""
+    return (
+        f" pages={read_stats['pages_read']}/{read_stats['pages_total']}"
+        f" pages_cached={read_stats['pages_cached']}"
+        f" page_ms_avg={read_stats['page_ms_avg']} page_ms_max={read_stats['page_ms_max']}"
+        f" read_ms={read_stats['read_ms']} parallel={read_stats['parallel']}"
+        f" early_stopped={read_stats['early_stopped']}"
+    )
+
+
+def _text_mode(stats: Dict[str, Any]) -> str:
+    if "fanout" in stats or stats.get("mode") in ("near_duplicate", "incremental"):
+        return "per_group"
+    return stats.get("segmentation", {}).get("mode", "full_text")
+
+
+def _cache_state(cache: Optional[ExtractionCache], entry: Optional[Dict[str, Any]], refresh: bool) -> str:
+    if cache is None:
+        return "off"
+    if refresh:
+        return "refresh"
+    return "hit" if entry is not None else "miss"
+
+
+def extraction_cache_key(
+    file_sha256: str,
+    early_stop: bool = False,
+    segment: bool = True,
+    mode: str = "single",
+    pre_extract: str = "off",
+    cascade: str = "off",
+    compact: bool = True,
+) -> str:
+    """Cache key: input bytes + everything that can change the model's answer."""
+    return cache_key(
+        file_sha256,
+        REQUEST_VERSION,
+        MODEL_NAME,
+        PROMPT_SHA256,
+        MAX_CHARS,
+        f"early_stop={early_stop}",
+        f"segment={segment}",
+        f"mode={mode}",
+        f"pre_extract={pre_extract}",
+        f"cascade={cascade}",
+        f"compact={compact}",
+    )
+
+
+def extract_document(
+    client: OpenAI,
+    file_path: Path,
+    truth_path: Optional[Path] = None,
+    cache: Optional[ExtractionCache] = None,
+    refresh: bool = False,
+    page_cache: Optional[PageTextCache] = None,
+    early_stop: bool = False,
+    segment: bool = True,
+    mode: str = "single",
+    scheduler: Optional[RequestScheduler] = None,
+    pre_extract_mode: str = "off",
+    stream: bool = False,
+    on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    repair: bool = True,
+    cascade: bool = False,
+    cascade_threshold: float = CONFIDENCE_THRESHOLD,
+    cascade_model: str = ESCALATION_MODEL,
+    compact: bool = True,
+    near_dup: Optional[NearDuplicateIndex] = None,
+    near_dup_reuse: bool = False,
+    revisions: Optional[RevisionStore] = None,
+) -> Dict[str, Any]:
+    """
+    Full pipeline for one input: read -> clip -> LLM -> guardrails/meta (-> eval).
+
+    With a `cache`, a previous raw model output for identical input bytes and
+    prompt/model settings is reused (skipping PDF reading and the LLM call);
+    `refresh=True` ignores any stored entry and overwrites it. `page_cache` and
+    `early_stop` are passed to the PDF reader (see pdf_text.read_pdf_pages);
+    `segment` selects schema-relevant sections (see prepare_text); `compact`
+    strips repeated page headers/footers and redundant whitespace first (see
+    compact.py, recorded in meta.compaction).
+    `mode="fanout"` requests each schema group concurrently with only its own
+    sections and merges the results (see fanout.extract_fanout).
+    A `scheduler` budgets and retries every model request (see scheduler.py).
+    `pre_extract_mode` ("hints" / "skip", single mode only) runs the regex
+    pre-extractor first and passes its candidates to the model or fills the
+    resolved fields locally (see preextract.py).
+    `stream=True` (single mode only) reads the answer as it is generated:
+    every completed field is format-checked immediately and passed to
+    `on_partial` (see streaming.FieldStream), time to first field since the
+    request was sent (its last attempt) is recorded as
+    meta.timings.first_field_ms, and an answer that stops being valid JSON
+    is abandoned at the offending character.
+    With `repair` (single mode), output that is not a complete schema object
+    is fixed locally where possible and only the missing schema groups are
+    re-requested (see repair.py); meta.repair records what was done and the
+    tokens saved against re-running the document. `raw` stays the original
+    model output.
+    With `cascade` (single mode), fields answered with confidence below
+    `cascade_threshold` or flagged by a format guardrail are re-extracted by
+    `cascade_model` from their sections only and merged back (see cascade.py);
+    meta.cascade records the escalated fields and the escalation rate.
+    With a `near_dup` index, the text is looked up among earlier extractions
+    (see neardup.py) and indexed afterwards; meta.near_duplicate reports the
+    best match and its similarity. With `near_dup_reuse` (single mode), the
+    schema groups whose sections are unchanged in the match are copied from
+    it and only the others are requested from the model.
+    With `revisions` (single mode), an input whose product code or name is
+    already stored is diffed section by section against the latest stored
+    revision; schema groups whose sections are unchanged are carried forward
+    with their evidence and only the others are re-extracted (see
+    revisions.py, recorded in meta.incremental). Takes precedence over
+    near-duplicate reuse.
+
+    Stage wall-clock timings and the model token usage of this run (zero on a
+    cache hit) are stored in meta.timings / meta.usage; input tokens are split
+    into those served from the provider's prompt-prefix cache (cached_tokens)
+    and the rest (uncached_input_tokens).
+
+    Returns {"parsed": dict | None, "raw": str, "error": str | None,
+    "timings_ms": {...}, "usage": {...}}; `parsed` is None when the model
+    output could not be turned into a JSON object.
+    """
+    run_id = new_run_id()
+    run_ts = utc_now_iso()
+    timer = StageTimer()
+    usage = empty_usage()
+
+    with timer.stage("cache_lookup"):
+        file_sha256 = sha256_bytes(file_path.read_bytes())
+        key = (
+            extraction_cache_key(
+                file_sha256, early_stop, segment, mode, pre_extract_mode,
+                f"{cascade_model}@{cascade_threshold}" if cascade and mode == "single" else "off",
+                compact,
+            )
+            if cache is not None else None
+        )
+        entry = cache.get(key) if cache is not None and not refresh else None
+
+    read_stats: Dict[str, Any] = {}
+    evidence_index: Optional[EvidenceIndex] = None
+    raw: Optional[str] = None
+    cacheable = False
+    if entry is not None:
+        stats = entry["stats"]
+        out = entry["output_text"]
+    else:
+        with timer.stage("input_read"):
+            text, read_stats = read_document(
+                file_path, compact=compact, file_sha256=file_sha256, page_cache=page_cache, early_stop=early_stop
+            )
+            compaction = read_stats.pop("compaction", None)
+        with timer.stage("evidence_index"):
+            evidence_index = EvidenceIndex(text, read_stats.pop("page_starts", None))
+        # Schema groups taken from an earlier extraction instead of the model, and
+        # the meta entry ("incremental" / "near_duplicate") that reports them.
+        carried: Dict[str, Any] = {}
+        carry_meta: Optional[str] = None
+        carry_source: Dict[str, Any] = {}
+        inc_info: Optional[Dict[str, Any]] = None
+        if revisions is not None:
+            with timer.stage("revision_lookup"):
+                rev_sections = section_fingerprints(text)
+                previous = revisions.find(text_keys(text), exclude_sha256=file_sha256)
+            if previous is not None and mode == "single":
+                changed = changed_sections(previous["sections"], rev_sections)
+                inc_info = {
+                    "previous": previous["source"],
+                    "previous_run_id": previous["run_id"],
+                    "previous_revision_date": previous["revision_date"],
+                    "matched_on": previous["matched_on"],
+                    "changed_sections": changed,
+                    "unchanged_sections": len(rev_sections) - sum(1 for n in changed if str(n) in rev_sections),
+                }
+                groups = carried_groups(previous["result"], changed, rev_sections)
+                if groups:
+                    carried = {g: previous["result"][g] for g in groups}
+                    carry_meta, carry_source = "incremental", previous["result"]
+        near_info: Optional[Dict[str, Any]] = None
+        if near_dup is not None:
+            with timer.stage("near_dup_lookup"):
+                near_sig = signature(text)
+                near_sections = section_hashes(text, MAX_CHARS)
+                match = near_dup.query(near_sig, exclude_sha256=file_sha256)
+            near_info = {
+                "match": match["source"] if match else None,
+                "similarity": match["similarity"] if match else None,
+                "candidates": match["candidates"] if match else 0,
+            }
+            if match is not None and near_dup_reuse and mode == "single" and not carried:
+                carried = {g: match["result"][g] for g in reusable_groups(match, near_sections)}
+                carry_meta, carry_source = "near_duplicate", match["result"]
+        if carried:
+            # The other groups are requested like a repair, from their own sections only.
+            rerun_tokens = estimate_tokens(SYSTEM + user_prompt(prepare_text(text, segment)["text"])) + estimate_tokens(
+                json.dumps(carry_source, ensure_ascii=False)
+            )
+            with timer.stage("llm_call"):
+                merged, carry_info = repair_output(
+                    json.dumps(dict(carried, meta={"notes": ""}), ensure_ascii=False),
+                    client=client,
+                    text=text,
+                    model=MODEL_NAME,
+                    max_chars=MAX_CHARS,
+                    scheduler=scheduler,
+                    full_rerun_tokens=rerun_tokens,
+                )
+            for k in ("requests", "input_tokens", "output_tokens", "cached_tokens"):
+                usage[k] += carry_info[k]
+            (inc_info if carry_meta == "incremental" else near_info).update(
+                {"carried_groups" if carry_meta == "incremental" else "reused_groups": list(carried)},
+                reextracted_groups=carry_info["rerequested_groups"],
+                missing_groups=carry_info["missing_groups"],
+                tokens_saved_est=carry_info["tokens_saved_est"],
+            )
+            stats = {
+                "mode": carry_meta,
+                "total_chars": len(text),
+                "sent_chars": carry_info["chars_sent"],
+                "truncated": False,
+            }
+            out = json.dumps(merged, ensure_ascii=False)
+            cacheable = carry_info["repaired"]
+        elif mode == "fanout":
+            # Per-group prompts are built inside the concurrent requests.
+            with timer.stage("llm_call"):
+                merged, fan_stats = extract_fanout(client, text, MODEL_NAME, MAX_CHARS, scheduler)
+            for group in fan_stats["groups"].values():
+                usage["requests"] += 1
+                for k in ("input_tokens", "output_tokens", "cached_tokens"):
+                    usage[k] += group.get(k, 0)
+            stats = {
+                "mode": "fanout",
+                "total_chars": len(text),
+                "sent_chars": fan_stats["chars_sent"],
+                "truncated": fan_stats["truncated"],
+                "fanout": fan_stats,
+            }
+            out = json.dumps(merged, ensure_ascii=False)
+            cacheable = not fan_stats["failed_groups"]
+        else:
+            pre = None
+            if pre_extract_mode != "off":
+                with timer.stage("pre_extract"):
+                    pre = pre_extract(text, pre_extract_mode)
+            with timer.stage("prompt_build"):
+                stats = prepare_text(text, segment=segment)
+                messages = build_messages(stats["text"], pre)
+            if pre is not None:
+                stats["pre_extract"] = pre
+            if stream:
+                field_stream = FieldStream(on_partial)
+                with timer.stage("llm_call"):
+                    out, resp = stream_response(
+                        client, messages, MODEL_NAME, scheduler,
+                        on_delta=field_stream.feed, on_start=field_stream.reset,
+                    )
+                stats["streaming"] = field_stream.stats()
+                if field_stream.first_field_ms is not None:
+                    timer.record("first_field", field_stream.first_field_ms)
+            else:
+                with timer.stage("llm_call"):
+                    resp = create_response(client, messages, MODEL_NAME, scheduler)
+                out = resp.output_text or ""
+            usage["requests"] = 1
+            if resp is not None:
+                usage.update(response_usage(resp))
+            raw = out
+            if repair and needs_repair(out):
+                full_rerun_tokens = (
+                    (usage["input_tokens"] or estimate_tokens("".join(m["content"] for m in messages)))
+                    + (usage["output_tokens"] or estimate_tokens(out))
+                )
+                with timer.stage("repair"):
+                    repaired, repair_info = repair_output(
+                        out,
+                        client=client,
+                        text=text,
+                        model=MODEL_NAME,
+                        max_chars=MAX_CHARS,
+                        scheduler=scheduler,
+                        full_rerun_tokens=full_rerun_tokens,
+                    )
+                stats["repair"] = repair_info
+                for k in ("requests", "input_tokens", "output_tokens", "cached_tokens"):
+                    usage[k] += repair_info[k]
+                if repaired:
+                    out = json.dumps(repaired, ensure_ascii=False)
+            cacheable = _is_json(out) and stats.get("repair", {}).get("repaired", True)
+            first = json.loads(out) if cascade and cacheable else None
+            if isinstance(first, dict):
+                with timer.stage("cascade"):
+                    escalated, cascade_info = escalate(
+                        first,
+                        client=client,
+                        text=text,
+                        max_chars=MAX_CHARS,
+                        model=cascade_model,
+                        threshold=cascade_threshold,
+                        scheduler=scheduler,
+                    )
+                stats["cascade"] = cascade_info
+                for k in ("requests", "input_tokens", "output_tokens", "cached_tokens"):
+                    usage[k] += cascade_info[k]
+                out = json.dumps(escalated, ensure_ascii=False)
+                # An answer that still needs escalation must not be served from the cache.
+                cacheable = "error" not in cascade_info
+        if compaction is not None:
+            stats["compaction"] = compaction
+        if near_info is not None:
+            stats["near_duplicate"] = near_info
+        if inc_info is not None:
+            stats["incremental"] = inc_info
+
+    print(
+        f"[SDS STATS] file={file_path.name} total_chars={stats['total_chars']:,} "
+        f"sent_chars={stats['sent_chars']:,} truncated={stats['truncated']} "
+        f"mode={stats.get('mode', 'single')} "
+        f"text_mode={_text_mode(stats)} "
+        f"cache={_cache_state(cache, entry, refresh)}"
+        + _read_stats_str(read_stats)
+        + (f" compacted=-{stats['compaction']['removed_pct']}%" if "compaction" in stats else "")
+        + (f" pre_resolved={len(stats['pre_extract']['fields_resolved'])}" if "pre_extract" in stats else "")
+        + f" llm_ms={timer.timings_ms.get('llm_call', 0.0)}"
+        + (f" first_field_ms={timer.timings_ms.get('first_field')}" if "streaming" in stats else "")
+        + (
+            f" repaired={stats['repair']['repaired']} rerequested={','.join(stats['repair']['rerequested_groups']) or '-'}"
+            if "repair" in stats else ""
+        )
+        + (
+            f" escalated={len(stats['cascade']['escalated'])}/{stats['cascade']['units_total']}"
+            if "cascade" in stats else ""
+        )
+        + (
+            f" near_dup={stats['near_duplicate']['similarity']}"
+            f" reused={','.join(stats['near_duplicate'].get('reused_groups', [])) or '-'}"
+            if stats.get("near_duplicate", {}).get("match") else ""
+        )
+        + (
+            f" revision_of={stats['incremental']['previous']}"
+            f" changed_sections={','.join(map(str, stats['incremental']['changed_sections'])) or '-'}"
+            if "incremental" in stats else ""
+        )
+        + f" input_tokens={usage['input_tokens']} output_tokens={usage['output_tokens']}"
+        f" cached_tokens={usage['cached_tokens']}",
+        file=sys.stderr,
+    )
+    usage["uncached_input_tokens"] = usage["input_tokens"] - usage["cached_tokens"]
+
+    extra_meta: Dict[str, Any] = {"usage": usage}
+    if read_stats:
+        extra_meta["pdf_read"] = read_stats
+    if cache is not None:
+        extra_meta["cache"] = {
+            "key": key,
+            "hit": entry is not None,
+            "refreshed": refresh,
+            **cache.counters(),
+        }
+    if scheduler is not None:
+        extra_meta["scheduler"] = scheduler.metrics()
+
+    result: Dict[str, Any] = {
+        "parsed": None,
+        "raw": raw if raw is not None else out,
+        "error": None,
+        "usage": usage,
+        "repair": stats.get("repair"),
+        "cascade": stats.get("cascade"),
+    }
+    try:
+        result["parsed"] = finalize_output(
+            out,
+            run_id=run_id,
+            run_ts=run_ts,
+            input_filename=file_path.name,
+            stats=stats,
+            truth_path=truth_path,
+            extra_meta=extra_meta,
+            timer=timer,
+            evidence_index=evidence_index,
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        stream_error = stats.get("streaming", {}).get("error")
+        if stream_error:
+            result["error"] = (
+                f"{stream_error} (stopped reading after {stats['streaming']['chars']} chars, "
+                f"{stats['streaming']['error_ms']} ms)"
+            )
+
+    if cache is not None and cacheable:
+        # Streaming stats describe this request only, not the cached answer.
+        cached_stats = {
+            k: v for k, v in stats.items() if k not in ("text", "streaming", "repair", "cascade", "near_duplicate", "incremental")
+        }
+        if result["parsed"] is not None and "evidence" in result["parsed"]["meta"]:
+            cached_stats["evidence"] = result["parsed"]["meta"]["evidence"]
+        cache.put(key, {
+            "created_utc": utc_now_iso(),
+            "input_filename": file_path.name,
+            "stats": cached_stats,
+            "output_text": out,
+        })
+    if near_dup is not None and entry is None and result["parsed"] is not None and cacheable:
+        if not near_dup.contains(file_sha256):
+            near_dup.add(file_path.name, file_sha256, near_sig, near_sections, result["parsed"])
+    if revisions is not None and entry is None and result["parsed"] is not None and cacheable:
+        keys = result_keys(result["parsed"]) + text_keys(text)
+        revisions.add(file_path.name, file_sha256, keys, rev_sections, result["parsed"])
+    result["timings_ms"] = timer.as_dict()
+    return result
+
+
+class Extractor:
+    """
+    Reusable in-process extraction engine.
+
+    Holds one OpenAI client (and so one HTTP connection pool) plus the cache and
+    text options, so callers such as app.py, batch.py or a service can run many
+    documents - concurrently from several threads - without paying interpreter
+    start-up, imports or a new TLS handshake per file.
+    """
+
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        *,
+        cache: Optional[ExtractionCache] = None,
+        page_cache: Optional[PageTextCache] = None,
+        refresh: bool = False,
+        early_stop: bool = False,
+        segment: bool = True,
+        mode: str = "single",
+        scheduler: Optional[RequestScheduler] = None,
+        metrics: Optional[MetricsSink] = None,
+        pre_extract: str = "off",
+        stream: bool = False,
+        repair: bool = True,
+        cascade: bool = False,
+        cascade_threshold: float = CONFIDENCE_THRESHOLD,
+        cascade_model: str = ESCALATION_MODEL,
+        compact: bool = True,
+        near_dup: Optional[NearDuplicateIndex] = None,
+        near_dup_reuse: bool = False,
+        revisions: Optional[RevisionStore] = None,
+    ):
+        self.client = client if client is not None else OpenAI()
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self.cache = cache
+        self.page_cache = page_cache
+        self.refresh = refresh
+        self.early_stop = early_stop
+        self.segment = segment
+        self.mode = mode
+        self.pre_extract = pre_extract
+        self.stream = stream
+        self.repair = repair
+        self.cascade = cascade
+        self.cascade_threshold = cascade_threshold
+        self.cascade_model = cascade_model
+        self.compact = compact
+        self.near_dup = near_dup
+        self.near_dup_reuse = near_dup_reuse
+        self.revisions = revisions
+
+    def extract(
+        self,
+        file_path: Path,
+        truth_path: Optional[Path] = None,
+        out_path: Optional[Path] = None,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run the pipeline on one file; same return shape as extract_document.
+        With `out_path`, a parsed result is also written there as pretty JSON
+        (timed as output_write in result["timings_ms"]). `on_partial` receives
+        fields as they are generated when the extractor streams.
+        """
+        return self._extract(Path(file_path), truth_path, out_path, str(file_path), on_partial)
+
+    def extract_bytes(
+        self,
+        data: bytes,
+        filename: str,
+        truth_path: Optional[Path] = None,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Run the pipeline on in-memory file contents (e.g. an upload)."""
+        suffix = Path(filename).suffix.lower() or ".pdf"
+        with tempfile.TemporaryDirectory(prefix="sds_") as tmp_dir:
+            tmp_path = Path(tmp_dir) / f"upload{suffix}"
+            tmp_path.write_bytes(data)
+            result = self._extract(tmp_path, truth_path, None, filename, on_partial)
+        if result["parsed"] is not None:
+            result["parsed"]["meta"]["input_filename"] = filename
+        return result
+
+    def _extract(
+        self,
+        file_path: Path,
+        truth_path: Optional[Path],
+        out_path: Optional[Path],
+        input_name: str,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        result = extract_document(
+            self.client,
+            file_path,
+            truth_path,
+            cache=self.cache,
+            refresh=self.refresh,
+            page_cache=self.page_cache,
+            early_stop=self.early_stop,
+            segment=self.segment,
+            mode=self.mode,
+            scheduler=self.scheduler,
+            pre_extract_mode=self.pre_extract,
+            stream=self.stream,
+            on_partial=on_partial,
+            repair=self.repair,
+            cascade=self.cascade,
+            cascade_threshold=self.cascade_threshold,
+            cascade_model=self.cascade_model,
+            compact=self.compact,
+            near_dup=self.near_dup,
+            near_dup_reuse=self.near_dup_reuse,
+            revisions=self.revisions,
+        )
+        if out_path is not None and result["parsed"] is not None:
+            # Happens after meta is serialized, so this stage only shows up in
+            # the returned timings / metrics sink, not in meta.timings.
+            timer = StageTimer()
+            with timer.stage("output_write"):
+                Path(out_path).write_text(
+                    json.dumps(result["parsed"], indent=2, ensure_ascii=False), encoding="utf-8"
+                )
+            result["timings_ms"]["output_write_ms"] = timer.timings_ms["output_write"]
+        if self.metrics is not None:
+            self.metrics.record(metrics_record(result, input_name))
+        return result
+
+
+def extractor_from_args(args: argparse.Namespace) -> Extractor:
+    cache = None if args.no_cache else ExtractionCache(args.cache_dir)
+    page_cache = None if args.no_cache else PageTextCache(args.cache_dir / "pages")
+    return Extractor(
+        cache=cache,
+        page_cache=page_cache,
+        refresh=args.refresh,
+        early_stop=args.early_stop,
+        segment=not args.full_text,
+        mode=args.mode,
+        scheduler=RequestScheduler(rpm=args.rpm, tpm=args.tpm, max_retries=args.max_retries),
+        metrics=MetricsSink(args.metrics_out) if args.metrics_out else None,
+        pre_extract=args.pre_extract,
+        stream=args.stream,
+        repair=not args.no_repair,
+        cascade=args.cascade,
+        cascade_threshold=args.cascade_threshold,
+        cascade_model=args.cascade_model,
+        compact=not args.no_compact,
+        near_dup=(
+            NearDuplicateIndex(args.cache_dir / NEAR_DUP_FILENAME, args.near_dup_threshold)
+            if args.near_dup != "off" else None
+        ),
+        near_dup_reuse=args.near_dup == "reuse",
+        revisions=RevisionStore(args.cache_dir / REVISIONS_FILENAME) if args.incremental else None,
+    )
+
+
 def main() -> int:
     load_dotenv()
     require_key()
@@ -60,7 +830,7 @@ def main() -> int:
     )
     parser.add_argument(
         "input_path",
-        help="Path to SDS PDF or text file"
+        help="Path to SDS PDF or text file (with --batch: a directory, glob or manifest file)"
     )
     parser.add_argument(
         "--out",
@@ -74,83 +844,247 @@ def main() -> int:
     default=None,
     help="Path to ground-truth JSON file for evaluation"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk extraction cache"
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached model output for this input and store a fresh one"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Extraction cache directory (default: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--early-stop",
+        action="store_true",
+        help="Stop reading PDF pages once Sections 1-3, 9 and 14 have been read"
+    )
+    parser.add_argument(
+        "--full-text",
+        action="store_true",
+        help="Send the whole (clipped) text instead of only SDS Sections 1, 2, 3, 9 and 14"
+    )
+    parser.add_argument(
+        "--no-compact",
+        action="store_true",
+        help="Keep repeated page headers/footers and redundant whitespace in the text sent to the model"
+    )
+    parser.add_argument(
+        "--near-dup",
+        choices=("off", "report", "reuse"),
+        default="off",
+        help="Look inputs up among earlier extractions (<cache-dir>/neardup.sqlite): report the closest "
+             "near-duplicate in meta, or also reuse its unchanged schema groups (default: off)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Recognise new revisions of already extracted products (<cache-dir>/revisions.sqlite) "
+             "and re-extract only the schema groups whose sections changed"
+    )
+    parser.add_argument(
+        "--near-dup-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Minimum estimated text similarity of a near-duplicate (default: {DEFAULT_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("single", "fanout"),
+        default="single",
+        help="single: one request for the whole schema; fanout: one concurrent request per schema group"
+    )
+    parser.add_argument(
+        "--pre-extract",
+        choices=PRE_EXTRACT_MODES,
+        default="off",
+        help="Regex pre-extraction (single mode): hints = list CAS/UN/H/P/date candidates in the prompt; "
+             "skip = also drop fields resolved locally from the prompt and fill them in"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Single mode: stream the model answer, validating each field as it completes "
+             "(records time-to-first-field, stops early on malformed JSON)"
+    )
+    parser.add_argument(
+        "--no-repair",
+        action="store_true",
+        help="Single mode: do not repair malformed/incomplete model output or re-request missing schema groups"
+    )
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="Single mode: re-extract low-confidence or guardrail-flagged fields with --cascade-model"
+    )
+    parser.add_argument(
+        "--cascade-threshold",
+        type=float,
+        default=CONFIDENCE_THRESHOLD,
+        help=f"Cascade: escalate fields with confidence below this (default: {CONFIDENCE_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--cascade-model",
+        default=ESCALATION_MODEL,
+        help=f"Cascade: stronger model for escalated fields (default: {ESCALATION_MODEL})"
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=None,
+        help="Requests-per-minute budget for model calls (default: unlimited, adapts to rate-limit headers)"
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        default=None,
+        help="Tokens-per-minute budget for model calls (default: unlimited, adapts to rate-limit headers)"
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help=f"Retries for rate-limited/transient model errors (default: {DEFAULT_MAX_RETRIES})"
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Treat input_path as a directory, glob pattern, single PDF/text file or manifest (one path per line)"
+    )
+    parser.add_argument(
+        "--openai-batch",
+        action="store_true",
+        help="Like --batch, but submit through the OpenAI Batch API (24h window, half price) and ingest the results"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=30.0,
+        help="--openai-batch: seconds between batch status checks (default: 30)"
+    )
+    parser.add_argument(
+        "--out-dir",
+        type=Path,
+        default=Path("outputs"),
+        help="Batch mode: directory for per-document JSON + batch_summary.json (default: outputs)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Batch mode: number of documents in flight at once (default: 4)"
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="Batch mode: do not keep out_dir/batch_journal.sqlite (re-runs then start over)"
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Batch mode: runs per document before a re-run stops retrying it (default: 3)"
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=None,
+        help="Also write results to this SQLite result store (queried with src/store.py)"
+    )
+    parser.add_argument(
+        "--truth-dir",
+        type=Path,
+        default=None,
+        help="Batch mode: folder of ground-truth JSON files named <input stem>.json"
+    )
+    parser.add_argument(
+        "--metrics-out",
+        type=Path,
+        default=None,
+        help="Append per-document stage timings/token usage as JSON lines, "
+             "or keep a Prometheus text file of latency histograms if the name ends in .prom"
+    )
 
     args = parser.parse_args()
+    extractor = extractor_from_args(args)
+
+    if args.openai_batch:
+        from batch import collect_inputs
+        from openai_batch import run_openai_batch
+
+        if args.mode != "single":
+            print("ERROR: --openai-batch only supports --mode single")
+            return 1
+        inputs = collect_inputs(args.input_path)
+        if not inputs:
+            print(f"ERROR: no inputs found for: {args.input_path}")
+            return 1
+        try:
+            summary = run_openai_batch(inputs, extractor, args.out_dir, poll_interval=args.poll_interval)
+        except RuntimeError as e:
+            print(f"ERROR: {e}")
+            return 1
+        return 0 if summary["failed"] == 0 else 2
+
+    if args.batch:
+        from batch import collect_inputs, run_batch
+        from journal import JOURNAL_FILENAME, BatchJournal
+        from store import ResultStore
+
+        inputs = collect_inputs(args.input_path)
+        if not inputs:
+            print(f"ERROR: no inputs found for: {args.input_path}")
+            return 1
+        journal = None if args.no_journal else BatchJournal(args.out_dir / JOURNAL_FILENAME, args.max_attempts)
+        store = ResultStore(args.store) if args.store is not None else None
+        try:
+            summary = run_batch(
+                inputs,
+                extractor,
+                out_dir=args.out_dir,
+                concurrency=args.concurrency,
+                truth_dir=args.truth_dir,
+                journal=journal,
+                store=store,
+            )
+        finally:
+            if journal is not None:
+                journal.close()
+            if store is not None:
+                store.close()
+        return 0 if summary["failed"] == 0 else 2
+
     truth_path: Path | None = args.truth_path
     if truth_path is not None and not truth_path.exists():
         raise FileNotFoundError(f"Truth file not found: {truth_path}")
 
     file_path = Path(args.input_path)
     out_path = Path(args.out)
-    
-
 
     if not file_path.exists():
         print(f"ERROR: file not found: {file_path}")
         return 1
-    run_id = new_run_id()
-    run_ts = utc_now_iso()
-    input_filename = file_path.name
-    text = read_input(file_path)
-    clipped = text[:MAX_CHARS] if len(text) > MAX_CHARS else text
-    total_chars = len(text)
-    sent_chars = len(clipped)
-    was_truncated = total_chars > MAX_CHARS
-    print(f"[SDS STATS] total_chars={total_chars:,} sent_chars={sent_chars:,} truncated={was_truncated}", file=sys.stderr)
 
+    result = extractor.extract(file_path, truth_path, out_path=out_path)
 
-    client = OpenAI()
+    parsed = result["parsed"]
+    if parsed is None:
+        print(f"ERROR: {result['error']}", file=sys.stderr)
+        print(result["raw"])
+        return 0
 
-    resp = client.responses.create(
-        model="gpt-4o-mini",
-        input=[
-            {"role": "system", "content": SYSTEM},
-            {"role": "user", "content": user_prompt(clipped)},
-        ],
-    )
-
-    out = resp.output_text or ""
-    parsed = None
-    try:
-        parsed = json.loads(out)
-        warnings = apply_format_guardrails(parsed, normalize=True)
-        
-        # Ensure meta exists
-        parsed.setdefault("meta", {})
-
-        # 1. ALWAYS populate standard metadata
-        parsed["meta"]["run_id"] = run_id
-        parsed["meta"]["run_timestamp_utc"] = run_ts
-        parsed["meta"]["input_filename"] = input_filename
-        parsed["meta"]["model"] = MODEL_NAME
-        parsed["meta"]["request_version"] = REQUEST_VERSION
-        parsed["meta"]["max_chars"] = MAX_CHARS
-        parsed["meta"]["input_char_count"] = total_chars
-        parsed["meta"]["chars_sent_to_model"] = sent_chars
-        parsed["meta"]["input_truncated"] = was_truncated
-        parsed["meta"].setdefault("validation_warnings", [])
-        parsed["meta"]["validation_warnings"].extend(warnings)
-
-        # 2. ONLY populate eval results if a truth file was provided
-        if truth_path:
-            truth = json.loads(truth_path.read_text(encoding="utf-8"))
-            eval_result = evaluate(parsed, truth)
+    print(json.dumps(parsed, indent=2, ensure_ascii=False))
+    if args.store is not None:
+        from store import ResultStore
 
-            print(
-                f"\n[EVAL] accuracy={eval_result['accuracy']}% "
-                f"correct={eval_result['correct']}/{eval_result['fields_compared']} "
-                f"missing={len(eval_result['missing'])} "
-                f"hallucinated={len(eval_result['hallucinated'])}",
-                file=sys.stderr
-            )
-            parsed["meta"]["eval"] = eval_result
-
-        # 3. Print and save
-        pretty = json.dumps(parsed, indent=2, ensure_ascii=False)
-        print(pretty)
-        out_path.write_text(pretty, encoding="utf-8")
-    except Exception:
-        print(out)
+        with ResultStore(args.store) as store:
+            store.add(parsed, str(file_path))
 
     return 0
 
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Histogram buckets (seconds) for the Prometheus export: pdf pages to slow LLM calls.
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class StageTimer:
+    """Wall-clock timings of named pipeline stages, in milliseconds."""
+
+    def __init__(self) -> None:
+        self.timings_ms: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - t0) * 1000.0
+            self.timings_ms[name] = round(self.timings_ms.get(name, 0.0) + elapsed, 3)
+
+    def record(self, name: str, ms: float) -> None:
+        """Store a duration measured elsewhere as `name` (a milestone, not a stage)."""
+        self.timings_ms[name] = round(ms, 3)
+
+    def as_dict(self) -> Dict[str, float]:
+        """{"<stage>_ms": ms, ..., "total_ms": ms since the timer was created}."""
+        d = {f"{name}_ms": ms for name, ms in self.timings_ms.items()}
+        d["total_ms"] = round((time.perf_counter() - self._t0) * 1000.0, 3)
+        return d
+
+
+class MetricsSink:
+    """
+    Machine-readable per-document metrics for aggregating batch runs.
+
+    - `*.prom` path: Prometheus text file (node_exporter textfile collector
+      style) with per-stage latency histograms and token/document counters,
+      rewritten atomically after every document.
+    - any other path: JSON lines, one record per document, appended.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.prometheus = self.path.suffix == ".prom"
+        self._lock = threading.Lock()
+        self._hist: Dict[str, List[int]] = {}
+        self._hist_sum: Dict[str, float] = {}
+        self._hist_count: Dict[str, int] = {}
+        self._tokens: Dict[str, int] = {"input": 0, "output": 0, "cached": 0}
+        self._documents: Dict[str, int] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def record(self, record: Dict[str, Any]) -> None:
+        """
+        record: {"input", "status", "timings_ms": {"<stage>_ms": ms}, "usage": {...}, ...}
+        """
+        with self._lock:
+            if self.prometheus:
+                self._observe(record)
+                self._write_prometheus()
+            else:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _observe(self, record: Dict[str, Any]) -> None:
+        for key, ms in (record.get("timings_ms") or {}).items():
+            stage = key[:-3] if key.endswith("_ms") else key
+            secs = ms / 1000.0
+            counts = self._hist.setdefault(stage, [0] * len(LATENCY_BUCKETS_S))
+            for i, le in enumerate(LATENCY_BUCKETS_S):
+                if secs <= le:
+                    counts[i] += 1
+            self._hist_sum[stage] = self._hist_sum.get(stage, 0.0) + secs
+            self._hist_count[stage] = self._hist_count.get(stage, 0) + 1
+        usage = record.get("usage") or {}
+        for kind in self._tokens:
+            self._tokens[kind] += int(usage.get(f"{kind}_tokens", 0) or 0)
+        status = record.get("status", "unknown")
+        self._documents[status] = self._documents.get(status, 0) + 1
+
+    def _write_prometheus(self) -> None:
+        lines = [
+            "# HELP sds_stage_duration_seconds Wall-clock time per pipeline stage.",
+            "# TYPE sds_stage_duration_seconds histogram",
+        ]
+        for stage in sorted(self._hist):
+            for le, n in zip(LATENCY_BUCKETS_S, self._hist[stage]):
+                lines.append(f'sds_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {n}')
+            lines.append(f'sds_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {self._hist_count[stage]}')
+            lines.append(f'sds_stage_duration_seconds_sum{{stage="{stage}"}} {self._hist_sum[stage]:.6f}')
+            lines.append(f'sds_stage_duration_seconds_count{{stage="{stage}"}} {self._hist_count[stage]}')
+        lines += [
+            "# HELP sds_llm_tokens_total Model tokens used, by kind.",
+            "# TYPE sds_llm_tokens_total counter",
+        ]
+        lines += [f'sds_llm_tokens_total{{kind="{k}"}} {v}' for k, v in sorted(self._tokens.items())]
+        lines += [
+            "# HELP sds_documents_total Documents processed, by status.",
+            "# TYPE sds_documents_total counter",
+        ]
+        lines += [f'sds_documents_total{{status="{k}"}} {v}' for k, v in sorted(self._documents.items())]
+
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def metrics_record(result: Dict[str, Any], input_name: Optional[str] = None) -> Dict[str, Any]:
+    """Flatten an extraction result (see main.extract_document) into one metrics record."""
+    parsed = result.get("parsed")
+    meta = parsed.get("meta", {}) if isinstance(parsed, dict) else {}
+    return {
+        "ts": round(time.time(), 3),
+        "input": input_name if input_name is not None else meta.get("input_filename"),
+        "run_id": meta.get("run_id"),
+        "status": "ok" if parsed is not None else "invalid_json",
+        "mode": meta.get("extraction_mode"),
+        "cache_hit": (meta.get("cache") or {}).get("hit"),
+        "timings_ms": result.get("timings_ms", {}),
+        "usage": result.get("usage", {}),
+    }
@@ -0,0 +1,245 @@
+"""
+Near-duplicate detection of SDS texts with MinHash + LSH, and reuse of the
+extraction of a near-duplicate.
+
+The same formulation is often re-issued under another product name or
+distributor logo, or just re-typeset: the file hash differs, so the
+extraction cache misses, but almost all of the text is the same.
+
+    index = NearDuplicateIndex(Path(".sds_cache/neardup.sqlite"))
+    sig = signature(text)
+    match = index.query(sig)            # best match >= threshold, or None
+    index.add(source, sha256, sig, section_hashes(text, MAX_CHARS), parsed)
+
+Texts are reduced to word 5-gram shingles and a 128-value MinHash signature;
+the fraction of equal values estimates the Jaccard similarity of the shingle
+sets. Signatures are split into 16 bands of 8 rows whose hashes are indexed in
+SQLite, so a lookup only compares signatures that share at least one band
+(candidates with similarity ~0.7 and above) instead of scanning every document.
+Per document the index holds 512 bytes of signature, 16 band rows and the
+compressed schema groups of its extraction.
+
+Reuse works per schema group: groups whose source sections (fanout.GROUP_SECTIONS)
+are unchanged are copied from the match, the others are re-extracted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from fanout import text_for_groups
+from prompts import SCHEMA_GROUPS
+
+try:  # vectorized signatures; the pure-Python path gives identical values
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+NEAR_DUP_FILENAME = "neardup.sqlite"
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Candidates (most shared bands first) whose signatures are compared per lookup.
+MAX_CANDIDATES = 64
+
+_MERSENNE = (1 << 61) - 1
+_MASK32 = 0xFFFFFFFF
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_perm_rng = random.Random(0x5D5)
+_PERM_A = [_perm_rng.randrange(1, 1 << 32) for _ in range(NUM_PERM)]
+_PERM_B = [_perm_rng.randrange(0, 1 << 32) for _ in range(NUM_PERM)]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    sections TEXT NOT NULL,
+    result BLOB,
+    created_utc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, document_id)
+) WITHOUT ROWID;
+"""
+
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> List[int]:
+    """32-bit hashes of the distinct word k-grams of `text` (lowercased, punctuation ignored)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        words = words + [""] * (k - len(words))
+    return list({zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)})
+
+
+def signature(text: str) -> array:
+    """MinHash signature (NUM_PERM unsigned 32-bit values) of the text's shingles."""
+    hashes = shingles(text)
+    if np is not None:
+        x = np.asarray(hashes, dtype=np.uint64)[None, :]
+        a = np.asarray(_PERM_A, dtype=np.uint64)[:, None]
+        b = np.asarray(_PERM_B, dtype=np.uint64)[:, None]
+        values = (((a * x) % _MERSENNE + b) % _MERSENNE) & _MASK32
+        return array("I", values.min(axis=1).astype(np.uint32).tobytes())
+    return array("I", [
+        min((((a * h) % _MERSENNE + b) % _MERSENNE) & _MASK32 for h in hashes)
+        for a, b in zip(_PERM_A, _PERM_B)
+    ])
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def band_buckets(sig: array) -> List[int]:
+    """One signed 64-bit hash per band of the signature."""
+    raw = sig.tobytes()
+    step = ROWS * sig.itemsize
+    return [
+        int.from_bytes(hashlib.blake2b(raw[i * step:(i + 1) * step], digest_size=8).digest(), "big", signed=True)
+        for i in range(BANDS)
+    ]
+
+
+def section_hashes(text: str, max_chars: int) -> Dict[str, str]:
+    """Hash of the (whitespace- and case-normalized) source text of every schema group."""
+    return {
+        g: hashlib.sha256(" ".join(text_for_groups(text, [g], max_chars).lower().split()).encode("utf-8")).hexdigest()
+        for g in SCHEMA_GROUPS
+    }
+
+
+def _utc_now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+class NearDuplicateIndex:
+    """
+    SQLite-backed MinHash LSH index of extracted documents (WAL mode; safe to
+    share between the threads of a batch).
+    """
+
+    def __init__(self, path: Path, threshold: float = DEFAULT_THRESHOLD):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def query(self, sig: array, exclude_sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Most similar indexed document with estimated similarity >= threshold:
+        {"id", "source", "sha256", "similarity", "sections", "result", "candidates"},
+        or None. Documents with the hash `exclude_sha256` (the input itself) are skipped.
+        """
+        shared: Dict[int, int] = {}
+        with self._lock:
+            for band, bucket in enumerate(band_buckets(sig)):
+                for (doc_id,) in self._conn.execute(
+                    "SELECT document_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+                ):
+                    shared[doc_id] = shared.get(doc_id, 0) + 1
+            if not shared:
+                return None
+            ids = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES]
+            docs = self._conn.execute(
+                f"SELECT id, source, sha256, signature FROM documents WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        best = None
+        for doc_id, source, sha, blob in docs:
+            if sha == exclude_sha256:
+                continue
+            score = similarity(sig, array("I", blob))
+            if score >= self.threshold and (best is None or score > best["similarity"]):
+                best = {"id": doc_id, "source": source, "sha256": sha, "similarity": round(score, 4)}
+        if best is None:
+            return None
+        with self._lock:
+            sections, result = self._conn.execute(
+                "SELECT sections, result FROM documents WHERE id = ?", (best["id"],)
+            ).fetchone()
+        best["sections"] = json.loads(sections)
+        best["result"] = json.loads(zlib.decompress(result)) if result is not None else None
+        best["candidates"] = len(docs)
+        return best
+
+    def add(
+        self,
+        source: str,
+        sha256: str,
+        sig: array,
+        sections: Dict[str, str],
+        parsed: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Index a document; `parsed` (its extraction) is kept without meta for reuse."""
+        self.add_many([(source, sha256, sig, sections, parsed)])
+
+    def add_many(self, items: Iterable[tuple]) -> int:
+        """`add` many (source, sha256, signature, sections, parsed) tuples in one transaction."""
+        n = 0
+        now = _utc_now_iso()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for source, sha256, sig, sections, parsed in items:
+                result = None
+                if parsed is not None:
+                    groups = {g: parsed[g] for g in SCHEMA_GROUPS if isinstance(parsed.get(g), dict)}
+                    result = zlib.compress(json.dumps(groups, ensure_ascii=False).encode("utf-8"))
+                cur = self._conn.execute(
+                    "INSERT INTO documents (source, sha256, signature, sections, result, created_utc) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, sha256, sig.tobytes(), json.dumps(sections), result, now),
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO bands VALUES (?, ?, ?)",
+                    [(band, bucket, cur.lastrowid) for band, bucket in enumerate(band_buckets(sig))],
+                )
+                n += 1
+            self._conn.execute("COMMIT")
+        return n
+
+    def contains(self, sha256: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone() is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "NearDuplicateIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def reusable_groups(match: Dict[str, Any], sections: Dict[str, str]) -> List[str]:
+    """Schema groups of the match whose source text is unchanged and whose result is stored."""
+    prior = match.get("result") or {}
+    return [g for g in SCHEMA_GROUPS if g in prior and match["sections"].get(g) == sections.get(g)]
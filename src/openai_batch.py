@@ -0,0 +1,316 @@
+"""
+Offline extraction through the OpenAI Batch API (half price, no rate-limit
+pressure, results within the 24h completion window).
+
+One /v1/responses request per unique input (custom_id = SHA-256 of the file),
+built from the same SYSTEM/user_prompt messages as the synchronous path. The
+results file is ingested through main.finalize_output, so outputs carry the
+same guardrail warnings, evidence verification and meta as a normal run.
+
+State (batch id, document mapping, input hashes and options) is kept in
+<out_dir>/openai_batch_state.json; re-running the same command resumes polling
+instead of resubmitting. A state file written for other inputs or options is
+not resumed.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from batch import output_paths
+from cache import sha256_bytes
+from evidence import EvidenceIndex
+from main import (
+    MODEL_NAME,
+    REQUEST_VERSION,
+    Extractor,
+    build_messages,
+    extraction_cache_key,
+    finalize_output,
+    new_run_id,
+    prepare_text,
+    read_document,
+    utc_now_iso,
+)
+from preextract import pre_extract
+from repair import needs_repair
+
+STATE_FILENAME = "openai_batch_state.json"
+REQUESTS_FILENAME = "openai_batch_requests.jsonl"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+DEFAULT_POLL_INTERVAL = 30.0
+
+
+def build_requests(inputs: List[Path], extractor: Extractor, out_dir: Path) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Read every input and build its Batch API request line. Files with identical
+    bytes share one request. Returns (request_lines, documents) where documents
+    maps custom_id -> {"inputs": [{"path", "output"}], "stats": {...}}.
+    """
+    lines: List[Dict[str, Any]] = []
+    documents: Dict[str, Any] = {}
+    for path, out_path in zip(inputs, output_paths(inputs, out_dir)):
+        file_sha256 = sha256_bytes(path.read_bytes())
+        target = {"path": str(path), "output": str(out_path)}
+        if file_sha256 in documents:
+            documents[file_sha256]["inputs"].append(target)
+            continue
+
+        text, read_stats = read_document(
+            path,
+            compact=extractor.compact,
+            file_sha256=file_sha256,
+            page_cache=extractor.page_cache,
+            early_stop=extractor.early_stop,
+        )
+        pre = pre_extract(text, extractor.pre_extract) if extractor.pre_extract != "off" else None
+        stats = prepare_text(text, segment=extractor.segment)
+        if pre is not None:
+            stats["pre_extract"] = pre
+        if "compaction" in read_stats:
+            stats["compaction"] = read_stats["compaction"]
+        lines.append({
+            "custom_id": file_sha256,
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": {"model": MODEL_NAME, "input": build_messages(stats["text"], pre)},
+        })
+        documents[file_sha256] = {
+            "inputs": [target],
+            "stats": {k: v for k, v in stats.items() if k != "text"},
+        }
+    return lines, documents
+
+
+def input_fingerprint(inputs: List[Path], extractor: Extractor) -> Dict[str, Any]:
+    """Input file hashes and the options that shape the requests, stored with the batch state."""
+    return {
+        "inputs": {str(p): sha256_bytes(p.read_bytes()) for p in inputs},
+        "options": {
+            "model": MODEL_NAME,
+            "request_version": REQUEST_VERSION,
+            "early_stop": extractor.early_stop,
+            "segment": extractor.segment,
+            "pre_extract": extractor.pre_extract,
+            "compact": extractor.compact,
+        },
+    }
+
+
+def _evidence_index(custom_id: str, doc: Dict[str, Any], extractor: Extractor) -> Optional[EvidenceIndex]:
+    """
+    Index of the document text, read again as build_requests read it (the page
+    cache makes this cheap). None when the file is gone or has changed.
+    """
+    path = Path(doc["inputs"][0]["path"])
+    try:
+        if sha256_bytes(path.read_bytes()) != custom_id:
+            return None
+        text, read_stats = read_document(
+            path,
+            compact=extractor.compact,
+            file_sha256=custom_id,
+            page_cache=extractor.page_cache,
+            early_stop=extractor.early_stop,
+        )
+    except OSError:
+        return None
+    return EvidenceIndex(text, read_stats.get("page_starts"))
+
+
+def submit(client: OpenAI, requests_path: Path) -> Tuple[str, str]:
+    """Upload the JSONL request file and create the batch; returns (input_file_id, batch_id)."""
+    with requests_path.open("rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+    return uploaded.id, batch.id
+
+
+def wait_for_batch(client: OpenAI, batch_id: str, poll_interval: float = DEFAULT_POLL_INTERVAL) -> Any:
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        print(
+            f"[OPENAI BATCH] {batch_id} status={batch.status}"
+            + (f" completed={counts.completed}/{counts.total} failed={counts.failed}" if counts else ""),
+            file=sys.stderr,
+        )
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def response_body_text(body: Dict[str, Any]) -> str:
+    """Concatenate output_text parts of a Responses API JSON body (what resp.output_text does)."""
+    parts = []
+    for item in body.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                parts.append(content.get("text") or "")
+    return "".join(parts)
+
+
+def _file_lines(client: OpenAI, file_id: Optional[str]) -> List[Dict[str, Any]]:
+    if not file_id:
+        return []
+    text = client.files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def ingest(client: OpenAI, batch: Any, state: Dict[str, Any], extractor: Extractor) -> List[Dict[str, Any]]:
+    """Turn batch result lines into per-input outputs; returns one record per input."""
+    documents = state["documents"]
+    records: List[Dict[str, Any]] = []
+    seen = set()
+
+    for line in _file_lines(client, batch.output_file_id) + _file_lines(client, batch.error_file_id):
+        custom_id = line.get("custom_id")
+        doc = documents.get(custom_id)
+        if doc is None or custom_id in seen:
+            continue
+        seen.add(custom_id)
+
+        response = line.get("response") or {}
+        error = line.get("error")
+        if error or response.get("status_code") != 200:
+            for target in doc["inputs"]:
+                records.append({
+                    "input": target["path"],
+                    "status": "failed",
+                    "error": json.dumps(error or response.get("body"), ensure_ascii=False),
+                })
+            continue
+
+        out = response_body_text(response.get("body") or {})
+        evidence_index = _evidence_index(custom_id, doc, extractor)
+        evidence = None
+        for target in doc["inputs"]:
+            record: Dict[str, Any] = {"input": target["path"]}
+            out_path = Path(target["output"])
+            try:
+                parsed = finalize_output(
+                    out,
+                    run_id=new_run_id(),
+                    run_ts=utc_now_iso(),
+                    input_filename=Path(target["path"]).name,
+                    stats=doc["stats"],
+                    extra_meta={"openai_batch": {"batch_id": batch.id, "custom_id": custom_id}},
+                    evidence_index=evidence_index,
+                )
+                out_path.write_text(json.dumps(parsed, indent=2, ensure_ascii=False), encoding="utf-8")
+                record.update(status="ok", output=str(out_path))
+                evidence = parsed["meta"].get("evidence")
+            except Exception as e:
+                raw_path = out_path.with_suffix(".raw.txt")
+                raw_path.write_text(out, encoding="utf-8")
+                record.update(status="invalid_json", output=str(raw_path), error=f"{type(e).__name__}: {e}")
+            records.append(record)
+
+        # Same rule as the synchronous path: only complete answers that finalize are
+        # cached, with their evidence verification so later cache hits reuse it.
+        if extractor.cache is not None and evidence is not None and not needs_repair(out):
+            extractor.cache.put(
+                extraction_cache_key(
+                    custom_id, extractor.early_stop, extractor.segment, pre_extract=extractor.pre_extract,
+                    compact=extractor.compact,
+                ),
+                {
+                    "created_utc": utc_now_iso(),
+                    "input_filename": Path(doc["inputs"][0]["path"]).name,
+                    "stats": dict(doc["stats"], evidence=evidence),
+                    "output_text": out,
+                },
+            )
+
+    for custom_id, doc in documents.items():
+        if custom_id not in seen:
+            for target in doc["inputs"]:
+                records.append({"input": target["path"], "status": "failed", "error": "no result line in batch output"})
+    return records
+
+
+def run_openai_batch(
+    inputs: List[Path],
+    extractor: Extractor,
+    out_dir: Path,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> Dict[str, Any]:
+    """Build + submit (or resume) a batch, wait for it, ingest results, write a summary."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state_path = out_dir / STATE_FILENAME
+    client = extractor.client
+
+    fingerprint = input_fingerprint(inputs, extractor)
+    state: Optional[Dict[str, Any]] = None
+    if state_path.exists():
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+        if state.get("ingested"):
+            state = None
+        elif state.get("fingerprint") != fingerprint:
+            raise RuntimeError(
+                f"{state_path} belongs to batch {state.get('batch_id')} submitted for other inputs or options; "
+                "re-run with the same inputs and options, or use another --out-dir"
+            )
+        else:
+            print(f"[OPENAI BATCH] resuming {state['batch_id']} from {state_path}", file=sys.stderr)
+
+    if state is None:
+        lines, documents = build_requests(inputs, extractor, out_dir)
+        requests_path = out_dir / REQUESTS_FILENAME
+        requests_path.write_text(
+            "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines), encoding="utf-8"
+        )
+        input_file_id, batch_id = submit(client, requests_path)
+        state = {
+            "batch_id": batch_id,
+            "input_file_id": input_file_id,
+            "requests_path": str(requests_path),
+            "submitted_utc": utc_now_iso(),
+            "model": MODEL_NAME,
+            "fingerprint": fingerprint,
+            "documents": documents,
+            "ingested": False,
+        }
+        state_path.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[OPENAI BATCH] submitted {batch_id} with {len(lines)} request(s)", file=sys.stderr)
+
+    batch = wait_for_batch(client, state["batch_id"], poll_interval)
+    records = ingest(client, batch, state, extractor)
+
+    state["ingested"] = True
+    state["batch_status"] = batch.status
+    state_path.write_text(json.dumps(state, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    summary = {
+        "batch_id": state["batch_id"],
+        "batch_status": batch.status,
+        "submitted_utc": state["submitted_utc"],
+        "ingested_utc": utc_now_iso(),
+        "documents": len(records),
+        "requests": len(state["documents"]),
+        "ok": sum(1 for r in records if r["status"] == "ok"),
+        "invalid_json": sum(1 for r in records if r["status"] == "invalid_json"),
+        "failed": sum(1 for r in records if r["status"] == "failed"),
+        "documents_detail": sorted(records, key=lambda r: r["input"]),
+    }
+    (out_dir / "openai_batch_summary.json").write_text(
+        json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+    print(
+        f"[OPENAI BATCH SUMMARY] docs={summary['documents']} ok={summary['ok']} "
+        f"failed={summary['failed']} invalid_json={summary['invalid_json']}",
+        file=sys.stderr,
+    )
+    return summary
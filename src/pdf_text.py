@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pypdf
+from pypdf import PdfReader
+
+from cache import sha256_bytes
+from sections import SCHEMA_SECTIONS, section_numbers_in
+
+# Documents with at least this many pages to extract are fanned out over processes.
+PARALLEL_MIN_PAGES = 16
+PAGES_PER_TASK = 4
+# A page with this many section headings is a table of contents, not content.
+TOC_MIN_HEADINGS = 8
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_PAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """One shared process pool, created on first use and reused across documents."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def _extract_pages(path: str, indices: List[int]) -> List[Tuple[int, str, float]]:
+    """Worker: extract the given page indices; returns (index, text, seconds) per page."""
+    reader = PdfReader(path)
+    out = []
+    for i in indices:
+        t0 = time.perf_counter()
+        text = reader.pages[i].extract_text() or ""
+        out.append((i, text, time.perf_counter() - t0))
+    return out
+
+
+class PageTextCache:
+    """
+    Per-(file hash, page index) text store: one JSON file per PDF under
+    `root/<sha256>.pypdf-<version>.json` holding {"page_count": n, "pages": {"<idx>": text}}.
+    The pypdf version is part of the name since extraction output changes between releases.
+    Loads refresh the file mtime; once the store exceeds `max_bytes`, the
+    least recently used files are dropped (its own budget, separate from the
+    extraction cache sharing the cache directory).
+    """
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_PAGE_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # lazily computed total bytes on disk
+
+    def _path(self, file_sha256: str) -> Path:
+        return self.root / f"{file_sha256}.pypdf-{pypdf.__version__}.json"
+
+    def load(self, file_sha256: str) -> Tuple[Optional[int], Dict[int, str]]:
+        path = self._path(file_sha256)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # LRU: a hit counts as a use
+        except (OSError, ValueError):
+            return None, {}
+        return data.get("page_count"), {int(k): v for k, v in data.get("pages", {}).items()}
+
+    def store(self, file_sha256: str, page_count: int, pages: Dict[int, str]) -> None:
+        path = self._path(file_sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"page_count": page_count, "pages": {str(k): v for k, v in sorted(pages.items())}}
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        old_size = path.stat().st_size if path.exists() else 0
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(st.st_size for _, st in self._entries())
+            else:
+                self._size += len(data) - old_size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        for p in self.root.glob("*.json"):
+            try:
+                yield p, p.stat()
+            except OSError:
+                continue
+
+    def evict(self) -> int:
+        """Drop least recently used files until the store fits in max_bytes; returns files removed."""
+        live = sorted((st.st_mtime, st.st_size, p) for p, st in self._entries())
+        total = sum(size for _, size, _ in live)
+        removed = 0
+        for _, size, p in live:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+        return removed
+
+
+class _EarlyStop:
+    """
+    Tracks section headings page by page; done once every schema section has
+    closed. Table-of-contents pages (TOC_MIN_HEADINGS or more headings) are
+    ignored, so a contents list does not end reading after page 1.
+    """
+
+    def __init__(self) -> None:
+        self.seen: set = set()
+
+    def feed(self, text: str) -> bool:
+        numbers = section_numbers_in(text)
+        if len(numbers) >= TOC_MIN_HEADINGS:
+            return False
+        self.seen.update(numbers)
+        if not SCHEMA_SECTIONS <= self.seen:
+            return False
+        # Section 14 is complete once any later heading shows up.
+        return any(n > max(SCHEMA_SECTIONS) for n in self.seen)
+
+
+def read_pdf_pages(
+    file_path: Path,
+    *,
+    file_sha256: Optional[str] = None,
+    page_cache: Optional[PageTextCache] = None,
+    early_stop: bool = False,
+    workers: int = DEFAULT_WORKERS,
+    parallel_min_pages: int = PARALLEL_MIN_PAGES,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Extract page texts from a PDF.
+
+    - Pages already in `page_cache` are not re-extracted (pypdf is skipped
+      entirely when every needed page is cached).
+    - Documents with many uncached pages are extracted in chunks on a shared
+      process pool; results are consumed in page order.
+    - With `early_stop`, reading stops after the page where the heading
+      following Section 14 appears, once Sections 1-3 and 9 have been seen too.
+
+    Returns (page_texts, stats).
+    """
+    t_start = time.perf_counter()
+    if page_cache is not None and file_sha256 is None:
+        file_sha256 = sha256_bytes(file_path.read_bytes())
+
+    page_count, cached = page_cache.load(file_sha256) if page_cache is not None else (None, {})
+    reader: Optional[PdfReader] = None
+    if page_count is None:
+        reader = PdfReader(str(file_path))
+        page_count = len(reader.pages)
+
+    texts: Dict[int, str] = {}
+    fresh: Dict[int, str] = {}  # pages extracted by pypdf in this call
+    page_s: Dict[int, float] = {}
+    stopper = _EarlyStop() if early_stop else None
+    stopped = False
+    missing = [i for i in range(page_count) if i not in cached]
+    parallel = len(missing) >= parallel_min_pages and workers > 1
+
+    def accept(i: int, text: str) -> bool:
+        texts[i] = text
+        return stopper is not None and stopper.feed(text)
+
+    if parallel:
+        chunks = [missing[k:k + PAGES_PER_TASK] for k in range(0, len(missing), PAGES_PER_TASK)]
+        pool = _get_pool(workers)
+        futures = [pool.submit(_extract_pages, str(file_path), c) for c in chunks]
+        chunk_of = {i: n for n, c in enumerate(chunks) for i in c}
+        # Walk pages in order so early stop trims exactly as the serial path would;
+        # chunks still queued when it fires are cancelled.
+        for i in range(page_count):
+            if i not in cached and i not in fresh:
+                for j, text, secs in futures[chunk_of[i]].result():
+                    fresh[j] = text
+                    page_s[j] = secs
+            if accept(i, cached[i] if i in cached else fresh[i]):
+                stopped = i < page_count - 1
+                break
+        for f in futures:
+            f.cancel()
+    else:
+        for i in range(page_count):
+            if i in cached:
+                text = cached[i]
+            else:
+                if reader is None:
+                    reader = PdfReader(str(file_path))
+                t0 = time.perf_counter()
+                text = reader.pages[i].extract_text() or ""
+                page_s[i] = time.perf_counter() - t0
+                fresh[i] = text
+            if accept(i, text):
+                stopped = i < page_count - 1
+                break
+
+    if page_cache is not None and fresh:
+        page_cache.store(file_sha256, page_count, {**cached, **fresh})
+
+    timings_ms = [s * 1000.0 for s in page_s.values()]
+    stats = {
+        "pages_total": page_count,
+        "pages_read": len(texts),
+        "pages_cached": sum(1 for i in texts if i in cached),
+        "pages_extracted": len(page_s),
+        "parallel": parallel,
+        "early_stopped": stopped,
+        "page_ms_avg": round(sum(timings_ms) / len(timings_ms), 2) if timings_ms else 0.0,
+        "page_ms_max": round(max(timings_ms), 2) if timings_ms else 0.0,
+        "read_ms": round((time.perf_counter() - t_start) * 1000.0, 2),
+    }
+    return [texts[i] for i in sorted(texts)], stats
@@ -0,0 +1,277 @@
+"""
+Deterministic pre-extraction of the highly regular SDS fields.
+
+One regex pass over the document text collects candidates (with character
+offsets) for CAS numbers, UN numbers, transport hazard class, packing group,
+GHS signal word, H-/P-statement codes and labelled dates. Scalar fields with
+exactly one candidate in the section they belong to are "resolved": the
+pipeline can then drop them from the prompt schema and fill them locally
+(mode "skip"), or just list every candidate as a hint (mode "hints").
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from format_guardrails import DASHES, normalize_cas, validate_cas_value
+from sections import find_headings
+
+PRE_EXTRACT_MODES = ("off", "hints", "skip")
+
+_DASH = "[-" + "".join(DASHES) + "]"
+_MONTHS = (
+    "january|february|march|april|may|june|july|august|september|october|november|december"
+    "|jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec"
+)
+_DATE = (
+    rf"\d{{1,2}}[./-]\d{{1,2}}[./-]\d{{4}}"
+    rf"|\d{{4}}-\d{{2}}-\d{{2}}"
+    rf"|\d{{1,2}}[ \t]+(?:{_MONTHS})\.?,?[ \t]+\d{{4}}"
+    rf"|(?:{_MONTHS})\.?[ \t]+\d{{1,2}},?[ \t]+\d{{4}}"
+)
+
+# One alternation, scanned once; the named group that matched tells the kind.
+SCAN_RE = re.compile(
+    "|".join([
+        # Loose CAS shape; checked with the guardrail validator + check digit afterwards.
+        rf"(?P<cas>\b\d{{2,7}}[ \t]*{_DASH}[ \t]*\d{{2}}[ \t]*{_DASH}[ \t]*\d\b)",
+        r"(?P<un>\bUN(?:[ \t]*(?i:number|no\.?))?[ \t:#-]*(?P<un_digits>\d{4})\b)",
+        r"(?P<hclass>(?i:\b(?:transport[ \t]+)?hazard[ \t]+class(?:\(es\))?|\bclass)[ \t]*[:.]?[ \t]*"
+        r"(?P<hclass_value>[1-9](?:\.[1-6])?)(?![\d.]))",
+        r"(?P<pg>(?i:\bpacking[ \t]+group(?:[ \t]*\(PG\))?|\bPG)[ \t]*[:.]?[ \t]*(?P<pg_value>III|II|I)\b)",
+        r"(?P<signal>(?i:\bsignal[ \t]+word)[ \t]*[:.]?[ \t]*(?P<signal_value>(?i:danger|warning))\b)",
+        r"(?P<h_code>\b(?:EUH|H)\d{3}[A-Za-z]{0,2}(?:[ \t]*\+[ \t]*H\d{3}[A-Za-z]{0,2})*\b)",
+        r"(?P<p_code>\bP\d{3}(?:[ \t]*\+[ \t]*P\d{3})*\b)",
+        r"(?P<date>(?P<date_label>(?i:revision[ \t]+date|date[ \t]+of[ \t]+revision|revised[ \t]+on|reviewed[ \t]+on"
+        r"|revision|issue[ \t]+date|date[ \t]+of[ \t]+issue|print(?:ing)?[ \t]+date|supersedes(?:[ \t]+date)?))"
+        rf"[ \t]*[:#]?[ \t]*(?P<date_value>(?i:{_DATE})))",
+    ])
+)
+
+# SDS sections (0 = header before Section 1) each kind of match is accepted from.
+# Only these sections are scanned, which keeps the pass well under 1 ms per page.
+SCAN_SECTIONS = {
+    "cas": {3},
+    "un": {14},
+    "hclass": {14},
+    "pg": {14},
+    "signal": {2},
+    "h_code": {2, 3},
+    "p_code": {2},
+    "date": {0, 1, 16},
+}
+
+# Scalar schema fields resolved locally -> candidate kind in scan() output.
+RESOLVABLE_FIELDS = {
+    "transport.un_number": "un_number",
+    "transport.hazard_class": "hazard_class",
+    "transport.packing_group": "packing_group",
+    "hazards.ghs_signal_word": "signal_word",
+    "document.revision_date": "revision_date",
+}
+
+_REVISION_LABEL_RE = re.compile(r"revis|review", re.I)
+_DATE_FORMATS = ("%d %B %Y", "%d %b %Y", "%B %d %Y", "%b %d %Y", "%Y-%m-%d")
+
+
+def cas_check_digit_ok(cas: str) -> bool:
+    """CAS registry check digit: weighted sum of the other digits, mod 10."""
+    digits = cas.replace("-", "")
+    body, check = digits[:-1], int(digits[-1])
+    return sum(int(d) * w for w, d in enumerate(reversed(body), start=1)) % 10 == check
+
+
+def normalize_date(value: str) -> Optional[str]:
+    """
+    MM-DD-YYYY for unambiguous dates (month names, ISO, or a day > 12);
+    None when day and month order cannot be told apart.
+    """
+    s = re.sub(r"[ \t]+", " ", value.replace(",", "").replace(".", " ").strip())
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s.replace("Sept ", "Sep "), fmt).strftime("%m-%d-%Y")
+        except ValueError:
+            continue
+    m = re.fullmatch(r"(\d{1,2})[ /-](\d{1,2})[ /-](\d{4})", s)
+    if not m:
+        return None
+    a, b, year = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    if a > 12 >= b:
+        a, b = b, a
+    elif not (b > 12 >= a):
+        return None
+    try:
+        return datetime(year, a, b).strftime("%m-%d-%Y")
+    except ValueError:
+        return None
+
+
+def _line_at(text: str, start: int, end: int) -> str:
+    """The (stripped, <=200 char) line around a match, used as evidence."""
+    line_start = text.rfind("\n", 0, start) + 1
+    line_end = text.find("\n", end)
+    return text[line_start:line_end if line_end != -1 else len(text)].strip()[:200]
+
+
+def _scan_spans(text: str) -> List[Tuple[int, int, Optional[int]]]:
+    """
+    (start, end, section) ranges worth scanning; adjacent ranges are merged.
+    A text without recognisable headings is scanned whole with section None.
+    """
+    headings = find_headings(text)
+    if not headings:
+        return [(0, len(text), None)]
+    wanted = set().union(*SCAN_SECTIONS.values())
+    bounds = [(0, 0)] + [(h[1], h[0]) for h in headings] + [(len(text), -1)]
+    spans: List[Tuple[int, int, Optional[int]]] = []
+    for (start, num), (end, _) in zip(bounds, bounds[1:]):
+        if num not in wanted or end <= start:
+            continue
+        if spans and spans[-1][1] == start and spans[-1][2] == num:
+            spans[-1] = (spans[-1][0], end, num)
+        else:
+            spans.append((start, end, num))
+    return spans
+
+
+def scan(text: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    All candidates in `text`, by kind. Each candidate has "value", "start",
+    "end" (offsets into `text`), "section" (SDS section number, 0 before the
+    first heading, None when no headings were found) and "evidence".
+    """
+    found: Dict[str, List[Dict[str, Any]]] = {
+        "cas": [], "un_number": [], "hazard_class": [], "packing_group": [],
+        "signal_word": [], "hazard_codes": [], "precautionary_codes": [], "dates": [],
+    }
+    for span_start, span_end, section in _scan_spans(text):
+        for m in SCAN_RE.finditer(text, span_start, span_end):
+            candidate = _candidate(text, m, section)
+            if candidate is not None:
+                key, item = candidate
+                found[key].append(item)
+    return found
+
+
+def _candidate(text: str, m: "re.Match[str]", section: Optional[int]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    kind = m.lastgroup  # the outer group: it closes after any group nested in it
+    if section is not None and section not in SCAN_SECTIONS[kind]:
+        return None
+    start, end = m.span()
+    extra: Dict[str, Any] = {}
+    if kind == "cas":
+        value = normalize_cas(m.group("cas"))
+        if not validate_cas_value(value) or not cas_check_digit_ok(value):
+            return None
+        key = "cas"
+    elif kind == "un":
+        value, key = f"UN{m.group('un_digits')}", "un_number"
+    elif kind == "hclass":
+        value, key = m.group("hclass_value"), "hazard_class"
+    elif kind == "pg":
+        value, key = m.group("pg_value"), "packing_group"
+    elif kind == "signal":
+        value, key = m.group("signal_value").capitalize(), "signal_word"
+    elif kind == "h_code":
+        value, key = re.sub(r"[ \t]*\+[ \t]*", "+", m.group("h_code")), "hazard_codes"
+    elif kind == "p_code":
+        value, key = re.sub(r"[ \t]*\+[ \t]*", "+", m.group("p_code")), "precautionary_codes"
+    else:
+        raw = m.group("date_value")
+        value, key = normalize_date(raw), "dates"
+        extra = {"raw": raw, "label": re.sub(r"\s+", " ", m.group("date_label"))}
+    return key, {
+        "value": value,
+        "start": start,
+        "end": end,
+        "section": section,
+        "evidence": _line_at(text, start, end),
+        **extra,
+    }
+
+
+def field_candidates(candidates: Dict[str, List[Dict[str, Any]]], field: str) -> List[Dict[str, Any]]:
+    """Candidates for a RESOLVABLE_FIELDS entry."""
+    kind = RESOLVABLE_FIELDS[field]
+    if kind == "revision_date":
+        return [c for c in candidates["dates"] if c["value"] and _REVISION_LABEL_RE.search(c["label"])]
+    return candidates[kind]
+
+
+def resolve(candidates: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Fields settled without the model: exactly one distinct value among field_candidates."""
+    resolved: Dict[str, Dict[str, Any]] = {}
+    for field in RESOLVABLE_FIELDS:
+        items = field_candidates(candidates, field)
+        if items and len({c["value"] for c in items}) == 1:
+            first = items[0]
+            resolved[field] = {k: first[k] for k in ("value", "evidence", "start", "end")}
+    return resolved
+
+
+def pre_extract(text: str, mode: str = "hints") -> Dict[str, Any]:
+    """
+    Scan `text` and decide what goes to the model. Returns
+    {"mode", "candidates", "resolved", "fields_resolved", "skipped_fields", "scan_ms"};
+    in "skip" mode every resolved field is listed in skipped_fields (left out
+    of the prompt and filled by fill_resolved).
+    """
+    t0 = time.perf_counter()
+    candidates = scan(text)
+    resolved = resolve(candidates)
+    return {
+        "mode": mode,
+        "candidates": candidates,
+        "resolved": resolved,
+        "fields_resolved": sorted(resolved),
+        "skipped_fields": sorted(resolved) if mode == "skip" else [],
+        "scan_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+    }
+
+
+def _unique(items: List[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(c["value"] for c in items if c["value"]))
+
+
+def hints_text(info: Dict[str, Any]) -> str:
+    """Prompt block listing the candidates the model still has to place ("" if none)."""
+    skipped = set(info["skipped_fields"])
+    c = info["candidates"]
+    lines = []
+    for field, kind in RESOLVABLE_FIELDS.items():
+        if field in skipped or kind == "revision_date":
+            continue
+        values = _unique(field_candidates(c, field))
+        if values:
+            lines.append(f"- {field}: {', '.join(values)}")
+    if "document.revision_date" not in skipped:
+        dated = list(dict.fromkeys(f"{d['label']} {d['raw']}" for d in c["dates"]))
+        if dated:
+            lines.append(f"- dated lines: {'; '.join(dated)}")
+    for kind, label in (
+        ("cas", "CAS numbers"),
+        ("hazard_codes", "hazard statement codes"),
+        ("precautionary_codes", "precautionary statement codes"),
+    ):
+        values = _unique(c[kind])
+        if values:
+            lines.append(f"- {label}: {', '.join(values)}")
+    if not lines:
+        return ""
+    return (
+        "\nPRE-EXTRACTED CANDIDATES (exact pattern matches in the content above; "
+        "use them where the content supports them):\n" + "\n".join(lines) + "\n"
+    )
+
+
+def fill_resolved(parsed: Dict[str, Any], info: Dict[str, Any]) -> None:
+    """Write the locally resolved values of skipped fields into the model output."""
+    for field in info.get("skipped_fields", []):
+        group, name = field.split(".")
+        value = info["resolved"][field]
+        target = parsed.setdefault(group, {})
+        if isinstance(target, dict):
+            target[name] = {"value": value["value"], "evidence": value["evidence"], "confidence": 1.0}
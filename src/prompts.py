@@ -1,3 +1,8 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+
 SYSTEM = """
 You extract structured data from Safety Data Sheets (SDS).
 Return ONLY valid JSON that matches the provided schema.
@@ -29,73 +34,183 @@ Transport Rules:
 - In Section 14, the Hazard Class is a number (e.g., 3, 8, 9) and the Packing Group is a Roman Numeral (I, II, or III). You MUST extract these into separate JSON fields. Do not combine them into a single string
 """
 
-def user_prompt(text: str) -> str:
-    return f"""
-Extract key SDS fields from the following content.
-
-SDS CONTENT:
-\"\"\"
-{text}
-\"\"\"
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English SDS text)."""
+    return (len(text) + 3) // 4
 
-Return JSON with this exact structure:
-{{
-  "document": {{
-    "product_name": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "product_code": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "physical_state": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "product_color": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "version_number": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "recommended_use": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "supplier_name": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "supplier_address": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "supplier_phone": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "emergency_phone": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "revision_date": {{ "value": string|null, "evidence": string|null, "confidence": number }}
-  }},
-  "transport": {{
-    "un_number": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "hazard_class": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-    "packing_group": {{ "value": string|null, "evidence": string|null, "confidence": number }}
-}},
-  "composition": {{
+# Output schema, split into independent field groups. The full prompt joins
+# them in this order; fan-out extraction (fanout.py) requests groups separately.
+SCHEMA_GROUPS = {
+    "document": """  "document": {
+    "product_name": { "value": string|null, "evidence": string|null, "confidence": number },
+    "product_code": { "value": string|null, "evidence": string|null, "confidence": number },
+    "physical_state": { "value": string|null, "evidence": string|null, "confidence": number },
+    "product_color": { "value": string|null, "evidence": string|null, "confidence": number },
+    "version_number": { "value": string|null, "evidence": string|null, "confidence": number },
+    "recommended_use": { "value": string|null, "evidence": string|null, "confidence": number },
+    "supplier_name": { "value": string|null, "evidence": string|null, "confidence": number },
+    "supplier_address": { "value": string|null, "evidence": string|null, "confidence": number },
+    "supplier_phone": { "value": string|null, "evidence": string|null, "confidence": number },
+    "emergency_phone": { "value": string|null, "evidence": string|null, "confidence": number },
+    "revision_date": { "value": string|null, "evidence": string|null, "confidence": number }
+  }""",
+    "transport": """  "transport": {
+    "un_number": { "value": string|null, "evidence": string|null, "confidence": number },
+    "hazard_class": { "value": string|null, "evidence": string|null, "confidence": number },
+    "packing_group": { "value": string|null, "evidence": string|null, "confidence": number }
+}""",
+    "composition": """  "composition": {
     "ingredients": [
-      {{
-        "name": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-        "cas": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-        "concentration": {{ "value": string|null, "evidence": string|null, "confidence": number }}
-      }}
+      {
+        "name": { "value": string|null, "evidence": string|null, "confidence": number },
+        "cas": { "value": string|null, "evidence": string|null, "confidence": number },
+        "concentration": { "value": string|null, "evidence": string|null, "confidence": number }
+      }
     ]
-}},
-  "physical_chemical": {{
-  "flash_point": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-  "ph": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-  "relative_density": {{ "value": string|null, "evidence": string|null, "confidence": number }},
-  "boiling_point": {{ "value": string|null, "evidence": string|null, "confidence": number }}
-}},
-  "hazards": {{
-    "ghs_signal_word": {{ "value": string|null, "evidence": string|null, "confidence": number }},
+}""",
+    "physical_chemical": """  "physical_chemical": {
+  "flash_point": { "value": string|null, "evidence": string|null, "confidence": number },
+  "ph": { "value": string|null, "evidence": string|null, "confidence": number },
+  "relative_density": { "value": string|null, "evidence": string|null, "confidence": number },
+  "boiling_point": { "value": string|null, "evidence": string|null, "confidence": number }
+}""",
+    "hazards": """  "hazards": {
+    "ghs_signal_word": { "value": string|null, "evidence": string|null, "confidence": number },
     "ghs_pictograms": [
-      {{ "value": string|null, "label": string|null, "evidence": string|null }}
+      { "value": string|null, "label": string|null, "evidence": string|null }
     ],    
     "hazard_classifications": [
-      {{ "class": string|null, "category": string|null, "evidence": string|null }}
+      { "class": string|null, "category": string|null, "evidence": string|null }
     ],
     "hazard_statements": [
-      {{ "value": string, "evidence": string|null, "confidence": number }}
+      { "value": string, "evidence": string|null, "confidence": number }
     ],
     "precautionary_statements": [
-      {{ "value": string, "evidence": string|null, "confidence": number }}
+      { "value": string, "evidence": string|null, "confidence": number }
     ]
-  }},
-  "meta": {{
+  }""",
+}
+
+META_SCHEMA = """  "meta": {
     "notes": string
-  }}
-}}
+  }"""
 
-Rules:
+RULES = """Rules:
 - Return ONLY the raw JSON object. Do not include markdown code.
 - Confidence is 0.0 to 1.0.
 - Evidence must be short (max ~200 chars each), copied from the input.
 - If the SDS content does not include a section, return nulls / empty lists.
 """
+
+
+_FIELD_LINE_RE = re.compile(r'^\s*"(\w+)":')
+
+
+def _depth_change(line: str) -> int:
+    return line.count("{") + line.count("[") - line.count("}") - line.count("]")
+
+
+def group_fields(group: str) -> List[str]:
+    """Top-level field names of a schema group, in schema order."""
+    fields, depth = [], 0
+    for line in SCHEMA_GROUPS[group].split("\n"):
+        m = _FIELD_LINE_RE.match(line)
+        if m and depth == 1:
+            fields.append(m.group(1))
+        depth += _depth_change(line)
+    return fields
+
+
+def _omit_fields(fragment: str, fields) -> str:
+    """
+    Drop `"field": ...` entries (including multi-line lists/objects) from a
+    schema fragment, fixing the comma before a closing brace.
+    """
+    lines, skip = [], 0
+    for l in fragment.split("\n"):
+        if skip:
+            skip += _depth_change(l)
+            continue
+        if any(l.lstrip().startswith(f'"{f}":') for f in fields):
+            skip = max(0, _depth_change(l))
+            continue
+        lines.append(l)
+    for i in range(len(lines) - 1):
+        if lines[i].rstrip().endswith(",") and lines[i + 1].lstrip()[:1] in ("}", "]"):
+            lines[i] = lines[i].rstrip()[:-1]
+    return "\n".join(lines)
+
+
+def schema_json(groups=None, include_meta: bool = True, omit=()) -> str:
+    """
+    JSON structure text for the given groups (default: all, in schema order).
+    `omit` lists "group.field" entries left out (filled outside the model).
+    """
+    names = list(SCHEMA_GROUPS) if groups is None else [g for g in SCHEMA_GROUPS if g in groups]
+    parts = []
+    for g in names:
+        fields = [f.split(".", 1)[1] for f in omit if f.split(".", 1)[0] == g]
+        parts.append(_omit_fields(SCHEMA_GROUPS[g], fields) if fields else SCHEMA_GROUPS[g])
+    if include_meta:
+        parts.append(META_SCHEMA)
+    return "{\n" + ",\n".join(parts) + "\n}"
+
+
+# Prompt caching only reuses an exact prefix of the request, so everything that
+# is the same for every document (instructions, schema, rules) comes first and
+# the document text last. Prefixes are built once per schema variant.
+@lru_cache(maxsize=None)
+def _static_prefix(instruction: str, groups: Optional[Tuple[str, ...]], omit: Tuple[str, ...]) -> str:
+    schema = schema_json(omit=omit) if groups is None else schema_json(groups, include_meta=False, omit=omit)
+    return f"""
+{instruction}
+
+Return JSON with this exact structure:
+{schema}
+
+{RULES}
+SDS CONTENT:
+\"\"\"
+"""
+
+
+_FULL_INSTRUCTION = "Extract key SDS fields from the SDS content at the end of this message."
+
+# Static start of every full-schema user prompt; SYSTEM + USER_PREFIX is the
+# byte-identical prefix shared by all single-mode requests.
+USER_PREFIX = _static_prefix(_FULL_INSTRUCTION, None, ())
+
+
+def user_prompt(text: str, hints: str = "", omit=()) -> str:
+    """
+    USER_PREFIX (or its variant without the `omit` fields, see schema_json)
+    followed by the content; `hints` is an optional block placed after the
+    content (see preextract.hints_text).
+    """
+    prefix = _static_prefix(_FULL_INSTRUCTION, None, tuple(sorted(omit))) if omit else USER_PREFIX
+    return f'{prefix}{text}\n"""\n{hints}'
+
+
+def group_prompt(text: str, groups, omit=()) -> str:
+    """
+    Prompt asking only for the given schema groups (used by fan-out
+    extraction, output repair and the model cascade); `omit` as for schema_json.
+    """
+    names = tuple(g for g in SCHEMA_GROUPS if g in groups)
+    instruction = f"Extract the SDS fields for these groups only: {', '.join(names)}."
+    return f'{_static_prefix(instruction, names, tuple(sorted(omit)))}{text}\n"""\n'
+
+
+def recheck_prompt(text: str, groups, items: Sequence[Tuple[str, Any]], omit=()) -> str:
+    """
+    group_prompt plus already extracted list items to check again (used by
+    the model cascade). `items` are (path, item) pairs such as
+    ("composition.ingredients[3]", {...}); each list field named there is
+    answered with only those items, corrected, in the order listed.
+    """
+    listed = "\n".join(f"- {path}: {json.dumps(item, ensure_ascii=False)}" for path, item in items)
+    return group_prompt(text, groups, omit) + f"""
+Re-check these extracted list items against the SDS content. For each list
+field below, return only these items (corrected where needed), in this order:
+{listed}
+"""
@@ -0,0 +1,200 @@
+"""
+Repair of model output that is not a complete JSON object of the schema.
+
+Local repairs are tried first (no model call): markdown code fences and
+leading/trailing prose are stripped, trailing commas are removed, and output
+that was cut off is truncated to its last complete schema groups. Groups that
+are still missing (or are not objects) are then re-requested in one compact
+request that carries only their SDS sections and schema, instead of re-running
+the whole document.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from fanout import text_for_groups
+from llm import create_response, response_usage
+from prompts import SCHEMA_GROUPS, SYSTEM, group_prompt
+from scheduler import RequestScheduler
+from streaming import IncrementalJSONParser
+
+_FENCE_OPEN_RE = re.compile(r"^```[A-Za-z]*[ \t]*\n?")
+_FENCE_CLOSE_RE = re.compile(r"\n?```\s*$")
+# Strings are matched first so commas inside them are left alone.
+_TRAILING_COMMA_RE = re.compile(r'("(?:[^"\\]|\\.)*")|,(\s*[}\]])')
+_DECODER = json.JSONDecoder()
+
+
+def missing_groups(obj: Any) -> List[str]:
+    """Schema groups that are absent from `obj` or not objects (all of them if `obj` is not a dict)."""
+    if not isinstance(obj, dict):
+        return list(SCHEMA_GROUPS)
+    return [g for g in SCHEMA_GROUPS if not isinstance(obj.get(g), dict)]
+
+
+def needs_repair(out: str) -> bool:
+    try:
+        return bool(missing_groups(json.loads(out)))
+    except ValueError:
+        return True
+
+
+def _complete_groups(s: str) -> Optional[Dict[str, Any]]:
+    """Top-level members of a cut-off or broken object that were fully received."""
+    closed: List[str] = []
+
+    def on_value(path: str, _value: Any) -> None:
+        if path and "." not in path and "[" not in path:
+            closed.append(path)
+
+    parser = IncrementalJSONParser(on_value)
+    try:
+        parser.feed(s)
+        parser.close()
+    except json.JSONDecodeError:
+        pass
+    if not isinstance(parser.root, dict):
+        return None
+    kept = {k: parser.root[k] for k in closed if k in parser.root}
+    return kept or None
+
+
+def local_repair(out: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Cheap fixes, applied in order until the text parses as a JSON object.
+    Returns (object or None, names of the fixes applied). After
+    "truncate_to_complete_groups" the object only holds the groups (and meta)
+    that were complete.
+    """
+    actions: List[str] = []
+    s = out.strip()
+    if s.startswith("```"):
+        s = _FENCE_CLOSE_RE.sub("", _FENCE_OPEN_RE.sub("", s, count=1)).strip()
+        actions.append("strip_code_fences")
+    start = s.find("{")
+    if start > 0:
+        s = s[start:]
+        actions.append("strip_leading_text")
+
+    for attempt in range(2):
+        try:
+            obj, end = _DECODER.raw_decode(s)
+        except ValueError:
+            obj, end = None, 0
+        if isinstance(obj, dict):
+            if s[end:].strip():
+                actions.append("strip_trailing_text")
+            return obj, actions
+        if attempt == 0:
+            fixed = _TRAILING_COMMA_RE.sub(lambda m: m.group(1) or m.group(2), s)
+            if fixed == s:
+                break
+            s = fixed
+            actions.append("remove_trailing_commas")
+
+    obj = _complete_groups(s)
+    if obj is not None:
+        actions.append("truncate_to_complete_groups")
+    return obj, actions
+
+
+def repair_output(
+    out: str,
+    *,
+    client: Optional[OpenAI],
+    text: str,
+    model: str,
+    max_chars: int,
+    scheduler: Optional[RequestScheduler] = None,
+    full_rerun_tokens: int = 0,
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Turn `out` into a schema object: local repairs first, then one compact
+    request for the groups that are still missing (skipped without a `client`).
+    `full_rerun_tokens` is the token cost of the original request, to report
+    what re-running the whole document would have cost instead.
+
+    Returns (object or None, info for meta.repair).
+    """
+    t0 = time.perf_counter()
+    obj, actions = local_repair(out)
+    missing = missing_groups(obj)
+    info: Dict[str, Any] = {
+        "local_actions": actions,
+        "local_groups": [g for g in SCHEMA_GROUPS if g not in missing],
+        "rerequested_groups": [],
+        "failed_groups": [],
+        "requests": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cached_tokens": 0,
+        "chars_sent": 0,
+    }
+
+    if missing and client is not None:
+        body = text_for_groups(text, missing, max_chars)
+        info.update(rerequested_groups=missing, requests=1, chars_sent=len(body))
+        try:
+            resp = create_response(
+                client,
+                [
+                    {"role": "system", "content": SYSTEM},
+                    {"role": "user", "content": group_prompt(body, missing)},
+                ],
+                model,
+                scheduler,
+            )
+            info.update(response_usage(resp))
+            answer, answer_actions = local_repair(resp.output_text or "")
+            if answer_actions:
+                info["rerequest_local_actions"] = answer_actions
+        except Exception as e:
+            answer = None
+            info["rerequest_error"] = f"{type(e).__name__}: {e}"
+        obj = obj if obj is not None else {}
+        for g in missing:
+            if isinstance((answer or {}).get(g), dict):
+                obj[g] = answer[g]
+        info["failed_groups"] = missing_groups(obj)
+
+    used = info["input_tokens"] + info["output_tokens"]
+    info["missing_groups"] = missing_groups(obj)
+    info["repaired"] = obj is not None and not info["missing_groups"]
+    info["full_rerun_tokens_est"] = full_rerun_tokens
+    info["tokens_saved_est"] = full_rerun_tokens - used
+    info["repair_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return obj, info
+
+
+def repair_warnings(info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Warn-only `group_missing` entries for schema groups a repair could not recover."""
+    return [
+        {
+            "field": group,
+            "rule": "group_missing",
+            "message": "Schema group is missing from the model output and could not be re-requested.",
+        }
+        for group in info.get("missing_groups", [])
+    ]
+
+
+def reextract_warnings(info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Warn-only `reextract_failed` entries for schema groups that were not taken
+    from an earlier extraction (near-duplicate or previous revision) and
+    could not be re-extracted either.
+    """
+    return [
+        {
+            "field": group,
+            "rule": "reextract_failed",
+            "message": "Schema group changed since the reused extraction and could not be re-extracted.",
+        }
+        for group in info.get("missing_groups", [])
+    ]
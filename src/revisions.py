@@ -0,0 +1,197 @@
+"""
+Incremental re-extraction of new revisions of an already extracted SDS.
+
+A supplier's new revision usually changes one or two sections (the revision
+date in the header, a hazard statement), yet the whole document would be sent
+to the model again. RevisionStore keeps, per extracted document, its product
+code/name keys, a hash of every SDS section's text and the extracted schema
+groups. A new input whose product code (or, failing that, product name) is
+known is diffed section by section against the latest stored revision:
+
+    changed = changed_sections(previous["sections"], section_fingerprints(text))
+    carried = carried_groups(previous["result"], changed, section_fingerprints(text))
+
+Schema groups none of whose sections changed (fanout.GROUP_SECTIONS; the
+header counts for "document") are carried forward with their evidence, and
+only the others are re-extracted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from fanout import GROUP_SECTIONS
+from prompts import SCHEMA_GROUPS
+from sections import MAX_PREAMBLE_CHARS, split_sections
+
+REVISIONS_FILENAME = "revisions.sqlite"
+
+_CODE_RE = re.compile(
+    r"(?im)^[ \t]*(?:product|item|article|material|catalog(?:ue)?|part)[ \t]*(?:code|no\.?|number|#|id)"
+    r"[ \t]*[:#.]?[ \t]*([A-Za-z0-9][A-Za-z0-9._/-]{1,40})"
+)
+_NAME_RE = re.compile(
+    r"(?im)^[ \t]*(?:product[ \t]+name|trade[ \t]+name|product[ \t]+identifier)[ \t]*[:.]?[ \t]*(\S[^\n]{1,120})$"
+)
+_KEY_CHARS_RE = re.compile(r"[^A-Z0-9]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    run_id TEXT,
+    revision_date TEXT,
+    sections TEXT NOT NULL,
+    result BLOB NOT NULL,
+    created_utc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+CREATE TABLE IF NOT EXISTS product_keys (
+    key TEXT NOT NULL,
+    document_id INTEGER NOT NULL,
+    PRIMARY KEY (key, document_id)
+) WITHOUT ROWID;
+"""
+
+
+def _key(kind: str, value: Any) -> Optional[str]:
+    s = _KEY_CHARS_RE.sub("", str(value or "").upper())
+    return f"{kind}:{s}" if len(s) >= 3 else None
+
+
+def text_keys(text: str) -> List[str]:
+    """Product code keys, then product name keys, found in the header and Section 1 of `text`."""
+    sections = split_sections(text)
+    head = (sections.get(0, "")[:MAX_PREAMBLE_CHARS] + sections.get(1, "")) if sections else text[:MAX_PREAMBLE_CHARS]
+    keys = [_key("code", m.group(1)) for m in _CODE_RE.finditer(head)]
+    keys += [_key("name", m.group(1)) for m in _NAME_RE.finditer(head)]
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def result_keys(parsed: Dict[str, Any]) -> List[str]:
+    """Keys of the extracted product code and name."""
+    doc = parsed.get("document") or {}
+    keys = [
+        _key(kind, (doc.get(field) or {}).get("value") if isinstance(doc.get(field), dict) else None)
+        for kind, field in (("code", "product_code"), ("name", "product_name"))
+    ]
+    return [k for k in keys if k]
+
+
+def section_fingerprints(text: str) -> Dict[str, str]:
+    """{section number: hash of its whitespace- and case-normalized text}; {} without section headings."""
+    return {
+        str(num): hashlib.sha256(" ".join(body.lower().split()).encode("utf-8")).hexdigest()[:32]
+        for num, body in split_sections(text).items()
+    }
+
+
+def changed_sections(previous: Dict[str, str], current: Dict[str, str]) -> List[int]:
+    """Section numbers added, removed or edited between two revisions."""
+    return sorted(int(n) for n in set(previous) | set(current) if previous.get(n) != current.get(n))
+
+
+def carried_groups(result: Dict[str, Any], changed: Sequence[int], current: Dict[str, str]) -> List[str]:
+    """Schema groups of the previous result whose source sections are all present and unchanged."""
+    if not current:
+        return []
+    carried = []
+    for group in SCHEMA_GROUPS:
+        nums = set(GROUP_SECTIONS[group]) | ({0} if group == "document" else set())
+        if group in result and all(str(n) in current for n in nums) and not nums.intersection(changed):
+            carried.append(group)
+    return carried
+
+
+class RevisionStore:
+    """
+    SQLite store of the section hashes and results of extracted documents,
+    looked up by product code/name (WAL mode; safe to share between threads).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def find(self, keys: Sequence[str], exclude_sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Latest stored revision matching the first key that is known (keys in
+        priority order), other than the input itself: {"source", "sha256",
+        "run_id", "revision_date", "sections", "result", "matched_on"}; or None.
+        """
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT d.source, d.sha256, d.run_id, d.revision_date, d.sections, d.result "
+                    "FROM product_keys k JOIN documents d ON d.id = k.document_id "
+                    "WHERE k.key = ? AND d.sha256 != ? ORDER BY d.id DESC LIMIT 1",
+                    (key, exclude_sha256 or ""),
+                ).fetchone()
+                if row is not None:
+                    return {
+                        "source": row[0],
+                        "sha256": row[1],
+                        "run_id": row[2],
+                        "revision_date": row[3],
+                        "sections": json.loads(row[4]),
+                        "result": json.loads(zlib.decompress(row[5])),
+                        "matched_on": key.split(":", 1)[0],
+                    }
+        return None
+
+    def add(
+        self,
+        source: str,
+        sha256: str,
+        keys: Sequence[str],
+        sections: Dict[str, str],
+        parsed: Dict[str, Any],
+    ) -> None:
+        """Store a revision under `keys`; the result is kept without meta."""
+        groups = {g: parsed[g] for g in SCHEMA_GROUPS if isinstance(parsed.get(g), dict)}
+        revision_date = ((parsed.get("document") or {}).get("revision_date") or {}).get("value")
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM documents WHERE sha256 = ?", (sha256,)).fetchone() is not None:
+                return
+            self._conn.execute("BEGIN")
+            cur = self._conn.execute(
+                "INSERT INTO documents (source, sha256, run_id, revision_date, sections, result, created_utc) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    source,
+                    sha256,
+                    (parsed.get("meta") or {}).get("run_id"),
+                    revision_date,
+                    json.dumps(sections),
+                    zlib.compress(json.dumps(groups, ensure_ascii=False).encode("utf-8")),
+                    time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                ),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO product_keys VALUES (?, ?)", [(k, cur.lastrowid) for k in dict.fromkeys(keys)]
+            )
+            self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "RevisionStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional
+
+import openai
+
+# Budget charged per request for the (unknown) output, reconciled with actual usage afterwards.
+DEFAULT_OUTPUT_TOKENS_ESTIMATE = 1_500
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+# "1s", "6m0s", "20ms", "1h2m3.5s" as sent in x-ratelimit-reset-* headers
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_S = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse an OpenAI rate-limit reset duration into seconds (None if unparsable)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _UNIT_S[unit] for n, unit in parts)
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilling at `per_minute` units per minute, holding
+    at most one minute's worth. `per_minute=None` means unlimited.
+    The balance may go negative (large request, or usage higher than estimated);
+    later acquirers then wait until it has refilled.
+    """
+
+    def __init__(self, per_minute: Optional[float]):
+        self.per_minute = per_minute
+        self._tokens = float(per_minute or 0)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        if self.per_minute:
+            self._tokens = min(
+                float(self.per_minute),
+                self._tokens + (now - self._updated) * self.per_minute / 60.0,
+            )
+        self._updated = now
+
+    def acquire(self, amount: float) -> float:
+        """Block until `amount` can be spent; returns seconds waited."""
+        if not self.per_minute:
+            return 0.0
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    self._cond.wait(self._blocked_until - now)
+                    continue
+                # Always admit a request once the bucket is full, even if it alone exceeds the budget.
+                if self._tokens >= min(amount, self.per_minute):
+                    self._tokens -= amount
+                    return time.monotonic() - start
+                need = min(amount, self.per_minute) - self._tokens
+                self._cond.wait(need * 60.0 / self.per_minute)
+
+    def adjust(self, delta: float) -> None:
+        """Return (positive) or charge (negative) units after the fact."""
+        if not self.per_minute:
+            return
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tokens = min(float(self.per_minute), self._tokens + delta)
+            self._cond.notify_all()
+
+    def set_rate(self, per_minute: float, remaining: Optional[float] = None) -> None:
+        """
+        Limit the bucket to `per_minute`. A bucket that was unlimited starts
+        full, or at `remaining` when the server reported it.
+        """
+        with self._cond:
+            self._refill(time.monotonic())
+            if not self.per_minute:
+                self._tokens = float(per_minute if remaining is None else remaining)
+            self.per_minute = per_minute
+            self._tokens = min(self._tokens, float(per_minute))
+            self._cond.notify_all()
+
+    def block_for(self, seconds: float) -> None:
+        """Hold every acquirer for `seconds` (server says the window is exhausted)."""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+class RequestScheduler:
+    """
+    Rate-limit-aware wrapper around model calls:
+      - requests-per-minute and tokens-per-minute token buckets (estimated from
+        the prompt, reconciled with reported usage),
+      - adapts to x-ratelimit-* response headers (lower limits, exhausted windows),
+      - retries transient errors (429, 408/409, 5xx, connection/timeouts) with
+        full-jitter exponential backoff, honouring Retry-After.
+    One instance is shared by all threads using the same account.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._metrics: Dict[str, Any] = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "budget_wait_s": 0.0,
+            "backoff_wait_s": 0.0,
+            "estimated_tokens": 0,
+            "used_tokens": 0,
+        }
+
+    def _count(self, **deltas: float) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self._metrics[k] += v
+
+    def backoff_delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Retry-After from the server if given, else full-jitter exponential backoff."""
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_ms = headers.get("retry-after-ms")
+        if retry_ms:
+            try:
+                return min(self.max_delay, float(retry_ms) / 1000.0)
+            except ValueError:
+                pass
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def never_reached_model(error: Exception) -> bool:
+        """
+        True when the request was rejected before the model ran (429, or the
+        connection failed before a response); timeouts and failures after the
+        response started may have consumed tokens.
+        """
+        if isinstance(error, openai.APITimeoutError):
+            return False
+        return isinstance(error, (openai.RateLimitError, openai.APIConnectionError))
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+        return False
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        """Tighten the buckets to the account limits the server reports."""
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = _int_header(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _int_header(headers, f"x-ratelimit-remaining-{kind}")
+            if limit and (bucket.per_minute is None or limit < bucket.per_minute):
+                bucket.set_rate(limit, remaining)
+            if remaining == 0:
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    bucket.block_for(reset)
+
+    def call(self, fn: Callable[[], Any], estimated_input_tokens: int) -> Any:
+        """
+        Run `fn` (which must return (result, headers, used_tokens)) within budget,
+        retrying transient failures. Returns `result`; raises the last error once
+        retries are exhausted.
+        """
+        estimate = estimated_input_tokens + DEFAULT_OUTPUT_TOKENS_ESTIMATE
+        self._count(requests=1, estimated_tokens=estimate)
+        attempt = 0
+        while True:
+            waited = self.requests.acquire(1) + self.tokens.acquire(estimate)
+            self._count(budget_wait_s=waited)
+            try:
+                result, headers, used = fn()
+            except Exception as e:
+                # A rejected attempt consumed no provider tokens, so retries under rate
+                # limiting do not drain the budget; other failures keep their charge.
+                if self.never_reached_model(e):
+                    self.tokens.adjust(estimate)
+                if isinstance(e, openai.RateLimitError):
+                    self._count(rate_limited=1)
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                if headers is not None:
+                    self.observe_headers(headers)
+                if not self.is_retryable(e) or attempt >= self.max_retries:
+                    self._count(failed=1)
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                self._count(retries=1, backoff_wait_s=delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.observe_headers(headers)
+            if used:
+                self.tokens.adjust(estimate - used)
+            self._count(succeeded=1, used_tokens=used or estimate)
+            return result
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            m = dict(self._metrics)
+        elapsed_min = max(1e-9, (time.monotonic() - self._started) / 60.0)
+        m["budget_wait_s"] = round(m["budget_wait_s"], 3)
+        m["backoff_wait_s"] = round(m["backoff_wait_s"], 3)
+        m["requests_per_minute"] = round(m["succeeded"] / elapsed_min, 2)
+        m["tokens_per_minute"] = round(m["used_tokens"] / elapsed_min, 1)
+        m["rpm_limit"] = self.requests.per_minute
+        m["tpm_limit"] = self.tokens.per_minute
+        return m
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# The 16 standard GHS SDS section titles, keyed by section number.
+SECTION_TITLES = {
+    1: "Identification",
+    2: "Hazard(s) identification",
+    3: "Composition/information on ingredients",
+    4: "First-aid measures",
+    5: "Fire-fighting measures",
+    6: "Accidental release measures",
+    7: "Handling and storage",
+    8: "Exposure controls/personal protection",
+    9: "Physical and chemical properties",
+    10: "Stability and reactivity",
+    11: "Toxicological information",
+    12: "Ecological information",
+    13: "Disposal considerations",
+    14: "Transport information",
+    15: "Regulatory information",
+    16: "Other information",
+}
+
+# Sections the prompt schema actually uses (see prompts.user_prompt).
+SCHEMA_SECTIONS = frozenset({1, 2, 3, 9, 14})
+
+# Text before the Section 1 heading kept as document header.
+MAX_PREAMBLE_CHARS = 2_000
+
+# A heading is only accepted when its title contains the expected keyword,
+# which keeps cross references ("see Section 8 on ...") from matching.
+SECTION_KEYWORDS = {
+    1: re.compile(r"identif", re.I),
+    2: re.compile(r"hazard", re.I),
+    3: re.compile(r"composition|information on ingredients|ingredients", re.I),
+    4: re.compile(r"first[\s-]*aid", re.I),
+    5: re.compile(r"fire[\s-]*fighting|fire", re.I),
+    6: re.compile(r"accidental|release", re.I),
+    7: re.compile(r"handling|storage", re.I),
+    8: re.compile(r"exposure|personal protection", re.I),
+    9: re.compile(r"physical", re.I),
+    10: re.compile(r"stability|reactivity", re.I),
+    11: re.compile(r"toxicolog", re.I),
+    12: re.compile(r"ecolog", re.I),
+    13: re.compile(r"disposal", re.I),
+    14: re.compile(r"transport", re.I),
+    15: re.compile(r"regulat", re.I),
+    16: re.compile(r"other", re.I),
+}
+
+# "SECTION 14: Transport information", "Section 9. Physical ...", "14. Transport information"
+HEADING_RE = re.compile(
+    r"^[ \t]*(section[ \t]*)?(\d{1,2})[ \t]*([:.\-)])?[ \t]*([A-Za-z][^\n]{0,100})$",
+    re.I | re.M,
+)
+
+
+def find_headings(text: str) -> List[Tuple[int, int, int]]:
+    """
+    Locate section headings in `text`.
+    Returns (section_number, line_start, line_end) for every accepted heading, in text order.
+    Repeated headings (page headers on continuation pages) are all reported.
+    """
+    found = []
+    for m in HEADING_RE.finditer(text):
+        has_word, num_s, sep, title = m.group(1), m.group(2), m.group(3), m.group(4)
+        num = int(num_s)
+        if num not in SECTION_KEYWORDS:
+            continue
+        # A bare number needs a separator ("14. Transport"), otherwise table rows leak in.
+        if not has_word and not sep:
+            continue
+        if not SECTION_KEYWORDS[num].search(title[:80]):
+            continue
+        found.append((num, m.start(), m.end()))
+    return found
+
+
+def section_numbers_in(text: str) -> List[int]:
+    """Distinct section numbers whose heading appears in `text`, in first-seen order."""
+    seen: List[int] = []
+    for num, _, _ in find_headings(text):
+        if num not in seen:
+            seen.append(num)
+    return seen
+
+
+def split_sections(text: str) -> Dict[int, str]:
+    """
+    Split `text` at section headings. Key 0 holds the preamble before the first
+    heading (document header). A heading repeated on a continuation page
+    appends to the same section, so every section maps to one string.
+    Returns {} when no heading is found.
+    """
+    headings = find_headings(text)
+    if not headings:
+        return {}
+    parts: Dict[int, List[str]] = {0: [text[:headings[0][1]]]}
+    for idx, (num, start, _) in enumerate(headings):
+        end = headings[idx + 1][1] if idx + 1 < len(headings) else len(text)
+        parts.setdefault(num, []).append(text[start:end])
+    return {num: "".join(chunks) for num, chunks in parts.items()}
+
+
+def select_sections(
+    text: str,
+    wanted: Iterable[int] = SCHEMA_SECTIONS,
+) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Build prompt text from only the `wanted` sections (plus the short document
+    header before Section 1, which often carries product name / revision date).
+
+    Returns (selected_text, info). selected_text is None when any wanted
+    section heading could not be located; info["fallback_reason"] says why and
+    the caller should fall back to sending the full text.
+    """
+    wanted = sorted(set(wanted))
+    sections = split_sections(text)
+    info: Dict[str, Any] = {
+        "sections_found": sorted(n for n in sections if n),
+        "section_chars": {str(n): len(sections[n]) for n in sorted(sections)},
+        "sections_selected": wanted,
+    }
+    missing = [n for n in wanted if n not in sections]
+    if missing:
+        info["fallback_reason"] = (
+            "no section headings found" if not sections
+            else f"headings not found for sections {missing}"
+        )
+        return None, info
+
+    header = sections[0][:MAX_PREAMBLE_CHARS]
+    return header + "".join(sections[n] for n in wanted), info
@@ -0,0 +1,292 @@
+"""
+Long-running extraction service: a small HTTP API in front of a bounded job
+queue and a pool of warm worker threads sharing one Extractor (OpenAI client,
+caches, prompts).
+
+    POST /jobs?filename=sds.pdf   body = raw PDF/text bytes -> 202 {"job_id": ...}
+                                  429 when the queue is full, 503 while draining
+    GET  /jobs/<id>               -> job status + queue wait / run time
+    GET  /jobs/<id>/result        -> extracted JSON (409 until done, 500 if failed)
+    GET  /health                  -> queue depth, worker count, job counters
+
+SIGINT/SIGTERM stop intake and drain queued jobs before exiting.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+from cache import DEFAULT_CACHE_DIR, ExtractionCache
+from main import Extractor, require_key, utc_now_iso
+from metrics import MetricsSink
+from scheduler import DEFAULT_MAX_RETRIES, RequestScheduler
+from pdf_text import PageTextCache
+
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_WORKERS = 4
+# Finished jobs kept in memory for polling; oldest are dropped first.
+DEFAULT_MAX_FINISHED = 10_000
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+
+class Job:
+    def __init__(self, filename: str, data: bytes):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.data: Optional[bytes] = data
+        self.status = "queued"
+        self.submitted_utc = utc_now_iso()
+        self.submitted = time.perf_counter()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        d: Dict[str, Any] = {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "submitted_utc": self.submitted_utc,
+        }
+        if self.started is not None:
+            d["queue_wait_s"] = round(self.started - self.submitted, 4)
+        if self.finished is not None and self.started is not None:
+            d["run_s"] = round(self.finished - self.started, 4)
+        if self.error:
+            d["error"] = self.error
+        return d
+
+
+class ExtractionService:
+    """Bounded job queue + warm worker threads; HTTP handling lives in make_server()."""
+
+    def __init__(
+        self,
+        extractor: Extractor,
+        workers: int = DEFAULT_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        max_finished: int = DEFAULT_MAX_FINISHED,
+    ):
+        self.extractor = extractor
+        self.queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=queue_size)
+        self.max_finished = max_finished
+        self.jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.accepting = True
+        self.counters = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0}
+        self._workers: List[threading.Thread] = [
+            threading.Thread(target=self._work, name=f"sds-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._workers:
+            t.start()
+
+    def submit(self, filename: str, data: bytes) -> Optional[Job]:
+        """
+        Queue a job; returns None when the queue is full (caller answers 429)
+        or the service is draining (`accepting` is False; caller answers 503).
+        """
+        job = Job(filename, data)
+        # The check and the put happen under the lock drain() flips `accepting`
+        # with, so no job can be queued behind the shutdown sentinels.
+        with self._lock:
+            if not self.accepting:
+                self.counters["rejected"] += 1
+                return None
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                self.counters["rejected"] += 1
+                return None
+            self.jobs[job.id] = job
+            self.counters["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _work(self) -> None:
+        while True:
+            job = self.queue.get()
+            if job is None:  # drain sentinel
+                self.queue.task_done()
+                return
+            job.status = "running"
+            job.started = time.perf_counter()
+            try:
+                result = self.extractor.extract_bytes(job.data or b"", job.filename)
+                if result["parsed"] is None:
+                    raise ValueError(f"model output was not valid JSON ({result['error']})")
+                job.result = result["parsed"]
+                job.status = "done"
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "failed"
+            job.finished = time.perf_counter()
+            job.data = None  # free the upload
+            self._retire(job)
+            self.queue.task_done()
+
+    def _retire(self, job: Job) -> None:
+        with self._lock:
+            self.counters[job.status] += 1
+            self._finished[job.id] = None
+            while len(self._finished) > self.max_finished:
+                old_id, _ = self._finished.popitem(last=False)
+                self.jobs.pop(old_id, None)
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            running = sum(1 for j in self.jobs.values() if j.status == "running")
+            return {
+                "accepting": self.accepting,
+                "workers": len(self._workers),
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "running": running,
+                **self.counters,
+                "scheduler": self.extractor.scheduler.metrics() if self.extractor.scheduler else None,
+            }
+
+    def drain(self) -> None:
+        """Stop intake, let workers finish every queued job, then stop them."""
+        with self._lock:
+            self.accepting = False
+        # No submit() can enqueue from here on, so the sentinels are the last items.
+        self.queue.join()
+        for _ in self._workers:
+            self.queue.put(None)
+        for t in self._workers:
+            t.join()
+
+
+def make_server(service: ExtractionService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path.rstrip("/") != "/jobs":
+                self._send_json(404, {"error": "not found"})
+                return
+            if not service.accepting:
+                self._send_json(503, {"error": "service is draining"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_UPLOAD_BYTES:
+                self._send_json(400, {"error": f"body must be 1..{MAX_UPLOAD_BYTES} bytes"})
+                return
+            data = self.rfile.read(length)
+            filename = (parse_qs(url.query).get("filename") or ["upload.pdf"])[0]
+            job = service.submit(Path(filename).name, data)
+            if job is None and not service.accepting:
+                self._send_json(503, {"error": "service is draining"})
+                return
+            if job is None:
+                self._send_json(429, {"error": "queue full"}, {"Retry-After": "1"})
+                return
+            self._send_json(202, {"job_id": job.id, "status": job.status})
+
+        def do_GET(self):
+            parts = [p for p in urlparse(self.path).path.split("/") if p]
+            if parts == ["health"]:
+                self._send_json(200, service.health())
+                return
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = service.get(parts[1])
+                if job is None:
+                    self._send_json(404, {"error": "unknown job"})
+                elif len(parts) == 2:
+                    self._send_json(200, job.to_dict())
+                elif parts[2] != "result":
+                    self._send_json(404, {"error": "not found"})
+                elif job.status == "done":
+                    self._send_json(200, job.result)
+                elif job.status == "failed":
+                    self._send_json(500, job.to_dict())
+                else:
+                    self._send_json(409, job.to_dict())
+                return
+            self._send_json(404, {"error": "not found"})
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    return httpd
+
+
+def main() -> int:
+    load_dotenv()
+    require_key()
+
+    parser = argparse.ArgumentParser(description="SDS extraction HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--mode", choices=("single", "fanout"), default="single")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--rpm", type=float, default=None, help="Requests-per-minute budget")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens-per-minute budget")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES)
+    parser.add_argument("--metrics-out", type=Path, default=None,
+                        help="Per-job metrics: JSON lines, or a Prometheus text file if it ends in .prom")
+    args = parser.parse_args()
+
+    extractor = Extractor(
+        cache=None if args.no_cache else ExtractionCache(args.cache_dir),
+        page_cache=None if args.no_cache else PageTextCache(args.cache_dir / "pages"),
+        mode=args.mode,
+        scheduler=RequestScheduler(rpm=args.rpm, tpm=args.tpm, max_retries=args.max_retries),
+        metrics=MetricsSink(args.metrics_out) if args.metrics_out else None,
+    )
+    service = ExtractionService(extractor, workers=args.workers, queue_size=args.queue_size)
+    httpd = make_server(service, args.host, args.port)
+
+    def _shutdown(signum, frame):
+        # Drain in a helper thread: shutdown() blocks until serve_forever returns.
+        def _stop():
+            print("draining job queue...", flush=True)
+            service.drain()
+            httpd.shutdown()
+        threading.Thread(target=_stop, daemon=True).start()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    print(f"SDS extraction service on http://{args.host}:{args.port} "
+          f"(workers={args.workers}, queue={args.queue_size})", flush=True)
+    httpd.serve_forever()
+    httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
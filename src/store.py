@@ -0,0 +1,453 @@
+"""
+Queryable result store: extraction outputs normalized into SQLite tables.
+
+    documents    one row per extracted document (latest run per source)
+    ingredients  composition rows, CAS normalized, concentration parsed to a % range
+    hazards      hazard/precautionary statements, classifications, pictograms
+    transport    UN number, hazard class, packing group
+    warnings     meta.validation_warnings
+    meta         token usage, timings, eval accuracy and the full meta object
+
+Indexed by CAS number, UN number and product code. Results are buffered and
+inserted in batched transactions; a document extracted again replaces its
+previous rows.
+
+    python src/store.py results.sqlite ingest outputs/
+    python src/store.py results.sqlite cas 67-64-1 --above 10
+    python src/store.py results.sqlite un UN1263
+    python src/store.py results.sqlite product-code Q110K1718
+    python src/store.py results.sqlite export-parquet parquet/
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from format_guardrails import normalize_cas
+
+# Documents per transaction.
+DEFAULT_FLUSH_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    input_filename TEXT,
+    run_id TEXT,
+    run_timestamp_utc TEXT,
+    model TEXT,
+    product_name TEXT,
+    product_code TEXT,
+    version_number TEXT,
+    revision_date TEXT,
+    supplier_name TEXT,
+    signal_word TEXT
+);
+CREATE TABLE IF NOT EXISTS ingredients (
+    document_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    cas TEXT,
+    concentration TEXT,
+    pct_min REAL,
+    pct_max REAL
+);
+CREATE TABLE IF NOT EXISTS hazards (
+    document_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    code TEXT,
+    text TEXT,
+    category TEXT
+);
+CREATE TABLE IF NOT EXISTS transport (
+    document_id INTEGER PRIMARY KEY,
+    un_number TEXT,
+    hazard_class TEXT,
+    packing_group TEXT
+);
+CREATE TABLE IF NOT EXISTS warnings (
+    document_id INTEGER NOT NULL,
+    field TEXT,
+    rule TEXT,
+    message TEXT,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    document_id INTEGER PRIMARY KEY,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    total_ms REAL,
+    accuracy REAL,
+    meta_json TEXT
+);
+CREATE INDEX IF NOT EXISTS ingredients_cas ON ingredients (cas, pct_max);
+CREATE INDEX IF NOT EXISTS ingredients_document ON ingredients (document_id);
+CREATE INDEX IF NOT EXISTS hazards_document ON hazards (document_id);
+CREATE INDEX IF NOT EXISTS hazards_code ON hazards (code);
+CREATE INDEX IF NOT EXISTS transport_un ON transport (un_number);
+CREATE INDEX IF NOT EXISTS warnings_document ON warnings (document_id);
+CREATE INDEX IF NOT EXISTS documents_product_code ON documents (product_code);
+"""
+
+CHILD_TABLES = ("ingredients", "hazards", "transport", "warnings", "meta")
+
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+_UN_RE = re.compile(r"(?:UN|NA)?\s*(\d{4})", re.I)
+_STATEMENT_CODE_RE = re.compile(r"^((?:EUH|H|P)\d{3}[A-Za-z]*(?:\s*\+\s*(?:H|P)\d{3}[A-Za-z]*)*)\s*:?\s*(.*)$", re.S)
+
+
+def _value(node: Any) -> Optional[str]:
+    """The string value of a field object (numbers are stringified; blanks are None)."""
+    v = node.get("value") if isinstance(node, dict) else node
+    if v is None:
+        return None
+    v = str(v).strip()
+    return v or None
+
+
+def parse_concentration(text: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Percent range of a concentration string: "1 - 5" -> (1, 5), "≥10 - <25" -> (10, 25),
+    ">= 90" -> (90, 100), "< 1 %" -> (0, 1), "12.5" -> (12.5, 12.5); (None, None) if
+    there is no number.
+    """
+    if not text:
+        return None, None
+    nums = [float(n.replace(",", ".")) for n in _NUMBER_RE.findall(text)]
+    if not nums:
+        return None, None
+    if "ppm" in text.lower():
+        nums = [n / 10_000.0 for n in nums]
+    if len(nums) >= 2:  # a range, also in the GHS form ">= 10 - < 25"
+        return min(nums[:2]), max(nums[:2])
+    head = text.lstrip()[:2]
+    if head[:1] in ("<", "≤") or text.lower().lstrip().startswith(("up to", "less than")):
+        return 0.0, nums[0]
+    if head[:1] in (">", "≥") or text.lower().lstrip().startswith(("more than", "greater than")):
+        return nums[0], 100.0
+    return nums[0], nums[0]
+
+
+def normalize_un(value: Optional[str]) -> Optional[str]:
+    """"UN 1263", "1263", "un1263" -> "UN1263"; anything else is kept as given."""
+    if not value:
+        return None
+    m = _UN_RE.search(value)
+    if m is None:
+        return value
+    prefix = "NA" if value.strip().upper().startswith("NA") else "UN"
+    return f"{prefix}{m.group(1)}"
+
+
+def _statement(value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    if not value:
+        return None, None
+    m = _STATEMENT_CODE_RE.match(value)
+    if m is None:
+        return None, value
+    return re.sub(r"\s+", "", m.group(1)).upper(), m.group(2) or None
+
+
+def document_rows(doc_id: int, source: str, parsed: Dict[str, Any]) -> Dict[str, List[Tuple[Any, ...]]]:
+    """The rows of every table for one extraction output."""
+    doc = parsed.get("document") or {}
+    hz = parsed.get("hazards") or {}
+    tr = parsed.get("transport") or {}
+    meta = parsed.get("meta") or {}
+    rows: Dict[str, List[Tuple[Any, ...]]] = {t: [] for t in ("documents",) + CHILD_TABLES}
+
+    rows["documents"].append((
+        doc_id, source, meta.get("input_filename"), meta.get("run_id"), meta.get("run_timestamp_utc"),
+        meta.get("model"), _value(doc.get("product_name")), _value(doc.get("product_code")),
+        _value(doc.get("version_number")), _value(doc.get("revision_date")),
+        _value(doc.get("supplier_name")), _value(hz.get("ghs_signal_word")),
+    ))
+
+    ingredients = (parsed.get("composition") or {}).get("ingredients") or []
+    for pos, ing in enumerate(ingredients):
+        if not isinstance(ing, dict):
+            continue
+        cas = _value(ing.get("cas"))
+        conc = _value(ing.get("concentration"))
+        pct_min, pct_max = parse_concentration(conc)
+        rows["ingredients"].append((
+            doc_id, pos, _value(ing.get("name")), normalize_cas(cas) if cas else None, conc, pct_min, pct_max,
+        ))
+
+    for kind, key in (("statement", "hazard_statements"), ("precautionary", "precautionary_statements")):
+        for item in hz.get(key) or []:
+            code, text = _statement(_value(item))
+            rows["hazards"].append((doc_id, kind, code, text, None))
+    for item in hz.get("hazard_classifications") or []:
+        if isinstance(item, dict):
+            rows["hazards"].append((doc_id, "classification", None, item.get("class"), item.get("category")))
+    for item in hz.get("ghs_pictograms") or []:
+        if isinstance(item, dict):
+            rows["hazards"].append((doc_id, "pictogram", _value(item), item.get("label"), None))
+
+    transport = (_value(tr.get("un_number")), _value(tr.get("hazard_class")), _value(tr.get("packing_group")))
+    if any(transport):
+        rows["transport"].append((doc_id, normalize_un(transport[0])) + transport[1:])
+
+    for w in meta.get("validation_warnings") or []:
+        value = w.get("value")
+        rows["warnings"].append((
+            doc_id, w.get("field"), w.get("rule"), w.get("message"),
+            None if value is None else json.dumps(value, ensure_ascii=False) if not isinstance(value, str) else value,
+        ))
+
+    usage = meta.get("usage") or {}
+    rows["meta"].append((
+        doc_id, usage.get("input_tokens"), usage.get("output_tokens"),
+        (meta.get("timings") or {}).get("total_ms"), (meta.get("eval") or {}).get("accuracy"),
+        json.dumps(meta, ensure_ascii=False),
+    ))
+    return rows
+
+
+_INSERTS = {
+    "documents": "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "ingredients": "INSERT INTO ingredients VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "hazards": "INSERT INTO hazards VALUES (?, ?, ?, ?, ?)",
+    "transport": "INSERT INTO transport VALUES (?, ?, ?, ?)",
+    "warnings": "INSERT INTO warnings VALUES (?, ?, ?, ?, ?)",
+    "meta": "INSERT INTO meta VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+
+class ResultStore:
+    """
+    SQLite store of extraction results. `add` buffers a parsed output and
+    writes every `flush_every` documents in one transaction (call `flush` or
+    `close` at the end). Safe to share between the threads of a batch.
+    """
+
+    def __init__(self, path: Path, flush_every: int = DEFAULT_FLUSH_EVERY):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._next_id = (self._conn.execute("SELECT MAX(id) FROM documents").fetchone()[0] or 0) + 1
+        self.documents_written = 0
+        self.flush_s = 0.0
+
+    def add(self, parsed: Dict[str, Any], source: Optional[str] = None) -> None:
+        """Queue one output; `source` (default: meta.input_filename) identifies the document across runs."""
+        source = source or (parsed.get("meta") or {}).get("input_filename") or ""
+        with self._lock:
+            self._pending[source] = parsed
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+
+    def add_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        for source, parsed in items:
+            self.add(parsed, source)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        t0 = time.perf_counter()
+        batch, self._pending = self._pending, {}
+        tables: Dict[str, List[Tuple[Any, ...]]] = {t: [] for t in _INSERTS}
+        sources = list(batch)
+        for source in sources:
+            for table, rows in document_rows(self._next_id, source, batch[source]).items():
+                tables[table].extend(rows)
+            self._next_id += 1
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            # Earlier runs of the same documents are replaced.
+            old: List[Tuple[int]] = []
+            for k in range(0, len(sources), 500):
+                chunk = sources[k:k + 500]
+                old.extend(conn.execute(
+                    f"SELECT id FROM documents WHERE source IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+            if old:
+                for table in CHILD_TABLES:
+                    conn.executemany(f"DELETE FROM {table} WHERE document_id = ?", old)
+                conn.executemany("DELETE FROM documents WHERE id = ?", old)
+            for table, rows in tables.items():
+                if rows:
+                    conn.executemany(_INSERTS[table], rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.documents_written += len(sources)
+        self.flush_s += time.perf_counter() - t0
+
+    def _query(self, sql: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+        with self._lock:
+            cur = self._conn.execute(sql, params)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def find_by_cas(self, cas: str, above: Optional[float] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Documents listing `cas`; with `above`, only where the stated
+        concentration range reaches above that percentage.
+        """
+        sql = (
+            "SELECT d.id, d.source, d.product_name, d.product_code, i.name, i.cas, i.concentration, "
+            "i.pct_min, i.pct_max FROM ingredients i JOIN documents d ON d.id = i.document_id WHERE i.cas = ?"
+        )
+        params: Tuple[Any, ...] = (normalize_cas(cas),)
+        if above is not None:
+            sql += " AND i.pct_max > ?"
+            params += (above,)
+        return self._query(sql + " ORDER BY d.id LIMIT ?", params + (limit,))
+
+    def find_by_un(self, un_number: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT d.id, d.source, d.product_name, d.product_code, t.un_number, t.hazard_class, t.packing_group "
+            "FROM transport t JOIN documents d ON d.id = t.document_id WHERE t.un_number = ? ORDER BY d.id LIMIT ?",
+            (normalize_un(un_number), limit),
+        )
+
+    def find_by_product_code(self, code: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT id, source, product_name, product_code, version_number, revision_date, supplier_name "
+            "FROM documents WHERE product_code = ? ORDER BY id LIMIT ?",
+            (code.strip(), limit),
+        )
+
+    def sources(self) -> set:
+        """Sources of every stored document (pending ones included)."""
+        with self._lock:
+            stored = {row[0] for row in self._conn.execute("SELECT source FROM documents")}
+            return stored | set(self._pending)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                t: self._conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in ("documents",) + CHILD_TABLES
+            }
+
+    def export_parquet(self, out_dir: Path) -> List[Path]:
+        """Write every table to out_dir/<table>.parquet (needs pyarrow)."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from e
+        self.flush()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        with self._lock:
+            for table in ("documents",) + CHILD_TABLES:
+                cur = self._conn.execute(f"SELECT * FROM {table}")
+                cols = [c[0] for c in cur.description]
+                data = list(zip(*cur.fetchall())) or [[] for _ in cols]
+                path = out_dir / f"{table}.parquet"
+                pq.write_table(pa.table({c: list(v) for c, v in zip(cols, data)}), path)
+                written.append(path)
+        return written
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def ingest_dir(store: ResultStore, folder: Path) -> int:
+    """
+    Load the per-document JSON outputs of a batch folder; returns the number
+    loaded. Documents are keyed by their input path when batch_summary.json
+    names it (as run_batch does), else by the output path.
+    """
+    from corpus_eval import NON_DOCUMENT_FILES
+
+    inputs: Dict[str, str] = {}
+    summary_path = folder / "batch_summary.json"
+    if summary_path.exists():
+        summary = json.loads(summary_path.read_text(encoding="utf-8"))
+        inputs = {Path(r["output"]).name: r["input"] for r in summary.get("documents_detail", [])}
+    n = 0
+    for p in sorted(folder.glob("*.json")):
+        if p.name in NON_DOCUMENT_FILES:
+            continue
+        try:
+            parsed = json.loads(p.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+        if isinstance(parsed, dict) and "meta" in parsed:
+            store.add(parsed, inputs.get(p.name, str(p)))
+            n += 1
+    return n
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Query / load the SDS result store")
+    parser.add_argument("store", type=Path, help="SQLite file (created if missing)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("cas", help="Documents containing a CAS number")
+    p.add_argument("cas")
+    p.add_argument("--above", type=float, default=None,
+                   help="Only where the stated concentration range goes above this %%")
+    p = sub.add_parser("un", help="Documents with a UN number")
+    p.add_argument("un_number")
+    p = sub.add_parser("product-code", help="Documents with a product code")
+    p.add_argument("code")
+    p = sub.add_parser("ingest", help="Load per-document JSON outputs from a folder")
+    p.add_argument("folder", type=Path)
+    p = sub.add_parser("export-parquet", help="Write every table as Parquet")
+    p.add_argument("out_dir", type=Path)
+    sub.add_parser("stats", help="Row counts per table")
+    for name in ("cas", "un", "product-code"):
+        sub.choices[name].add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    with ResultStore(args.store) as store:
+        t0 = time.perf_counter()
+        if args.command == "ingest":
+            n = ingest_dir(store, args.folder)
+            store.flush()
+            print(f"ingested {n} documents in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+            return 0
+        if args.command == "export-parquet":
+            for path in store.export_parquet(args.out_dir):
+                print(path)
+            return 0
+        if args.command == "stats":
+            print(json.dumps(store.counts(), indent=2))
+            return 0
+        if args.command == "cas":
+            rows = store.find_by_cas(args.cas, args.above, args.limit)
+        elif args.command == "un":
+            rows = store.find_by_un(args.un_number, args.limit)
+        else:
+            rows = store.find_by_product_code(args.code, args.limit)
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        print(f"{len(rows)} rows in {(time.perf_counter() - t0) * 1000:.2f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
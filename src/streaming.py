@@ -0,0 +1,292 @@
+"""
+Streaming extraction: consume the model output as it is generated, parse the
+JSON incrementally and validate each field as soon as it closes.
+
+    stream = FieldStream(on_partial=print)
+    text, resp = stream_response(client, messages, model, on_delta=stream.feed, on_start=stream.reset)
+
+Completed field objects ({"value", "evidence", "confidence"}) are checked with
+the format guardrails at their path and forwarded to `on_partial`; a response
+that stops being valid JSON is detected at the offending character, and the
+request is abandoned instead of being read to the end.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import time
+from json.decoder import scanstring
+from typing import Any, Callable, Dict, List, Optional
+
+from format_guardrails import apply_guardrails_at
+
+_WS_RE = re.compile(r"[ \t\n\r]*")
+_NUMBER_RE = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+_NUMBER_CHARS_RE = re.compile(r"[-+0-9.eE]+")
+_LITERALS = {"true": True, "false": False, "null": None}
+# Text allowed before the JSON object (a ```json fence, a short preamble), as
+# repair.local_repair strips it; an answer without "{" by then is not JSON.
+MAX_PREFIX_CHARS = 200
+
+# Parser states of an open container (_KEY: after a comma, so no closing brace).
+_KEY_OR_END, _KEY, _COLON, _VALUE, _COMMA_OR_END, _VALUE_OR_END = range(6)
+
+
+class IncrementalJSONParser:
+    """
+    Push parser for one JSON document arriving in chunks.
+
+    The Python value is built as text arrives (`root` is the partial document
+    at any time). `on_value(path, value)` is called whenever an object or array
+    closes, with paths like "composition.ingredients[2].cas". Malformed input
+    raises json.JSONDecodeError at the first offending character, as
+    json.loads would for the complete text.
+    """
+
+    def __init__(self, on_value: Optional[Callable[[str, Any], None]] = None):
+        self.on_value = on_value
+        self.chars = 0
+        # Unparsed tail of the input; everything before it has been consumed.
+        self._chunks: List[str] = []
+        self._tail = ""
+        self._consumed = 0
+        self.root: Any = None
+        self.done = False
+        # Open containers: [container, path, state, pending key]
+        self._stack: List[List[Any]] = []
+
+    def feed(self, chunk: str) -> None:
+        self._chunks.append(chunk)
+        self.chars += len(chunk)
+        self._tail += chunk
+        self._parse(final=False)
+
+    def close(self) -> Any:
+        """End of input: returns the document, raises if it is incomplete."""
+        self._parse(final=True)
+        if not self.done:
+            raise self._error("Expecting value" if not self._stack else "Unterminated document", len(self._tail))
+        return self.root
+
+    def _error(self, msg: str, pos: int) -> json.JSONDecodeError:
+        """Error at `pos` of the unparsed tail, reported against the whole input like json.loads."""
+        return json.JSONDecodeError(msg, "".join(self._chunks), self._consumed + pos)
+
+    def _child_path(self, frame: List[Any]) -> str:
+        container, path, _, key = frame
+        if isinstance(container, list):
+            return f"{path}[{len(container)}]"
+        return f"{path}.{key}" if path else key
+
+    def _attach(self, value: Any) -> str:
+        """Store `value` in the innermost open container (or as root); returns its path."""
+        if not self._stack:
+            self.root = value
+            return ""
+        frame = self._stack[-1]
+        path = self._child_path(frame)
+        if isinstance(frame[0], list):
+            frame[0].append(value)
+        else:
+            frame[0][frame[3]] = value
+        frame[2] = _COMMA_OR_END
+        return path
+
+    def _close_container(self) -> None:
+        container, path, _, _ = self._stack.pop()
+        if not self._stack:
+            self.done = True
+        if self.on_value is not None:
+            self.on_value(path, container)
+
+    def _parse(self, final: bool) -> None:
+        text = self._tail
+        n = len(text)
+        i = 0
+        while True:
+            i = _WS_RE.match(text, i).end()
+            if i >= n:
+                break
+            if self.done:
+                raise self._error("Extra data", i)
+            c = text[i]
+            frame = self._stack[-1] if self._stack else None
+            state = frame[2] if frame is not None else _VALUE
+
+            if state == _COMMA_OR_END or (state in (_KEY_OR_END, _VALUE_OR_END) and c in "}]"):
+                end = "}" if isinstance(frame[0], dict) else "]"
+                if c == end:
+                    i += 1
+                    self._close_container()
+                elif c == "," and state == _COMMA_OR_END:
+                    i += 1
+                    frame[2] = _KEY if end == "}" else _VALUE
+                else:
+                    raise self._error("Expecting ',' delimiter", i)
+                continue
+
+            if state == _KEY_OR_END or state == _KEY:
+                if c != '"':
+                    raise self._error("Expecting property name enclosed in double quotes", i)
+                parsed = self._string(i, final)
+                if parsed is None:
+                    break
+                frame[3], i = parsed
+                frame[2] = _COLON
+                continue
+
+            if state == _COLON:
+                if c != ":":
+                    raise self._error("Expecting ':' delimiter", i)
+                i += 1
+                frame[2] = _VALUE
+                continue
+
+            # A value is expected (_VALUE, _VALUE_OR_END or the root).
+            if c == "{" or c == "[":
+                container: Any = {} if c == "{" else []
+                path = self._attach(container)
+                self._stack.append([container, path, _KEY_OR_END if c == "{" else _VALUE_OR_END, None])
+                i += 1
+            elif c == '"':
+                parsed = self._string(i, final)
+                if parsed is None:
+                    break
+                value, i = parsed
+                self._scalar(value)
+            else:
+                if c in "-0123456789":
+                    if not final and _NUMBER_CHARS_RE.match(text, i).end() == n:
+                        break  # the number may continue in the next chunk
+                    m = _NUMBER_RE.match(text, i)
+                    if m is None:
+                        raise self._error("Expecting value", i)
+                    num = m.group()
+                    i = m.end()
+                    self._scalar(float(num) if any(ch in num for ch in ".eE") else int(num))
+                    continue
+                for word, value in _LITERALS.items():
+                    if text.startswith(word, i):
+                        i += len(word)
+                        self._scalar(value)
+                        break
+                else:
+                    if not final and any(w.startswith(text[i:]) for w in _LITERALS):
+                        break  # a literal cut by the chunk boundary
+                    raise self._error("Expecting value", i)
+        self._tail = text[i:]
+        self._consumed += i
+
+    def _scalar(self, value: Any) -> None:
+        self._attach(value)
+        if not self._stack:
+            self.done = True
+
+    def _string(self, i: int, final: bool) -> Optional[tuple]:
+        """(value, end) of the string starting at `i`, or None if it is not complete yet."""
+        try:
+            return scanstring(self._tail, i + 1)
+        except json.JSONDecodeError as e:
+            incomplete = e.msg.startswith("Unterminated string") or (
+                e.msg.startswith("Invalid \\uXXXX") and e.pos + 6 > len(self._tail)
+            )
+            if incomplete and not final:
+                return None
+            raise self._error(e.msg, e.pos)
+
+
+class FieldStream:
+    """
+    Consumer for a streamed extraction: feeds text deltas to an
+    IncrementalJSONParser, runs the format guardrails on every completed field
+    object at its path, and forwards each one to `on_partial` as
+    {"path", "value", "warnings", "elapsed_ms"}. All times are measured from
+    the start of the current request attempt.
+
+    Text before the first "{" (up to MAX_PREFIX_CHARS, e.g. a code fence) and
+    after the complete object (a closing fence) is skipped, as output repair
+    strips it. `feed` returns False once the output is no longer valid JSON,
+    so the caller can stop reading the response.
+    """
+
+    def __init__(self, on_partial: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.on_partial = on_partial
+        self.reset()
+
+    def reset(self) -> None:
+        """Start over (called before every attempt, so a retried request is parsed afresh)."""
+        self.parser = IncrementalJSONParser(self._on_value)
+        self.prefix = ""  # output before the JSON object, while it has not started
+        self.started = False
+        self.t0 = time.perf_counter()
+        self.first_delta_ms: Optional[float] = None
+        self.first_field_ms: Optional[float] = None
+        self.fields = 0
+        self.chunks = 0
+        self.warnings: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.error_at_char: Optional[int] = None
+        self.error_ms: Optional[float] = None
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.t0) * 1000.0, 3)
+
+    def _on_value(self, path: str, value: Any) -> None:
+        if not (isinstance(value, dict) and "value" in value):
+            return
+        elapsed = self._elapsed_ms()
+        if self.first_field_ms is None:
+            self.first_field_ms = elapsed
+        self.fields += 1
+        warnings = apply_guardrails_at(path, value)
+        self.warnings.extend(warnings)
+        if self.on_partial is not None:
+            self.on_partial({"path": path, "value": value.get("value"), "warnings": warnings, "elapsed_ms": elapsed})
+
+    def feed(self, delta: str) -> bool:
+        if self.error is not None:
+            return False
+        self.chunks += 1
+        if self.first_delta_ms is None:
+            self.first_delta_ms = self._elapsed_ms()
+        if self.parser.done:
+            return True  # trailing text after the object is left to json_parse / repair
+        if not self.started:
+            self.prefix += delta
+            start = self.prefix.find("{")
+            if start < 0:
+                if len(self.prefix) > MAX_PREFIX_CHARS:
+                    self.error = f"no JSON object in the first {MAX_PREFIX_CHARS} characters"
+                    self.error_at_char = len(self.prefix)
+                    self.error_ms = self._elapsed_ms()
+                    return False
+                return True
+            self.started = True
+            delta, self.prefix = self.prefix[start:], self.prefix[:start]
+        try:
+            self.parser.feed(delta)
+        except json.JSONDecodeError as e:
+            if self.parser.done:
+                return True  # the object closed earlier in this delta
+            self.error = f"JSONDecodeError: {e}"
+            self.error_at_char = len(self.prefix) + e.pos
+            self.error_ms = self._elapsed_ms()
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary for meta.streaming (times in ms since the request was sent)."""
+        return {
+            "first_delta_ms": self.first_delta_ms,
+            "first_field_ms": self.first_field_ms,
+            "fields_streamed": self.fields,
+            "chunks": self.chunks,
+            "chars": len(self.prefix) + self.parser.chars,
+            "prefix_chars": len(self.prefix),
+            "early_warnings": len(self.warnings),
+            "complete": self.parser.done,
+            "error": self.error,
+            "error_at_char": self.error_at_char,
+            "error_ms": self.error_ms,
+        }
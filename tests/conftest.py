@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# The modules in src/ import each other as top-level scripts (from main import ...);
+# bench/ holds the synthetic SDS generator some tests build inputs with.
+sys.path.insert(0, str(ROOT / "bench"))
+sys.path.insert(0, str(ROOT / "src"))
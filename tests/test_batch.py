@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+from openai import OpenAI
+
+from batch import collect_inputs, output_paths, percentile, run_batch, usage_summary
+from fake_llm import FakeLLMServer
+from main import Extractor
+
+
+def test_collect_inputs_from_dir_glob_and_manifest(tmp_path):
+    (tmp_path / "b.pdf").write_bytes(b"%PDF")
+    (tmp_path / "a.txt").write_text("x")
+    (tmp_path / "notes.md").write_text("x")
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / "c.pdf").write_bytes(b"%PDF")
+    assert [p.name for p in collect_inputs(str(tmp_path))] == ["a.txt", "b.pdf"]
+    assert [p.name for p in collect_inputs(str(tmp_path / "**" / "*.pdf"))] == ["b.pdf", "c.pdf"]
+    manifest = tmp_path / "inputs.lst"
+    manifest.write_text(f"# inputs\nsub/c.pdf\n\n{tmp_path / 'b.pdf'}\n")
+    assert collect_inputs(str(manifest)) == [sub / "c.pdf", tmp_path / "b.pdf"]
+    assert collect_inputs(str(tmp_path / "missing")) == []
+
+
+def test_collect_inputs_single_document(tmp_path):
+    pdf = tmp_path / "sds.PDF"
+    pdf.write_bytes(b"%PDF-1.4\n\xe2\xff binary")
+    assert collect_inputs(str(pdf)) == [pdf]
+    assert collect_inputs(str(tmp_path / "a.txt")) == []
+
+
+def test_output_paths_keep_duplicate_stems_apart(tmp_path):
+    outs = output_paths([Path("x/sds.pdf"), Path("y/sds.pdf"), Path("y/sds.txt"), Path("z/other.pdf")], tmp_path)
+    assert [p.name for p in outs] == ["sds.json", "sds__1.json", "sds__2.json", "other.json"]
+
+
+def test_percentile_nearest_rank():
+    values = [5.0, 1.0, 3.0, 2.0, 4.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 5.0
+    assert percentile(values, 0) == 1.0
+    assert percentile([], 50) is None
+
+
+def test_usage_summary_cached_share():
+    records = [
+        {"usage": {"requests": 1, "input_tokens": 1000, "output_tokens": 10, "cached_tokens": 250}},
+        {"usage": {"requests": 1, "input_tokens": 1000, "output_tokens": 10, "cached_tokens": 750}},
+        {"status": "failed"},
+    ]
+    usage = usage_summary(records)
+    assert usage["uncached_input_tokens"] == 1000
+    assert usage["cached_share"] == 0.5
+    assert usage_summary([])["cached_share"] is None
+
+
+def test_run_batch_against_fake_llm(tmp_path):
+    inputs = []
+    for i in range(3):
+        path = tmp_path / "in" / f"sds_{i}.txt"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f"SECTION 1: Identification\nProduct name: Solvent {i}\n")
+        inputs.append(path)
+    with FakeLLMServer() as srv:
+        extractor = Extractor(OpenAI(base_url=srv.base_url, api_key="fake"))
+        summary = run_batch(inputs, extractor, tmp_path / "out", concurrency=2)
+    assert (summary["documents"], summary["ok"], summary["failed"]) == (3, 3, 0)
+    assert summary["usage"]["requests"] == 3
+    written = json.loads((tmp_path / "out" / "sds_0.json").read_text())
+    assert written["meta"]["input_filename"] == "sds_0.txt"
+    assert json.loads((tmp_path / "out" / "batch_summary.json").read_text())["ok"] == 3
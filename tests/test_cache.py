@@ -0,0 +1,56 @@
+import os
+import time
+
+from cache import ExtractionCache, cache_key
+
+
+def _put(cache, i, size=100):
+    key = cache_key(f"{i:064x}")
+    cache.put(key, {"output_text": "x" * size})
+    return key
+
+
+def test_cache_key_depends_on_every_part():
+    assert cache_key("a" * 64, "v1", True) == cache_key("a" * 64, "v1", True)
+    assert cache_key("a" * 64, "v1", True) != cache_key("a" * 64, "v1", False)
+
+
+def test_get_counts_hits_and_misses(tmp_path):
+    cache = ExtractionCache(tmp_path)
+    key = _put(cache, 1)
+    assert cache.get(key)["output_text"] == "x" * 100
+    assert cache.get(cache_key("f" * 64)) is None
+    assert cache.counters() == {"hits": 1, "misses": 1}
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    cache = ExtractionCache(tmp_path, max_bytes=10**9)
+    keys = [_put(cache, i) for i in range(3)]
+    for n, key in enumerate(keys):
+        past = time.time() - 1000 + n
+        os.utime(cache._path(key), (past, past))
+    cache.get(keys[0])  # now the most recently used
+    cache.max_bytes = 2 * cache._path(keys[0]).stat().st_size
+    assert cache.evict() == {"expired": 0, "lru": 1}
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def test_drops_expired_entries(tmp_path):
+    cache = ExtractionCache(tmp_path, max_age_days=1)
+    key = _put(cache, 1)
+    past = time.time() - 2 * 86400
+    os.utime(cache._path(key), (past, past))
+    assert cache.evict()["expired"] == 1
+    assert cache.get(key) is None
+
+
+def test_page_text_cache_under_the_same_root_is_left_alone(tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    page_file = pages / f"{'a' * 64}.pypdf-5.0.json"
+    page_file.write_text("{}" + " " * 10_000)
+    cache = ExtractionCache(tmp_path, max_bytes=1, max_age_days=0)
+    _put(cache, 1)
+    assert page_file.exists()
+    assert cache._scan_size() < 10_000
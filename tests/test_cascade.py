@@ -0,0 +1,67 @@
+import copy
+
+from openai import OpenAI
+
+from cascade import escalate, escalation_candidates
+from fake_llm import DEFAULT_RESPONSE, FakeLLMServer
+from format_guardrails import apply_format_guardrails
+
+TEXT = (
+    "SECTION 1: Identification\nRevision date: 01-02-2024\n"
+    "SECTION 3: Composition/information on ingredients\nAcetone 67-64-1\nWater 7732-18-5\n"
+)
+
+
+def _f(value, confidence=0.95):
+    return {"value": value, "evidence": None, "confidence": confidence}
+
+
+def _answer(cas_values, revision_confidence=0.95):
+    doc = copy.deepcopy(DEFAULT_RESPONSE)
+    for group in ("document", "transport", "physical_chemical"):
+        for field in doc[group].values():
+            field["confidence"] = 0.95
+    doc["hazards"]["ghs_signal_word"]["confidence"] = 0.95
+    doc["document"]["revision_date"] = _f("01-02-2024", revision_confidence)
+    doc["composition"]["ingredients"] = [{"name": _f(f"item {i}"), "cas": _f(c)} for i, c in enumerate(cas_values)]
+    return doc
+
+
+def test_escalation_candidates_collect_low_confidence_and_guardrail_units():
+    parsed = _answer(["67-64-1", "7732-18", "64-17-5"], revision_confidence=0.4)
+    parsed["composition"]["ingredients"][2]["name"]["confidence"] = 0.1
+    reasons, total = escalation_candidates(parsed, apply_format_guardrails(copy.deepcopy(parsed)), 0.7)
+    assert reasons == {
+        "document.revision_date": ["low_confidence"],
+        "composition.ingredients[2]": ["low_confidence"],
+        "composition.ingredients[1]": ["cas_format"],
+    }
+    assert total == 11 + 3 + 3 + 4 + 1
+
+
+def test_escalation_candidates_treat_missing_confidence_as_low():
+    parsed = _answer([])
+    parsed["transport"]["un_number"]["confidence"] = "high"
+    assert escalation_candidates(parsed, [], 0.7)[0] == {"transport.un_number": ["low_confidence"]}
+
+
+def test_escalate_replaces_only_escalated_units():
+    parsed = _answer(["67-64-1", "7732-18"], revision_confidence=0.4)
+    strong = _answer(["67-64-1", "7732-18-5"])
+    strong["document"]["revision_date"]["value"] = "01-03-2024"
+    strong["document"]["product_name"] = _f("not asked for")
+    with FakeLLMServer(response=strong) as srv:
+        out, info = escalate(parsed, client=OpenAI(base_url=srv.base_url, api_key="fake"),
+                             text=TEXT, max_chars=10_000, model="strong")
+    assert out["document"]["revision_date"]["value"] == "01-03-2024"
+    assert out["composition"]["ingredients"][1]["cas"]["value"] == "7732-18-5"
+    assert out["document"]["product_name"]["value"] is None
+    assert sorted(info["replaced"]) == ["composition.ingredients[1]", "document.revision_date"]
+    assert info["kept"] == [] and info["requests"] == 1 and info["model"] == "strong"
+
+
+def test_escalate_without_candidates_makes_no_request():
+    parsed = _answer(["67-64-1"])
+    out, info = escalate(parsed, client=None, text=TEXT, max_chars=10_000)
+    assert out == _answer(["67-64-1"])
+    assert info["escalated"] == [] and info["requests"] == 0 and info["escalation_rate"] == 0.0
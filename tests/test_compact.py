@@ -0,0 +1,37 @@
+from compact import compact_pages, compact_text, repeated_lines
+
+
+def _page(n, body):
+    return f"ACME Solvent   Rev. 01-02-2024\n{body}\n\nPage {n} of 4"
+
+
+PAGES = [
+    _page(1, "SECTION 1: Identification\nHighly flamm-\nable liquid"),
+    _page(2, "SECTION 2: Hazards\nNo data available\nNo data available"),
+    _page(3, "SECTION 3: Composition\nnon-\nemergency use\nflammable"),
+    _page(4, "SECTION 4: First aid\nNo data available"),
+]
+
+
+def test_repeated_lines_ignore_digits_and_content_phrases():
+    keys = repeated_lines(PAGES)
+    assert keys == {"acme solvent rev. #-#-#", "page # of #"}
+    assert repeated_lines(PAGES[:2]) == set()
+
+
+def test_compact_text_collapses_spaces_and_dehyphenates_known_words():
+    text, joined, removed = compact_text("a   b\n\n\n\nflamm-\nable\nnon-\nemergency", {"flammable"})
+    assert text == "a b\n\nflammable\nnon-emergency"
+    assert (joined, removed) == (2, 3)
+
+
+def test_compact_pages_keeps_first_header_only():
+    out, stats = compact_pages(PAGES)
+    assert out[0].startswith("ACME Solvent Rev. 01-02-2024\n") and out[0].endswith("Page 1 of 4")
+    assert all("ACME" not in p and "Page" not in p for p in out[1:])
+    assert "Highly flammable liquid" in out[0]
+    assert "non-emergency" in out[2]
+    assert out[1].count("No data available") == 2
+    assert stats["boilerplate_lines"] == 2 and stats["boilerplate_lines_removed"] == 6
+    assert stats["chars_removed"] == stats["chars_before"] - stats["chars_after"] > 0
+    assert stats["dehyphenated"] == 2
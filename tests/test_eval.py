@@ -0,0 +1,78 @@
+import json
+
+import corpus_eval
+from corpus_eval import evaluate_corpus, pair_files, regressions
+from eval import align_lists, evaluate, field_name, item_keys
+
+
+def _f(value):
+    return {"value": value, "evidence": None, "confidence": 0.9}
+
+
+TRUTH = {
+    "document": {"product_name": _f("Acetone"), "product_code": _f(None)},
+    "composition": {"ingredients": [
+        {"name": _f("Acetone"), "cas": _f("67-64-1")},
+        {"name": _f("Water"), "cas": _f("7732-18-5")},
+    ]},
+}
+
+
+def test_field_name_drops_indices():
+    assert field_name("composition.ingredients[3].cas.value") == "composition.ingredients[].cas.value"
+
+
+def test_item_keys_normalize_cas_and_class():
+    assert item_keys({"cas": _f("67 - 64 - 1"), "name": _f(" Acetone ")}) == {"cas": "67-64-1", "name": "acetone"}
+    assert item_keys({"class": _f("Flam. Liq."), "category": _f("2")}) == {"class": "flam. liq.|2"}
+    assert item_keys({"cas": _f(None)}) == {}
+
+
+def test_align_lists_matches_reordered_items_and_reports_extras():
+    truth = TRUTH["composition"]["ingredients"]
+    extracted = [truth[1], {"name": _f("Ethanol")}, truth[0]]
+    pairs, extra = align_lists(truth, extracted)
+    assert pairs == [(0, 2), (1, 0)]
+    assert extra == [1]
+
+
+def test_evaluate_counts_correct_missing_and_hallucinated():
+    extracted = json.loads(json.dumps(TRUTH))
+    extracted["document"]["product_code"]["value"] = "X-1"  # truth is null
+    extracted["composition"]["ingredients"].reverse()
+    extracted["composition"]["ingredients"][0]["cas"]["value"] = "7732-18-6"
+    r = evaluate(extracted, TRUTH)
+    assert (r["fields_compared"], r["correct"]) == (18, 16)
+    assert r["hallucinated"] == ["document.product_code.value"]
+    assert r["missing"] == ["composition.ingredients[1].cas.value"]
+    assert r["fields"]["composition.ingredients[].cas.value"] == [1, 1, 1, 0]
+    assert evaluate(extracted, TRUTH, align=False)["correct"] < r["correct"]
+
+
+def _write(folder, name, obj):
+    folder.mkdir(exist_ok=True)
+    (folder / f"{name}.json").write_text(json.dumps(obj))
+
+
+def test_evaluate_corpus_aggregates_fields(tmp_path, monkeypatch):
+    out, truth = tmp_path / "out", tmp_path / "truth"
+    for i in range(5):
+        _write(truth, f"d{i}", TRUTH)
+        _write(out, f"d{i}", TRUTH if i else {"document": {"product_name": _f("Other")}})
+    _write(out, "batch_summary", {})
+    _write(out, "orphan", TRUTH)
+    pairs, unmatched = pair_files(out, truth)
+    assert len(pairs) == 5 and unmatched == [str(out / "orphan.json")]
+
+    monkeypatch.setattr(corpus_eval, "CHUNK_SIZE", 2)
+    report = evaluate_corpus(out, truth, workers=1)
+    assert report["documents"] == 5
+    i = report["fields"]["name"].index("document.product_name.value")
+    assert (report["fields"]["tp"][i], report["fields"]["fn"][i], report["fields"]["fp"][i]) == (4, 1, 1)
+    assert report["fields"]["recall"][i] == 80.0
+
+    baseline = dict(report, accuracy_micro=report["accuracy_micro"] + 5)
+    assert regressions(report, baseline, max_drop=1.0) == [
+        f"accuracy_micro {baseline['accuracy_micro']} -> {report['accuracy_micro']}"
+    ]
+    assert regressions(report, report, max_drop=0.0) == []
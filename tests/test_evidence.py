@@ -0,0 +1,52 @@
+import pytest
+
+from evidence import EvidenceIndex, evidence_warnings, iter_evidence, verify_evidence
+
+PAGE1 = "SAFETY DATA SHEET\nProduct name:   Acetone Solvent\nRevision date: 03-15-2024\n"
+PAGE2 = "SECTION 14\nUN number: UN1090\nHazard class 3 – flammable liquid\n"
+TEXT = PAGE1 + PAGE2
+
+
+@pytest.fixture
+def index():
+    return EvidenceIndex(TEXT, page_starts=[0, len(PAGE1)])
+
+
+@pytest.mark.parametrize(
+    "snippet",
+    [
+        "Product name: Acetone Solvent",  # whitespace collapsed
+        "product NAME: acetone",  # case
+        "class 3 - flammable",  # unicode dash
+        "me: Acetone Solv",  # first and last word cut mid-word
+        "Product name: ... UN1090",  # elided
+    ],
+)
+def test_locate_normalized_snippets(index, snippet):
+    assert index.locate(snippet) is not None
+
+
+def test_locate_returns_original_offset_and_page(index):
+    loc = index.locate("UN number: UN1090")
+    assert loc == {"offset": TEXT.index("UN number"), "page": 2}
+    assert index.locate("Acetone")["page"] == 1
+
+
+@pytest.mark.parametrize("snippet", ["Product name: Ethanol", "UN1090 ... Packing group II", "", "..."])
+def test_unknown_snippets_are_not_found(index, snippet):
+    assert index.locate(snippet) is None
+
+
+def test_verify_evidence_reports_missing_paths(index):
+    parsed = {
+        "document": {"product_name": {"value": "Acetone", "evidence": "Acetone Solvent"}},
+        "transport": {"un_number": {"value": "UN1090", "evidence": "UN number: UN2000"}},
+        "composition": {"ingredients": [{"cas": {"evidence": None}}]},
+        "meta": {"evidence": "ignored"},
+    }
+    assert [p for p, _ in iter_evidence(parsed)] == ["document.product_name.evidence", "transport.un_number.evidence"]
+    summary = verify_evidence(parsed, index)
+    assert (summary["checked"], summary["found"]) == (2, 1)
+    assert summary["not_found_fields"] == ["transport.un_number.evidence"]
+    warnings = evidence_warnings(parsed, summary)
+    assert [(w["field"], w["rule"]) for w in warnings] == [("transport.un_number.evidence", "evidence_not_found")]
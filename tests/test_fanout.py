@@ -0,0 +1,45 @@
+import copy
+
+from openai import OpenAI
+
+from fake_llm import DEFAULT_RESPONSE, FakeLLMServer
+from fanout import extract_fanout, group_texts, text_for_groups
+from prompts import SCHEMA_GROUPS
+
+TEXT = (
+    "ACME Corp  Revision date: 01-02-2024\n"
+    "SECTION 1: Identification\nProduct name: Solvent\n"
+    "SECTION 2: Hazards identification\nH225 Highly flammable\n"
+    "SECTION 3: Composition/information on ingredients\nAcetone 67-64-1\n"
+    "SECTION 9: Physical and chemical properties\nFlash point -20 C\n"
+    "SECTION 14: Transport information\nUN1090\n"
+)
+
+
+def test_group_texts_send_each_group_its_own_sections():
+    texts = group_texts(TEXT, 10_000)
+    assert texts["document"]["text"].startswith("ACME Corp") and "UN1090" not in texts["document"]["text"]
+    assert texts["transport"]["text"].strip().endswith("UN1090") and "Acetone" not in texts["transport"]["text"]
+    assert all(t["source"] == "sections" for t in texts.values())
+
+
+def test_group_texts_fall_back_to_clipped_full_text():
+    texts = group_texts("no headings at all " * 10, 50)
+    assert all(t["source"] == "full_text" and t["truncated"] and len(t["text"]) == 50 for t in texts.values())
+
+
+def test_text_for_groups_joins_sections_in_number_order():
+    body = text_for_groups(TEXT, ["transport", "hazards"], 10_000)
+    assert body.index("H225") < body.index("UN1090") and "Acetone" not in body
+    assert text_for_groups(TEXT.replace("SECTION 14: Transport information\n", ""), ["transport"], 40) == TEXT[:40]
+
+
+def test_extract_fanout_merges_in_schema_order_and_records_failed_groups():
+    response = copy.deepcopy(DEFAULT_RESPONSE)
+    del response["transport"]
+    with FakeLLMServer(response=response) as srv:
+        merged, stats = extract_fanout(OpenAI(base_url=srv.base_url, api_key="fake"), TEXT, "fake", 10_000)
+    assert list(merged) == [g for g in SCHEMA_GROUPS if g != "transport"] + ["meta"]
+    assert stats["failed_groups"] == ["transport"]
+    assert "no 'transport' object" in stats["groups"]["transport"]["error"]
+    assert merged["document"] == DEFAULT_RESPONSE["document"]
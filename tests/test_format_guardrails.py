@@ -0,0 +1,68 @@
+from format_guardrails import (
+    apply_format_guardrails,
+    apply_guardrails_at,
+    compile_rules,
+    normalize_cas,
+    validate_cas_value,
+    validate_us_date,
+)
+
+
+def _doc(cas_values, issue_date="01-31-2024", revision_date=None):
+    return {
+        "document": {
+            "issue_date": {"value": issue_date},
+            "revision_date": {"value": revision_date},
+        },
+        "composition": {"ingredients": [{"cas": {"value": c}} for c in cas_values]},
+    }
+
+
+def test_normalize_and_validate_cas():
+    assert normalize_cas(" 67 – 64 − 1 ") == "67-64-1"
+    assert normalize_cas("7732-18-5") == "7732-18-5"
+    assert validate_cas_value("7732-18-5")
+    assert not validate_cas_value("7732-18")
+
+
+def test_validate_us_date_checks_calendar():
+    assert validate_us_date("02-29-2024")
+    assert not validate_us_date("02-30-2024")
+    assert not validate_us_date("2024-01-31")
+
+
+def test_apply_format_guardrails_normalizes_and_warns():
+    doc = _doc(["67 - 64 - 1", "bad", "", None], revision_date="13-01-2024")
+    warnings = apply_format_guardrails(doc)
+    assert doc["composition"]["ingredients"][0]["cas"]["value"] == "67-64-1"
+    assert [(w["field"], w["rule"]) for w in warnings] == [
+        ("composition.ingredients[1].cas.value", "cas_format"),
+        ("document.revision_date.value", "date_format"),
+    ]
+    assert warnings[0]["value"] == "bad"
+
+
+def test_normalize_false_leaves_document_untouched():
+    doc = _doc(["67 - 64 - 1"])
+    assert apply_format_guardrails(doc, normalize=False) == []
+    assert doc["composition"]["ingredients"][0]["cas"]["value"] == "67 - 64 - 1"
+
+
+def test_apply_guardrails_at_matches_whole_document_paths():
+    doc = _doc(["7732-18-5", "x-1"])
+    whole = [w for w in apply_format_guardrails(doc) if w["rule"] == "cas_format"]
+    part = apply_guardrails_at("composition.ingredients[1].cas", doc["composition"]["ingredients"][1]["cas"])
+    assert part == whole
+    assert apply_guardrails_at("document.product_name", {"value": "anything"}) == []
+
+
+def test_compile_rules_custom_list_path():
+    check = compile_rules([{
+        "path": "tags[*]", "validate": str.isupper, "normalize": str.strip,
+        "rule": "upper", "message": "not upper",
+    }])
+    doc = {"tags": [" OK ", "no"]}
+    warnings = []
+    check(doc, (), warnings, True)
+    assert doc["tags"] == ["OK", "no"]
+    assert [w["field"] for w in warnings] == ["tags[1]"]
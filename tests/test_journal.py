@@ -0,0 +1,54 @@
+from journal import BatchJournal
+
+
+def _inputs(tmp_path, n=2):
+    inputs, outputs = [], []
+    for i in range(n):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text(f"document {i}")
+        inputs.append(path)
+        outputs.append(tmp_path / "out" / f"doc{i}.json")
+    return inputs, outputs
+
+
+def test_resume_skips_done_and_retries_failed(tmp_path):
+    inputs, outputs = _inputs(tmp_path)
+    with BatchJournal(tmp_path / "journal.sqlite") as journal:
+        todo, counts = journal.plan(inputs, outputs)
+        assert todo == [0, 1] and counts["new"] == 2
+        for path, out in zip(inputs, outputs):
+            journal.start(path)
+        outputs[0].parent.mkdir()
+        outputs[0].write_text("{}")
+        journal.finish(inputs[0], {"input": str(inputs[0]), "status": "ok"})
+        journal.finish(inputs[1], {"input": str(inputs[1]), "status": "failed", "error": "boom"})
+
+        todo, counts = journal.plan(inputs, outputs)
+        assert todo == [1]
+        assert counts == {"new": 0, "retry": 1, "done": 1, "exhausted": 0}
+        assert journal.records()[str(inputs[1])]["error"] == "boom"
+
+
+def test_changed_content_is_new_again(tmp_path):
+    inputs, outputs = _inputs(tmp_path, 1)
+    with BatchJournal(tmp_path / "journal.sqlite") as journal:
+        journal.plan(inputs, outputs)
+        journal.start(inputs[0])
+        outputs[0].parent.mkdir()
+        outputs[0].write_text("{}")
+        journal.finish(inputs[0], {"input": str(inputs[0]), "status": "ok"})
+        inputs[0].write_text("revised document")
+        todo, counts = journal.plan(inputs, outputs)
+        assert todo == [0] and counts["new"] == 1
+
+
+def test_document_left_in_flight_is_capped(tmp_path):
+    inputs, outputs = _inputs(tmp_path, 1)
+    with BatchJournal(tmp_path / "journal.sqlite", max_attempts=2) as journal:
+        for _ in range(2):
+            todo, _ = journal.plan(inputs, outputs)
+            assert todo == [0]
+            journal.start(inputs[0])  # the worker dies before finish()
+        todo, counts = journal.plan(inputs, outputs)
+        assert todo == []
+        assert counts["exhausted"] == 1
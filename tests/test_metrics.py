@@ -0,0 +1,57 @@
+import json
+import time
+
+from metrics import MetricsSink, StageTimer, metrics_record
+
+
+def test_stage_timer_accumulates_repeated_stages():
+    timer = StageTimer()
+    for _ in range(2):
+        with timer.stage("llm_call"):
+            time.sleep(0.01)
+    timer.record("first_field", 12.3456)
+    d = timer.as_dict()
+    assert d["first_field_ms"] == 12.346
+    assert d["llm_call_ms"] >= 20.0
+    assert set(d) == {"llm_call_ms", "first_field_ms", "total_ms"}
+    assert d["total_ms"] >= d["llm_call_ms"]
+
+
+def _record(status="ok", llm_ms=300.0):
+    return {
+        "input": "a.pdf",
+        "status": status,
+        "timings_ms": {"llm_call_ms": llm_ms, "total_ms": llm_ms + 5},
+        "usage": {"input_tokens": 100, "output_tokens": 20, "cached_tokens": 64},
+    }
+
+
+def test_jsonl_sink_appends_one_record_per_document(tmp_path):
+    sink = MetricsSink(tmp_path / "m.jsonl")
+    sink.record(_record())
+    sink.record(_record("invalid_json"))
+    lines = (tmp_path / "m.jsonl").read_text().splitlines()
+    assert [json.loads(line)["status"] for line in lines] == ["ok", "invalid_json"]
+
+
+def test_prometheus_sink_writes_cumulative_histograms_and_counters(tmp_path):
+    sink = MetricsSink(tmp_path / "m.prom")
+    sink.record(_record(llm_ms=300.0))
+    sink.record(_record(llm_ms=3000.0))
+    text = (tmp_path / "m.prom").read_text()
+    assert 'sds_stage_duration_seconds_bucket{stage="llm_call",le="0.5"} 1' in text
+    assert 'sds_stage_duration_seconds_bucket{stage="llm_call",le="5.0"} 2' in text
+    assert 'sds_stage_duration_seconds_count{stage="llm_call"} 2' in text
+    assert 'sds_llm_tokens_total{kind="cached"} 128' in text
+    assert 'sds_documents_total{status="ok"} 2' in text
+
+
+def test_metrics_record_flattens_a_result():
+    result = {
+        "parsed": {"meta": {"input_filename": "x.pdf", "run_id": "r", "cache": {"hit": True}}},
+        "timings_ms": {"total_ms": 1.0},
+        "usage": {"requests": 0},
+    }
+    rec = metrics_record(result)
+    assert (rec["input"], rec["status"], rec["cache_hit"]) == ("x.pdf", "ok", True)
+    assert metrics_record({"parsed": None}, "y.pdf")["status"] == "invalid_json"
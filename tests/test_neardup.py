@@ -0,0 +1,67 @@
+import json
+import random
+
+import pytest
+
+import neardup
+from fake_llm import DEFAULT_RESPONSE
+from main import finalize_output
+from neardup import NearDuplicateIndex, reusable_groups, section_hashes, shingles, signature, similarity
+from synthetic_sds import synthetic_pages, synthetic_truth
+
+
+def _text(seed, name=None):
+    rng = random.Random(seed)
+    truth = synthetic_truth(rng, ingredients=5, statements=3)
+    if name is not None:
+        truth["document"]["product_name"]["value"] = name
+    return "\n".join(synthetic_pages(rng, truth, 6))
+
+
+def test_shingles_ignore_case_punctuation_and_short_texts():
+    assert shingles("Flash point: -20 C, closed cup") == shingles("flash POINT -20 c closed cup")
+    assert len(shingles("one two")) == 1
+
+
+def test_signature_without_numpy_is_identical(monkeypatch):
+    if neardup.np is None:
+        pytest.skip("numpy not installed")
+    text = _text(1)
+    fast = signature(text)
+    monkeypatch.setattr(neardup, "np", None)
+    assert signature(text) == fast and len(fast) == neardup.NUM_PERM
+
+
+def test_similarity_separates_near_duplicates_from_other_documents():
+    base = signature(_text(1))
+    assert similarity(base, signature(_text(1, name="Other Brand 123"))) > 0.9
+    assert similarity(base, signature(_text(2))) < 0.5
+
+
+def test_index_returns_best_match_above_threshold(tmp_path):
+    original, renamed, other = _text(1), _text(1, name="Other Brand 123"), _text(2)
+    with NearDuplicateIndex(tmp_path / "nd.sqlite") as index:
+        index.add("a.pdf", "sha-a", signature(original), section_hashes(original, 50_000),
+                  {**DEFAULT_RESPONSE, "meta": {"x": 1}})
+        index.add("b.pdf", "sha-b", signature(other), section_hashes(other, 50_000))
+        match = index.query(signature(renamed))
+        assert match["source"] == "a.pdf" and match["similarity"] >= index.threshold
+        assert "meta" not in match["result"] and match["result"]["hazards"] == DEFAULT_RESPONSE["hazards"]
+        assert index.query(signature(original), exclude_sha256="sha-a") is None
+        assert index.contains("sha-b") and index.count() == 2
+
+
+def test_reusable_groups_skip_changed_sections_and_missing_results():
+    original, renamed = _text(1), _text(1, name="Other Brand 123")
+    match = {"sections": section_hashes(original, 50_000), "result": {"document": {}, "hazards": {}, "transport": {}}}
+    assert reusable_groups(match, section_hashes(renamed, 50_000)) == ["transport", "hazards"]
+    assert reusable_groups({"sections": match["sections"], "result": None}, match["sections"]) == []
+
+
+def test_failed_reextraction_gets_its_own_warning():
+    info = {"reused_groups": ["document"], "reextracted_groups": ["hazards"], "missing_groups": ["hazards"]}
+    stats = {"mode": "near_duplicate", "total_chars": 10, "sent_chars": 5, "truncated": False, "near_duplicate": info}
+    answer = {g: v for g, v in DEFAULT_RESPONSE.items() if g != "hazards"}
+    parsed = finalize_output(json.dumps(answer), run_id="r", run_ts="t", input_filename="x.pdf", stats=stats)
+    warnings = [w for w in parsed["meta"]["validation_warnings"] if w["field"] == "hazards"]
+    assert [w["rule"] for w in warnings] == ["reextract_failed"]
@@ -0,0 +1,78 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from cache import ExtractionCache, sha256_bytes
+from fake_llm import DEFAULT_RESPONSE, response_object
+from main import Extractor, extraction_cache_key
+from openai_batch import STATE_FILENAME, ingest, input_fingerprint, run_openai_batch
+
+
+class _Files:
+    def __init__(self, data):
+        self.data = data
+
+    def content(self, file_id):
+        return SimpleNamespace(text=self.data[file_id])
+
+
+def _ingest(tmp_path, outputs):
+    lines, documents = [], {}
+    for i, text in enumerate(outputs):
+        source = tmp_path / f"doc{i}.txt"
+        source.write_text(f"SECTION 1: Identification\nProduct name: Solvent {i}\n", encoding="utf-8")
+        custom_id = sha256_bytes(source.read_bytes())
+        documents[custom_id] = {
+            "inputs": [{"path": str(source), "output": str(tmp_path / f"doc{i}.json")}],
+            "stats": {"mode": "single", "total_chars": 10, "sent_chars": 10, "truncated": False},
+        }
+        lines.append(json.dumps({
+            "custom_id": custom_id,
+            "response": {"status_code": 200, "body": response_object(text, "fake", 10)},
+            "error": None,
+        }))
+    client = SimpleNamespace(files=_Files({"out": "\n".join(lines)}))
+    batch = SimpleNamespace(id="batch_1", output_file_id="out", error_file_id=None)
+    cache = ExtractionCache(tmp_path / "cache")
+    extractor = Extractor(client=client, cache=cache)
+    records = ingest(client, batch, {"documents": documents}, extractor)
+    keys = [
+        extraction_cache_key(cid, extractor.early_stop, extractor.segment, pre_extract=extractor.pre_extract,
+                             compact=extractor.compact)
+        for cid in documents
+    ]
+    return records, [cache.get(k) for k in keys]
+
+
+def test_ingest_caches_only_complete_answers(tmp_path):
+    complete = json.dumps(DEFAULT_RESPONSE)
+    truncated = complete[: len(complete) // 2]
+    records, cached = _ingest(tmp_path, [complete, truncated, "not json"])
+    assert [r["status"] for r in records] == ["ok", "invalid_json", "invalid_json"]
+    assert [entry is not None for entry in cached] == [True, False, False]
+
+
+def test_ingest_verifies_evidence_and_caches_the_result(tmp_path):
+    answer = json.loads(json.dumps(DEFAULT_RESPONSE))
+    answer["document"]["product_name"] = {"value": "Solvent 0", "evidence": "Product name: Solvent 0", "confidence": 0.9}
+    answer["document"]["product_code"] = {"value": "X", "evidence": "Product code: X", "confidence": 0.9}
+    records, cached = _ingest(tmp_path, [json.dumps(answer)])
+    meta = json.loads((tmp_path / "doc0.json").read_text())["meta"]
+    assert "evidence" in meta
+    assert [w["field"] for w in meta["validation_warnings"] if w["rule"] == "evidence_not_found"] == [
+        "document.product_code.evidence"]
+    assert cached[0]["stats"]["evidence"] == meta["evidence"]
+
+
+def test_resume_refuses_state_for_other_inputs(tmp_path):
+    inputs = [tmp_path / "a.txt", tmp_path / "b.txt"]
+    for p in inputs:
+        p.write_text(p.name, encoding="utf-8")
+    extractor = Extractor(client=SimpleNamespace())
+    state = {"batch_id": "batch_1", "fingerprint": input_fingerprint(inputs[:1], extractor), "ingested": False}
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    (out_dir / STATE_FILENAME).write_text(json.dumps(state), encoding="utf-8")
+    with pytest.raises(RuntimeError, match="other inputs or options"):
+        run_openai_batch(inputs, extractor, out_dir)
@@ -0,0 +1,71 @@
+import os
+import random
+
+import pytest
+
+from pdf_text import PageTextCache, read_pdf_pages
+from sections import SECTION_TITLES
+from synthetic_sds import synthetic_pages, synthetic_truth, write_pdf
+
+
+def _pages():
+    rng = random.Random(3)
+    return synthetic_pages(rng, synthetic_truth(rng, 4, 3), 20)
+
+
+@pytest.fixture
+def sds_pdf(tmp_path):
+    path = tmp_path / "sds.pdf"
+    write_pdf(_pages(), path)
+    return path
+
+
+def test_page_cache_round_trip(tmp_path):
+    cache = PageTextCache(tmp_path / "pages")
+    assert cache.load("a" * 64) == (None, {})
+    cache.store("a" * 64, 3, {2: "third", 0: "first"})
+    assert cache.load("a" * 64) == (3, {0: "first", 2: "third"})
+
+
+def test_page_cache_evicts_least_recently_used_files(tmp_path):
+    cache = PageTextCache(tmp_path / "pages", max_bytes=400)
+    for n, sha in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+        cache.store(sha, 1, {0: "x" * 80})
+        os.utime(cache._path(sha), (1000 + n, 1000 + n))
+    cache.load("a" * 64)  # refreshes a: b is now the oldest
+    cache.store("d" * 64, 1, {0: "x" * 80})
+    assert cache.load("b" * 64) == (None, {})
+    assert cache.load("a" * 64)[0] == 1 and cache.load("d" * 64)[0] == 1
+    assert sum(p.stat().st_size for p in (tmp_path / "pages").glob("*.json")) <= 400
+
+
+def test_second_read_comes_from_the_page_cache(sds_pdf, tmp_path):
+    cache = PageTextCache(tmp_path / "pages")
+    first, stats1 = read_pdf_pages(sds_pdf, page_cache=cache)
+    second, stats2 = read_pdf_pages(sds_pdf, page_cache=cache)
+    assert first == second
+    assert stats1["pages_extracted"] == stats1["pages_total"] == 20
+    assert (stats2["pages_extracted"], stats2["pages_cached"]) == (0, 20)
+
+
+def test_parallel_extraction_matches_serial(sds_pdf):
+    serial, _ = read_pdf_pages(sds_pdf, workers=1)
+    parallel, stats = read_pdf_pages(sds_pdf, workers=2, parallel_min_pages=2)
+    assert stats["parallel"]
+    assert parallel == serial
+
+
+def test_early_stop_after_section_14(sds_pdf):
+    pages, stats = read_pdf_pages(sds_pdf, early_stop=True)
+    full, _ = read_pdf_pages(sds_pdf)
+    assert stats["early_stopped"]
+    assert pages == full[: len(pages)] and len(pages) < len(full)
+    assert len(pages) == 19  # the page with the Section 15 heading, not Section 16's
+
+
+def test_early_stop_ignores_a_table_of_contents(tmp_path):
+    toc = "Contents\n" + "\n".join(f"{n}. {title} .... {n}" for n, title in SECTION_TITLES.items())
+    path = tmp_path / "toc.pdf"
+    write_pdf([toc] + _pages(), path)
+    pages, stats = read_pdf_pages(path, early_stop=True)
+    assert stats["early_stopped"] and len(pages) == 20
@@ -0,0 +1,64 @@
+import pytest
+
+from preextract import cas_check_digit_ok, fill_resolved, hints_text, normalize_date, pre_extract, scan
+
+SDS = (
+    "ACME Corp\nRevision date: 03/15/2024\nPrinting date: 01/02/2025\n"
+    "SECTION 1: Identification\nProduct name: Solvent\n"
+    "SECTION 2: Hazards identification\nSignal word: Danger\nH225 Highly flammable. H319 + H335\nP210\n"
+    "SECTION 3: Composition/information on ingredients\nAcetone 67-64-1 50-100%\nBad 67-64-2\n"
+    "SECTION 9: Physical and chemical properties\nUN1234 in the wrong section\n"
+    "SECTION 14: Transport information\nUN number: 1090\nHazard class: 3\nPacking group: II\n"
+)
+
+
+@pytest.mark.parametrize("cas, ok", [("67-64-1", True), ("7732-18-5", True), ("67-64-2", False), ("50-00-0", True)])
+def test_cas_check_digit(cas, ok):
+    assert cas_check_digit_ok(cas) is ok
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("15 March 2024", "03-15-2024"),
+        ("Mar. 15, 2024", "03-15-2024"),
+        ("2024-03-15", "03-15-2024"),
+        ("15/03/2024", "03-15-2024"),
+        ("03/15/2024", "03-15-2024"),
+        ("03/04/2024", None),  # day and month cannot be told apart
+        ("31/02/2024", None),
+    ],
+)
+def test_normalize_date(value, expected):
+    assert normalize_date(value) == expected
+
+
+def test_scan_finds_candidates_in_their_sections_only():
+    found = scan(SDS)
+    assert [c["value"] for c in found["cas"]] == ["67-64-1"]
+    assert [c["value"] for c in found["un_number"]] == ["UN1090"]
+    assert found["hazard_codes"][1]["value"] == "H319+H335"
+    assert found["signal_word"][0]["evidence"] == "Signal word: Danger"
+    assert found["un_number"][0]["section"] == 14
+
+
+def test_pre_extract_resolves_single_valued_fields():
+    info = pre_extract(SDS, "skip")
+    assert info["resolved"]["transport.un_number"]["value"] == "UN1090"
+    assert info["resolved"]["document.revision_date"]["value"] == "03-15-2024"
+    assert info["skipped_fields"] == info["fields_resolved"]
+    assert "hazards.ghs_signal_word" in info["fields_resolved"]
+    assert pre_extract(SDS, "hints")["skipped_fields"] == []
+
+
+def test_conflicting_candidates_stay_with_the_model():
+    info = pre_extract(SDS.replace("Packing group: II", "Packing group: II\nPG III"), "skip")
+    assert "transport.packing_group" not in info["resolved"]
+    assert "packing_group: II, III" in hints_text(info)
+
+
+def test_fill_resolved_writes_skipped_fields():
+    info = pre_extract(SDS, "skip")
+    parsed = {"transport": {}}
+    fill_resolved(parsed, info)
+    assert parsed["transport"]["hazard_class"] == {"value": "3", "evidence": "Hazard class: 3", "confidence": 1.0}
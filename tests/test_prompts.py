@@ -0,0 +1,50 @@
+from openai import OpenAI
+
+from fake_llm import CACHE_BLOCK_TOKENS, CACHE_MIN_TOKENS, FakeLLMServer, PrefixCache
+from prompts import RULES, SYSTEM, USER_PREFIX, group_prompt, user_prompt
+
+
+def _common_prefix(a: str, b: str) -> str:
+    n = 0
+    while n < min(len(a), len(b)) and a[n] == b[n]:
+        n += 1
+    return a[:n]
+
+
+def test_user_prompt_puts_the_document_text_last():
+    prompt = user_prompt("SECTION 1: Identification", hints="HINTS\n")
+    assert prompt.startswith(USER_PREFIX)
+    assert prompt.endswith('SECTION 1: Identification\n"""\nHINTS\n')
+    assert "Return JSON with this exact structure" in USER_PREFIX and RULES not in prompt[len(USER_PREFIX):]
+
+
+def test_static_prefix_is_shared_across_documents():
+    omit = ("document.product_color",)
+    a, b = user_prompt("first doc", omit=omit), user_prompt("second doc", omit=omit)
+    assert _common_prefix(a, b) == a[: a.index("first doc")]
+    assert '"product_color"' not in a and not a.startswith(USER_PREFIX)
+    g1, g2 = group_prompt("alpha", ["hazards", "document"]), group_prompt("beta", ["document", "hazards"])
+    assert g1[: g1.index("alpha")] == g2[: g2.index("beta")]
+    assert "groups only: document, hazards." in g1
+
+
+def test_prefix_cache_matches_in_blocks_above_the_minimum():
+    cache = PrefixCache()
+    assert cache.lookup("m", "x" * (CACHE_MIN_TOKENS * 4 - 4)) == 0
+    prompt = "p" * (CACHE_MIN_TOKENS + 3 * CACHE_BLOCK_TOKENS + 10) * 4
+    assert cache.lookup("m", prompt) == 0
+    assert cache.lookup("m", prompt) == CACHE_MIN_TOKENS + 3 * CACHE_BLOCK_TOKENS
+    edited = prompt[: (CACHE_MIN_TOKENS + CACHE_BLOCK_TOKENS + 5) * 4] + "q" * 4000
+    assert cache.lookup("m", edited) == CACHE_MIN_TOKENS + CACHE_BLOCK_TOKENS
+    assert cache.lookup("other-model", prompt) == 0
+
+
+def test_fake_server_reports_cached_tokens_for_the_shared_prefix():
+    cached = []
+    with FakeLLMServer(prefix_cache=True) as srv:
+        client = OpenAI(base_url=srv.base_url, api_key="fake")
+        for text in ("first document text", "second document text"):
+            resp = client.responses.create(model="fake", input=[
+                {"role": "system", "content": SYSTEM}, {"role": "user", "content": user_prompt(text)}])
+            cached.append(resp.usage.input_tokens_details.cached_tokens)
+    assert cached[0] == 0 and cached[1] >= CACHE_MIN_TOKENS
@@ -0,0 +1,58 @@
+import json
+
+from openai import OpenAI
+
+from fake_llm import DEFAULT_RESPONSE, FakeLLMServer
+from prompts import SCHEMA_GROUPS
+from repair import local_repair, missing_groups, needs_repair, repair_output, repair_warnings
+
+FULL = json.dumps(DEFAULT_RESPONSE)
+TEXT = (
+    "SECTION 1: Identification\nProduct name: Solvent\n"
+    "SECTION 2: Hazards identification\nH225 Highly flammable\n"
+    "SECTION 14: Transport information\nUN1090\n"
+)
+
+
+def test_missing_groups_and_needs_repair():
+    assert missing_groups([]) == list(SCHEMA_GROUPS)
+    assert missing_groups({**DEFAULT_RESPONSE, "hazards": None}) == ["hazards"]
+    assert not needs_repair(FULL)
+    assert needs_repair(FULL[:-1])
+    assert needs_repair("{}")
+
+
+def test_local_repair_strips_fences_prose_and_trailing_commas():
+    obj, actions = local_repair('```json\nHere you go: {"a": [1, 2,], "b": "x,]",}\n```')
+    assert obj == {"a": [1, 2], "b": "x,]"}
+    assert actions == ["strip_code_fences", "strip_leading_text", "remove_trailing_commas"]
+    assert local_repair(FULL + "\nHope this helps!") == (DEFAULT_RESPONSE, ["strip_trailing_text"])
+    assert local_repair(FULL) == (DEFAULT_RESPONSE, [])
+
+
+def test_local_repair_keeps_complete_groups_of_cut_off_output():
+    cut = FULL[: FULL.index('"hazards"') + 20]
+    obj, actions = local_repair(cut)
+    assert actions == ["truncate_to_complete_groups"]
+    assert missing_groups(obj) == ["hazards"]
+    assert obj["transport"] == DEFAULT_RESPONSE["transport"]
+    assert local_repair("not json at all") == (None, [])
+
+
+def test_repair_output_rerequests_only_missing_groups():
+    cut = FULL[: FULL.index('"hazards"') + 20]
+    with FakeLLMServer(response=DEFAULT_RESPONSE) as srv:
+        client = OpenAI(base_url=srv.base_url, api_key="fake")
+        obj, info = repair_output(cut, client=client, text=TEXT, model="fake",
+                                  max_chars=10_000, full_rerun_tokens=5000)
+    assert obj == {g: DEFAULT_RESPONSE[g] for g in DEFAULT_RESPONSE if g != "meta"}
+    assert info["repaired"] and info["requests"] == 1
+    assert info["rerequested_groups"] == ["hazards"] and info["failed_groups"] == []
+    assert info["tokens_saved_est"] == 5000 - info["input_tokens"] - info["output_tokens"]
+    assert info["chars_sent"] == len("SECTION 2: Hazards identification\nH225 Highly flammable\n")
+
+
+def test_repair_output_without_client_reports_missing_groups():
+    obj, info = repair_output('{"document": {}}', client=None, text=TEXT, model="fake", max_chars=100)
+    assert obj == {"document": {}} and not info["repaired"] and info["requests"] == 0
+    assert [w["field"] for w in repair_warnings(info)] == [g for g in SCHEMA_GROUPS if g != "document"]
@@ -0,0 +1,91 @@
+import copy
+import random
+
+import pytest
+from openai import OpenAI
+
+from bench_incremental import revision_pair
+from eval import evaluate
+from fake_llm import DEFAULT_RESPONSE, FakeLLMServer
+from main import Extractor
+from synthetic_sds import model_response, write_pdf
+from revisions import RevisionStore, carried_groups, changed_sections, result_keys, section_fingerprints, text_keys
+
+REV1 = (
+    "ACME Corp  Revision date: 01-02-2024\n"
+    "SECTION 1: Identification\nProduct name: Solvent Blend 42\nProduct code: SB-1042\n"
+    "SECTION 2: Hazards identification\nH225 Highly flammable\n"
+    "SECTION 3: Composition/information on ingredients\nAcetone 67-64-1\n"
+    "SECTION 9: Physical and chemical properties\nFlash point -20 C\n"
+    "SECTION 14: Transport information\nUN1090\n"
+)
+REV2 = REV1.replace("01-02-2024", "03-04-2025").replace("H225 Highly flammable", "H225  HIGHLY flammable\nH319")
+
+
+def test_text_keys_prefer_product_code():
+    assert text_keys(REV1) == ["code:SB1042", "name:SOLVENTBLEND42"]
+    assert text_keys("nothing here") == []
+
+
+def test_result_keys_from_extraction():
+    parsed = {"document": {"product_code": {"value": "sb-1042"}, "product_name": {"value": "x"}}}
+    assert result_keys(parsed) == ["code:SB1042"]
+    assert result_keys({}) == []
+
+
+def test_changed_sections_ignore_whitespace_and_case_only_edits():
+    before, after = section_fingerprints(REV1), section_fingerprints(REV2)
+    assert changed_sections(before, after) == [0, 2]
+    assert changed_sections(before, section_fingerprints(REV1.replace("H225  ", "h225 "))) == []
+    assert changed_sections(before, {k: v for k, v in before.items() if k != "9"}) == [9]
+
+
+def test_carried_groups_need_all_source_sections_unchanged():
+    fingerprints = section_fingerprints(REV2)
+    result = {g: {} for g in ("document", "transport", "composition", "physical_chemical", "hazards")}
+    assert carried_groups(result, [0, 2], fingerprints) == ["transport", "composition", "physical_chemical"]
+    assert carried_groups(result, [], {k: v for k, v in fingerprints.items() if k != "14"}) == [
+        "document", "composition", "physical_chemical", "hazards"]
+    assert carried_groups(result, [], {}) == []
+
+
+def test_store_finds_latest_other_revision_by_first_known_key(tmp_path):
+    parsed = copy.deepcopy(DEFAULT_RESPONSE)
+    parsed["document"]["revision_date"]["value"] = "01-02-2024"
+    with RevisionStore(tmp_path / "rev.sqlite") as store:
+        store.add("v1.pdf", "sha-1", ["name:SOLVENTBLEND42"], section_fingerprints(REV1), parsed)
+        store.add("v1-copy.pdf", "sha-1", ["name:SOLVENTBLEND42"], {}, parsed)  # same file: ignored
+        prev = store.find(["code:SB1042", "name:SOLVENTBLEND42"], exclude_sha256="sha-2")
+        assert prev["source"] == "v1.pdf" and prev["matched_on"] == "name"
+        assert prev["revision_date"] == "01-02-2024" and "meta" not in prev["result"]
+        assert prev["sections"] == section_fingerprints(REV1)
+        assert store.find(["name:SOLVENTBLEND42"], exclude_sha256="sha-1") is None
+
+
+def _without_meta(parsed):
+    return {k: v for k, v in parsed.items() if k != "meta"}
+
+
+@pytest.fixture
+def revisions_pdf(tmp_path):
+    pages1, truth1, pages2, truth2 = revision_pair(random.Random(5), 8)
+    write_pdf(pages1, tmp_path / "rev1.pdf")
+    write_pdf(pages2, tmp_path / "rev2.pdf")
+    return tmp_path / "rev1.pdf", truth1, tmp_path / "rev2.pdf", truth2
+
+
+def test_incremental_output_matches_a_full_rerun(revisions_pdf, tmp_path):
+    rev1, truth1, rev2, truth2 = revisions_pdf
+    with RevisionStore(tmp_path / "rev.sqlite") as store:
+        with FakeLLMServer(response=model_response(truth1)) as srv:
+            Extractor(OpenAI(base_url=srv.base_url, api_key="fake"), revisions=store).extract(rev1)
+        with FakeLLMServer(response=model_response(truth2)) as srv:
+            client = OpenAI(base_url=srv.base_url, api_key="fake")
+            full = Extractor(client).extract(rev2)
+            inc = Extractor(client, revisions=store).extract(rev2)
+    info = inc["parsed"]["meta"]["incremental"]
+    assert info["reextracted_groups"] == ["document", "hazards"] and info["missing_groups"] == []
+    assert sorted(info["carried_groups"]) == ["composition", "physical_chemical", "transport"]
+    result = evaluate(_without_meta(inc["parsed"]), _without_meta(full["parsed"]))
+    assert result["accuracy"] == 100.0 and not result["missing"] and not result["hallucinated"]
+    assert inc["usage"]["input_tokens"] < full["usage"]["input_tokens"]
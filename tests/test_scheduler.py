@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from scheduler import RequestScheduler, TokenBucket, parse_duration
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3.5s", 3723.5), ("2.5", 2.5), ("", None), ("soon", None)],
+)
+def test_parse_duration(value, seconds):
+    if seconds is None:
+        assert parse_duration(value) is None
+    else:
+        assert parse_duration(value) == pytest.approx(seconds)
+
+
+def test_bucket_admits_oversized_request_when_full():
+    bucket = TokenBucket(per_minute=100)
+    assert bucket.acquire(500) < 0.1
+    assert bucket._tokens == pytest.approx(-400, abs=1)
+
+
+def test_unlimited_bucket_never_waits():
+    assert TokenBucket(None).acquire(10**9) == 0.0
+
+
+def _rate_limit_error():
+    # Built without an HTTP response object: the scheduler only reads status and headers.
+    error = openai.RateLimitError.__new__(openai.RateLimitError)
+    error.status_code = 429
+    error.response = SimpleNamespace(headers={"retry-after-ms": "0"})
+    return error
+
+
+def test_failed_attempts_are_not_charged_to_the_token_budget():
+    scheduler = RequestScheduler(tpm=1_000_000, base_delay=0.0)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 4:
+            raise _rate_limit_error()
+        return "ok", {}, 2_000
+
+    full = scheduler.tokens._tokens
+    assert scheduler.call(fn, estimated_input_tokens=10_000) == "ok"
+    assert len(attempts) == 4
+    # Only the successful attempt's actual usage is spent (plus a few ms of refill).
+    assert full - scheduler.tokens._tokens == pytest.approx(2_000, abs=500)
+    m = scheduler.metrics()
+    assert (m["retries"], m["rate_limited"], m["succeeded"]) == (3, 3, 1)
+
+
+def test_failures_after_the_request_reached_the_model_keep_their_charge():
+    scheduler = RequestScheduler(tpm=1_000_000, max_retries=1, base_delay=0.0)
+    timeout = openai.APITimeoutError.__new__(openai.APITimeoutError)
+
+    def fn():
+        raise timeout
+
+    full = scheduler.tokens._tokens
+    with pytest.raises(openai.APITimeoutError):
+        scheduler.call(fn, estimated_input_tokens=10_000)
+    # Both attempts are charged their estimate.
+    assert full - scheduler.tokens._tokens == pytest.approx(2 * 11_500, abs=500)
+    assert scheduler.metrics()["failed"] == 1
+
+
+def test_first_reported_limit_does_not_start_an_empty_bucket():
+    scheduler = RequestScheduler()
+    scheduler.observe_headers({"x-ratelimit-limit-tokens": "200000"})
+    assert scheduler.tokens.per_minute == 200_000
+    assert scheduler.tokens.acquire(16_000) < 0.1
+    scheduler.observe_headers({"x-ratelimit-limit-requests": "500", "x-ratelimit-remaining-requests": "10"})
+    assert scheduler.requests._tokens == pytest.approx(10, abs=1)
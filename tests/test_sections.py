@@ -0,0 +1,44 @@
+from sections import SCHEMA_SECTIONS, find_headings, section_numbers_in, select_sections, split_sections
+
+TITLES = {
+    1: "Identification", 2: "Hazard(s) identification", 3: "Composition/information on ingredients",
+    4: "First-aid measures", 9: "Physical and chemical properties", 14: "Transport information",
+    15: "Regulatory information",
+}
+
+
+def _sds(numbers, header="ACME SDS  Revision date: 01-02-2024\n"):
+    return header + "".join(f"SECTION {n}: {TITLES[n]}\nbody of section {n}\n" for n in numbers)
+
+
+def test_heading_forms():
+    text = "Section 9. Physical and chemical properties\n14. Transport information\n14 1263 3 II\n"
+    assert [n for n, _, _ in find_headings(text)] == [9, 14]
+
+
+def test_bare_numbers_and_wrong_titles_are_not_headings():
+    assert find_headings("3 Acetone 67-64-1 50-100\n2: something unrelated\n") == []
+
+
+def test_split_keeps_preamble_and_joins_repeated_headings():
+    text = _sds([1, 2]) + "SECTION 2: Hazard(s) identification (continued)\nmore of 2\n"
+    sections = split_sections(text)
+    assert sections[0].startswith("ACME SDS")
+    assert "body of section 2" in sections[2] and "more of 2" in sections[2]
+    assert split_sections("no headings here") == {}
+    assert section_numbers_in(text) == [1, 2]
+
+
+def test_select_sections_sends_only_schema_sections():
+    text = _sds([1, 2, 3, 4, 9, 14, 15])
+    selected, info = select_sections(text)
+    assert info["sections_selected"] == sorted(SCHEMA_SECTIONS)
+    assert "body of section 4" not in selected and "body of section 15" not in selected
+    assert selected.startswith("ACME SDS") and "body of section 14" in selected
+
+
+def test_select_sections_falls_back_when_a_section_is_missing():
+    selected, info = select_sections(_sds([1, 2, 3, 9]))
+    assert selected is None
+    assert info["fallback_reason"] == "headings not found for sections [14]"
+    assert select_sections("plain text")[1]["fallback_reason"] == "no section headings found"
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from service import ExtractionService
+
+
+class _SlowExtractor:
+    scheduler = None
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def extract_bytes(self, data, filename):
+        time.sleep(self.delay)
+        return {"parsed": {"filename": filename}, "error": None}
+
+
+def _wait(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status not in ("done", "failed") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def test_jobs_run_and_results_are_kept():
+    service = ExtractionService(_SlowExtractor(), workers=2, queue_size=4)
+    job = service.submit("a.pdf", b"%PDF")
+    assert _wait(job) == "done"
+    assert service.get(job.id).result == {"filename": "a.pdf"}
+    service.drain()
+    assert service.health()["done"] == 1
+
+
+def test_full_queue_rejects():
+    service = ExtractionService(_SlowExtractor(delay=0.2), workers=1, queue_size=1)
+    jobs = [service.submit(f"{i}.pdf", b"x") for i in range(4)]
+    assert None in jobs
+    assert service.accepting
+    service.drain()
+
+
+def test_no_job_is_lost_while_draining():
+    service = ExtractionService(_SlowExtractor(delay=0.001), workers=2, queue_size=1000)
+    accepted = []
+    stop = threading.Event()
+
+    def client():
+        while not stop.is_set():
+            job = service.submit("x.pdf", b"x")
+            if job is not None:
+                accepted.append(job)
+
+    threads = [threading.Thread(target=client) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    service.drain()
+    stop.set()
+    for t in threads:
+        t.join()
+    assert service.submit("late.pdf", b"x") is None
+    assert accepted and all(job.status == "done" for job in accepted)
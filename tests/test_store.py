@@ -0,0 +1,51 @@
+import pytest
+
+from store import ResultStore, normalize_un, parse_concentration
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("1 - 5", (1.0, 5.0)),
+        ("≥10 - <25", (10.0, 25.0)),
+        (">= 1 - < 5 %", (1.0, 5.0)),
+        ("25 - 10", (10.0, 25.0)),
+        (">= 90", (90.0, 100.0)),
+        ("< 1 %", (0.0, 1.0)),
+        ("up to 3", (0.0, 3.0)),
+        ("12,5", (12.5, 12.5)),
+        ("1000 ppm", (0.1, 0.1)),
+        ("trade secret", (None, None)),
+        (None, (None, None)),
+    ],
+)
+def test_parse_concentration(text, expected):
+    assert parse_concentration(text) == expected
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("UN 1263", "UN1263"), ("1263", "UN1263"), ("un1263", "UN1263"), ("NA 1993", "NA1993"), ("none", "none"), ("", None)],
+)
+def test_normalize_un(value, expected):
+    assert normalize_un(value) == expected
+
+
+def _parsed(code, cas, conc, un):
+    return {
+        "document": {"product_code": {"value": code}, "product_name": {"value": f"Product {code}"}},
+        "composition": {"ingredients": [{"name": {"value": "x"}, "cas": {"value": cas}, "concentration": {"value": conc}}]},
+        "transport": {"un_number": {"value": un}},
+        "meta": {"run_id": "r1"},
+    }
+
+
+def test_store_lookups_use_range_upper_bound(tmp_path):
+    with ResultStore(tmp_path / "results.sqlite") as store:
+        store.add(_parsed("A-1", "67-64-1", "≥10 - <25", "UN 1090"), "a.pdf")
+        store.add(_parsed("B-2", "67-64-1", "1 - 5", None), "b.pdf")
+        store.flush()
+        assert [r["source"] for r in store.find_by_cas("67-64-1", above=20)] == ["a.pdf"]
+        assert [r["source"] for r in store.find_by_un("1090")] == ["a.pdf"]
+        assert [r["source"] for r in store.find_by_product_code("B-2")] == ["b.pdf"]
+        assert store.counts()["transport"] == 1
@@ -0,0 +1,101 @@
+import json
+import time
+
+import pytest
+from openai import OpenAI
+
+from fake_llm import DEFAULT_RESPONSE, FakeLLMServer
+from main import Extractor
+from streaming import FieldStream, IncrementalJSONParser
+
+DOC = {
+    "document": {"product_name": {"value": "Acetone", "evidence": "Acetone", "confidence": 0.9}},
+    "composition": {"ingredients": [{"name": {"value": "acetone"}, "cas": {"value": "67-64-1"}}]},
+    "meta": {"notes": "ok", "n": 1, "x": -2.5e3, "flags": [True, False, None]},
+}
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_parser_matches_json_loads_for_any_chunking(size):
+    text = json.dumps(DOC)
+    closed = []
+    parser = IncrementalJSONParser(lambda path, value: closed.append(path))
+    for chunk in _chunks(text, size):
+        parser.feed(chunk)
+    assert parser.close() == DOC
+    assert "composition.ingredients[0].cas" in closed
+    assert closed[-1] == ""
+
+
+def test_parser_reports_the_offending_character():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": 1,')
+    with pytest.raises(json.JSONDecodeError) as e:
+        parser.feed(' 2}')
+    assert e.value.pos == 9
+
+
+def test_parser_close_rejects_incomplete_input():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": [1, 2')
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
+
+
+def _stream(text, size=5):
+    events = []
+    stream = FieldStream(on_partial=events.append)
+    ok = all(stream.feed(chunk) for chunk in _chunks(text, size))
+    return ok, stream, events
+
+
+def test_field_stream_forwards_completed_fields():
+    ok, stream, events = _stream(json.dumps(DOC))
+    assert ok and stream.stats()["complete"]
+    assert [e["path"] for e in events] == [
+        "document.product_name", "composition.ingredients[0].name", "composition.ingredients[0].cas",
+    ]
+
+
+@pytest.mark.parametrize("wrap", ["```json\n{}\n```", "Here is the JSON:\n{}", "{}\n```"])
+def test_field_stream_skips_fences_and_preamble(wrap):
+    ok, stream, events = _stream(wrap.replace("{}", json.dumps(DOC)))
+    assert ok
+    assert stream.stats()["complete"] and stream.stats()["error"] is None
+    assert len(events) == 3
+
+
+def test_field_stream_stops_on_text_without_json():
+    ok, stream, _ = _stream("I cannot help with that. " * 20)
+    assert not ok
+    assert stream.stats()["error"].startswith("no JSON object")
+
+
+def test_field_stream_stops_at_malformed_json():
+    ok, stream, _ = _stream('```json\n{"document": {"product_name": oops}}')
+    assert not ok
+    assert stream.stats()["error_at_char"] == len('```json\n{"document": {"product_name": ')
+
+
+def test_reset_starts_first_field_timing_over():
+    stream = FieldStream()
+    stream.feed(json.dumps(DOC)[:100])
+    assert stream.first_field_ms is not None
+    time.sleep(0.05)
+    stream.reset()  # the scheduler retries the request
+    assert stream.stats()["first_field_ms"] is None
+    stream.feed(json.dumps(DOC))
+    assert stream.first_field_ms < 50
+
+
+def test_first_field_is_measured_from_the_request_in_both_meta_entries(tmp_path):
+    source = tmp_path / "sds.txt"
+    source.write_text("SECTION 1: Identification\nProduct name: Solvent\n", encoding="utf-8")
+    with FakeLLMServer(response=DEFAULT_RESPONSE) as srv:
+        result = Extractor(OpenAI(base_url=srv.base_url, api_key="fake"), stream=True).extract(source)
+    meta = result["parsed"]["meta"]
+    assert meta["timings"]["first_field_ms"] == meta["streaming"]["first_field_ms"]
@@ -0,0 +1,49 @@
+import json
+import random
+
+from format_guardrails import validate_cas_value
+from preextract import cas_check_digit_ok
+from sections import split_sections
+from synthetic_sds import cas_number, model_response, synthetic_pages, synthetic_truth, write_corpus
+
+
+def test_cas_numbers_are_well_formed_with_valid_check_digit():
+    rng = random.Random(1)
+    for _ in range(500):
+        cas = cas_number(rng)
+        assert validate_cas_value(cas) and cas_check_digit_ok(cas), cas
+
+
+class _Edge(random.Random):
+    def __init__(self, pick):
+        super().__init__(0)
+        self.pick = pick
+
+    def randint(self, a, b):
+        return self.pick(a, b)
+
+
+def test_cas_number_range_ends_are_well_formed():
+    assert validate_cas_value(cas_number(_Edge(min)))
+    assert validate_cas_value(cas_number(_Edge(max)))
+
+
+def test_synthetic_pages_have_every_section_and_requested_length():
+    rng = random.Random(3)
+    truth = synthetic_truth(rng, ingredients=4, statements=3)
+    pages = synthetic_pages(rng, truth, 10)
+    assert len(pages) == 10
+    assert all(p.endswith(f"Page {i + 1} of 10") for i, p in enumerate(pages))
+    text = "\n".join(pages)
+    assert set(range(1, 17)) <= set(split_sections(text))
+    for ingredient in truth["composition"]["ingredients"]:
+        assert ingredient["cas"]["value"] in text
+
+
+def test_write_corpus_writes_inputs_truth_and_answer(tmp_path):
+    paths, truth_dir, answer = write_corpus(tmp_path, docs=3, pages=4, fmt="txt", seed=5)
+    assert [p.name for p in paths] == ["sds_00000.txt", "sds_00001.txt", "sds_00002.txt"]
+    truth = json.loads((truth_dir / "sds_00001.json").read_text())
+    assert answer == model_response(truth)
+    again, _, _ = write_corpus(tmp_path / "again", docs=3, pages=4, fmt="txt", seed=5)
+    assert [p.read_text() for p in again] == [p.read_text() for p in paths]